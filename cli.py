@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os, time, pyfiglet, shutil, platform, subprocess, sys, argparse
+import os, time, pyfiglet, shutil, platform, subprocess, sys, argparse, json
 from pathlib import Path
 from rich.console import Console
 from modules.configuration.setup_rules import create_default_rules, interactive_add_rule
@@ -7,14 +7,40 @@ from modules.configuration.validate_conf import validate_configuration
 # from modules.acc_managt.creat_acc import create_account_cli
 # from modules.acc_managt.delete_acc import delete_account_cli
 # from modules.acc_managt.update_acc import update_account_cli
+from modules.utilities import metrics
 from modules.utilities.logger import get_logger
 from modules.utilities.error_handler import get_error_logger
+from modules.configuration.rule_parser import parse_sid_spec
+from modules.configuration.rule_select import Selector
 from modules.configuration.rule_manager import (
     disable_rule,
     enable_rule,
     list_rules,
+    search_rules,
     build_ruleset,
     backup_rules,
+    lint_rules,
+    check_pcres,
+    bench_startup,
+    watch_rules,
+    list_backups,
+    restore_rules,
+    prune_backups,
+)
+from modules.decrypt.decrypt_manager import decrypt_by_flow, decrypt_log
+from modules.logs.log_manager import clean_logs, search_logs, show_packets
+from modules.logs.retention import DEFAULT_DAYS, DEFAULT_RATE, DEFAULT_WORKERS, LOG_DIR, SETTLE_SECONDS
+from modules.alerts.alert_manager import (
+    alert_packets,
+    alert_rate,
+    bench_parser,
+    bench_receiver,
+    ingest_alerts,
+    parse_alerts,
+    query_alerts,
+    receive_alerts,
+    tail_alerts,
+    top_talkers,
 )
 
 
@@ -26,6 +52,8 @@ console = Console()
 OS_TYPE = platform.system().lower()
 __version__ = "0.0.3-dev"
 
+RUN_BUCKETS = (10, 60, 300, 1800, 3600, 6 * 3600, 24 * 3600, 7 * 24 * 3600)
+
 logger = get_logger(__name__)
 logerror = get_error_logger(__name__)
 clierrorlogger = get_error_logger("cli")
@@ -123,9 +151,15 @@ def setup_cmd(_):
 
 
 def run_cmd(_):
+    if not validate_configuration(ROOT):
+        console.print(
+            "[red]Fix the rule errors above (or run `snortamv rule build`) before starting Snort.[/red]"
+        )
+        logger.error("Snort launch aborted: rule validation failed")
+        return
     if OS_TYPE == "linux":
         try:
-            subprocess.run(["bash", "snort_auto.bash"], check=True)
+            _supervise(["bash", "snort_auto.bash"])
         except subprocess.CalledProcessError as e:
             logerror.exception("Snort run failed: %s", e)
             logerror.exception("Stdout: %s", e.stdout)
@@ -133,10 +167,7 @@ def run_cmd(_):
             return
     elif OS_TYPE == "windows":
         try:
-            subprocess.run(
-                ["powershell", "-ExecutionPolicy", "Bypass", "-File", "snort.ps1"],
-                check=True,
-            )
+            _supervise(["powershell", "-ExecutionPolicy", "Bypass", "-File", "snort.ps1"])
             sys.exit(1)
         except subprocess.CalledProcessError as e:
             logerror.exception("Snort run failed: %s", e)
@@ -147,7 +178,41 @@ def run_cmd(_):
         sys.exit("Unsupported OS")
 
 
-def decrypt_cmd(_):
+def _supervise(cmd):
+    """Run the Snort launcher, recording how long it ran and how it ended."""
+    running = metrics.gauge("snortamv_snort_running", "1 while snortamv run supervises Snort")
+    running.set(1)
+    metrics.REGISTRY.flush()
+    start = time.monotonic()
+    result = "error"
+    try:
+        subprocess.run(cmd, check=True)
+        result = "ok"
+    except KeyboardInterrupt:
+        result = "interrupted"
+        raise
+    finally:
+        metrics.histogram(
+            "snortamv_snort_run_seconds", "How long each Snort run lasted", buckets=RUN_BUCKETS
+        ).observe(time.monotonic() - start)
+        metrics.counter("snortamv_snort_runs_total", "Snort runs by outcome", result=result).inc()
+        running.set(0)
+
+
+def decrypt_cmd(args):
+    if args.log and args.flows:
+        decrypt_by_flow(
+            args.log,
+            out_dir=args.output,
+            keyed=args.keyed,
+            workers=args.workers,
+            display_filter=args.filter,
+            raw=args.raw,
+        )
+        return
+    if args.log:
+        decrypt_log(args.log, output=args.output, raw=args.raw)
+        return
     if OS_TYPE == "linux":
         cmd = ["bash", "decrypt.bash"]
     elif OS_TYPE == "windows":
@@ -198,16 +263,102 @@ def version_cmd(_):
 #         logerror.exception("Any error occured while creating account: %s", e)
 
 
+def _rule_selector(args):
+    sids = None
+    if args.sid:
+        sids = parse_sid_spec(args.sid)
+        if not sids:
+            raise SystemExit(f"Invalid --sid value: {args.sid}")
+    return Selector(sids=sids, classtype=args.classtype, msg=args.msg, file=args.file)
+
+
 def rule_enable_cmd(args):
-    enable_rule(args.name, path=args.path, dry_run=args.dry_run)
+    enable_rule(
+        args.name,
+        path=args.path,
+        dry_run=args.dry_run,
+        selector=_rule_selector(args),
+        rebuild=not args.no_build,
+    )
 
 
 def rule_disable_cmd(args):
-    disable_rule(args.name, dry_run=args.dry_run)
+    disable_rule(
+        args.name,
+        dry_run=args.dry_run,
+        selector=_rule_selector(args),
+        rebuild=not args.no_build,
+    )
+
+
+def add_selector_args(p):
+    p.add_argument("--sid", help="SID or SID range, e.g. 2010000-2019999")
+    p.add_argument("--classtype", help="Match rules with this classtype, e.g. policy-violation")
+    p.add_argument("--msg", help="Match rules whose msg matches this regex (case-insensitive)")
+    p.add_argument("--file", help="Only rules in files matching this glob, e.g. 'emerging-*.rules'")
+    p.add_argument(
+        "--no-build", action="store_true", help="Do not rebuild the ruleset afterwards"
+    )
 
 
 def rule_build_cmd(args):
-    build_ruleset(dry_run=args.dry_run)
+    build_ruleset(
+        dry_run=args.dry_run,
+        force=args.force,
+        strict=args.strict,
+        budget=args.budget,
+        pcre_gate=args.pcre_gate,
+        grouped=args.grouped,
+    )
+
+
+def rule_bench_cmd(args):
+    bench_startup(conf=args.conf, runs=args.runs, snort=args.snort)
+
+
+def rule_pcre_cmd(args):
+    check_pcres(fuzz=not args.no_fuzz, budget=args.budget_ms / 1000, jobs=args.jobs)
+
+
+def rule_watch_cmd(args):
+    watch_rules(
+        debounce=args.debounce,
+        pid=args.pid,
+        pidfile=args.pidfile,
+        control=args.control,
+        conf=args.conf,
+        snort=args.snort,
+        poll=args.poll,
+    )
+
+
+def rule_lint_cmd(args):
+    lint_rules(top=args.top, budget=args.budget)
+
+
+def metrics_show_cmd(args):
+    series = metrics.REGISTRY.snapshot()
+    if args.json:
+        print(json.dumps(sorted(series.values(), key=lambda e: e["name"]), indent=2))
+    elif series:
+        print(metrics.render(series), end="")
+    else:
+        console.print(f"[yellow]No metrics recorded yet ({metrics.STATE_PATH})[/yellow]")
+
+
+def metrics_serve_cmd(args):
+    server = metrics.serve(args.port, args.host)
+    console.print(
+        f"[bold green]Serving metrics on http://{args.host}:{args.port}/metrics; Ctrl+C to stop[/bold green]"
+    )
+    logger.info(f"Metrics endpoint listening on {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        logger.info("Metrics endpoint stopped by the user")
+    finally:
+        server.shutdown()
 
 
 # ---------------- CLI ----------------
@@ -225,12 +376,22 @@ def main():
 
         sub.add_parser("setup", help="Run initial setup").set_defaults(func=setup_cmd)
         sub.add_parser("run", help="Runs the snort").set_defaults(func=run_cmd)
-        sub.add_parser("decrypt", help="decrypt the snort to be readable").set_defaults(
-            func=decrypt_cmd
+        decrypt = sub.add_parser("decrypt", help="decrypt the snort to be readable")
+        decrypt.add_argument("--log", help="Snort log or pcap to decrypt (skips the interactive script)")
+        decrypt.add_argument("--output", help="Where to write the converted pcap (.pcapng for pcapng)")
+        decrypt.add_argument("--raw", action="store_true", help="Hexdumps start at the IP header")
+        decrypt.add_argument(
+            "--flows", action="store_true", help="Decrypt every TCP flow into its own file (--output is a directory)"
         )
-        sub.add_parser("validate-conf", help="Validate the configuration").set_defaults(
-            func=lambda _: validate_configuration(ROOT)
+        decrypt.add_argument("--keyed", action="store_true", help="With --flows: only flows the key log has keys for")
+        decrypt.add_argument("--workers", type=int, help="With --flows: tshark processes (default: one per core)")
+        decrypt.add_argument("--filter", help="With --flows: tshark display filter, e.g. http")
+        decrypt.set_defaults(func=decrypt_cmd)
+        validate = sub.add_parser("validate-conf", help="Validate the configuration")
+        validate.add_argument(
+            "--jobs", type=int, help="Worker processes for rule validation (default: CPU count)"
         )
+        validate.set_defaults(func=lambda args: validate_configuration(ROOT, jobs=args.jobs))
         parser.add_argument(
             "--version",
             action="version",
@@ -242,30 +403,349 @@ def main():
         rule_sub.add_parser("add", help="Create a local rule interactively").set_defaults(
             func=lambda _: interactive_add_rule(ROOT)
         )
-        rule_sub.add_parser("list", help="List rules").set_defaults(
-            func=lambda _: list_rules()
+        rule_list = rule_sub.add_parser("list", help="List rules")
+        rule_list.add_argument(
+            "--sid", help="Show a single SID or a SID range (e.g. 2010000-2019999)"
+        )
+        rule_list.set_defaults(func=lambda args: list_rules(sid=args.sid))
+        search = rule_sub.add_parser("search", help="Full-text search over the rule catalog")
+        search.add_argument("query", help='Words, an FTS5 query or a SID, e.g. "trojan cve"')
+        search.add_argument("--limit", type=int, default=50, help="Maximum matches to show")
+        search.add_argument(
+            "--state", choices=["sources", "enabled", "disabled"], help="Only this rule dir"
+        )
+        search.set_defaults(
+            func=lambda args: search_rules(args.query, limit=args.limit, state=args.state)
         )
         enable = rule_sub.add_parser("enable", help="Enable a rule")
-        enable.add_argument("name", help="Name of the rule to enable")
+        enable.add_argument(
+            "name",
+            nargs="?",
+            help="Rules file name, SID or SID range (e.g. 2010000-2019999)",
+        )
         enable.add_argument(
             "--from",
             dest="path",
             choices=["sources", "disabled"],
-            required=True,
-            help="Where to enable the rule from",
+            help="Where to enable a rules file from (not needed for SIDs)",
         )
+        add_selector_args(enable)
         enable.set_defaults(func=rule_enable_cmd)
 
         disable = rule_sub.add_parser("disable", help="Disable a rule")
-        disable.add_argument("name", help="Name of the rule to disable")
+        disable.add_argument(
+            "name",
+            nargs="?",
+            help="Rules file name, SID or SID range (e.g. 2010000-2019999)",
+        )
+        add_selector_args(disable)
         disable.set_defaults(func=rule_disable_cmd)
 
-        rule_sub.add_parser("build", help="Build up the rules").set_defaults(
-            func=rule_build_cmd
+        build = rule_sub.add_parser("build", help="Build up the rules")
+        build.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild even if no enabled rules file changed",
+        )
+        build.add_argument(
+            "--strict",
+            action="store_true",
+            help="Fail the build on duplicate SIDs instead of keeping the highest rev",
+        )
+        build.add_argument(
+            "--budget",
+            type=int,
+            help="Refuse to build if the estimated rule cost (see `rule lint`) exceeds this",
+        )
+        build.add_argument(
+            "--pcre-gate",
+            action="store_true",
+            help="Refuse to build if any enabled pcre looks catastrophic (see `rule pcre-check`)",
+        )
+        mode = build.add_mutually_exclusive_group()
+        mode.add_argument(
+            "--grouped",
+            action="store_const",
+            const=True,
+            help="Write one file per protocol/service/port group and include them from snort.rules",
         )
-        rule_sub.add_parser("backup", help="List local.rules").set_defaults(
+        mode.add_argument(
+            "--flat",
+            dest="grouped",
+            action="store_const",
+            const=False,
+            help="Write a single snort.rules (default: the mode of the last build)",
+        )
+        build.set_defaults(func=rule_build_cmd)
+
+        bench = rule_sub.add_parser(
+            "startup-bench", help="Time Snort start-up with flat vs grouped rules"
+        )
+        bench.add_argument("--conf", help="Snort config (default: /etc/snort/snort.{conf,lua})")
+        bench.add_argument("--snort", help="Path to the Snort binary")
+        bench.add_argument("--runs", type=int, default=3, help="Runs per mode")
+        bench.set_defaults(func=rule_bench_cmd)
+
+        watch = rule_sub.add_parser(
+            "watch", help="Rebuild and hot-reload Snort whenever enabled rules change"
+        )
+        watch.add_argument("--debounce", type=float, default=0.5, help="Quiet seconds before rebuilding")
+        watch.add_argument("--pid", type=int, help="PID of the running Snort (default: auto-detect)")
+        watch.add_argument("--pidfile", help="Read the Snort PID from this file")
+        watch.add_argument(
+            "--control", help="Snort 3 control channel (host:port or socket) for reload_config()"
+        )
+        watch.add_argument("--conf", help="Also validate each build with snort -T on this config")
+        watch.add_argument("--snort", help="Path to the Snort binary")
+        watch.add_argument("--poll", action="store_true", help="Poll instead of using inotify")
+        watch.set_defaults(func=rule_watch_cmd)
+
+        lint = rule_sub.add_parser("lint", help="Rank enabled rules by estimated detection cost")
+        lint.add_argument("--top", type=int, default=20, help="How many rules to show")
+        lint.add_argument("--budget", type=int, help="Flag a total cost above this")
+        lint.set_defaults(func=rule_lint_cmd)
+
+        pcre = rule_sub.add_parser(
+            "pcre-check", help="Find pcre options prone to catastrophic backtracking"
+        )
+        pcre.add_argument(
+            "--budget-ms", type=int, default=250, help="Per-pattern fuzz time budget"
+        )
+        pcre.add_argument("--jobs", type=int, help="Fuzz worker processes")
+        pcre.add_argument("--no-fuzz", action="store_true", help="Static analysis only")
+        pcre.set_defaults(func=rule_pcre_cmd)
+        rule_sub.add_parser("backup", help="Back up the rules tree").set_defaults(
             func=lambda _: backup_rules()
         )
+        restore = rule_sub.add_parser("restore", help="Restore the rules tree from a backup")
+        restore.add_argument("snapshot", help="Backup id from `rule backups list`")
+        restore.set_defaults(func=lambda args: restore_rules(args.snapshot, dry_run=args.dry_run))
+
+        backups = rule_sub.add_parser("backups", help="List or prune rule backups")
+        backups_sub = backups.add_subparsers(dest="backups_action", required=True)
+        backups_sub.add_parser("list", help="List backups").set_defaults(
+            func=lambda _: list_backups()
+        )
+        prune = backups_sub.add_parser("prune", help="Apply a retention policy")
+        prune.add_argument("--keep", type=int, help="Keep the N newest backups")
+        prune.add_argument("--days", type=float, help="Keep backups younger than N days")
+        prune.set_defaults(
+            func=lambda args: prune_backups(keep=args.keep, days=args.days, dry_run=args.dry_run)
+        )
+
+        alerts = sub.add_parser("alerts", help="Follow, parse and summarize Snort alerts")
+        alerts_sub = alerts.add_subparsers(dest="action", required=True)
+        tail = alerts_sub.add_parser("tail", help="Follow the alert file as Snort writes it")
+        tail.add_argument("--file", help="alert_fast file (default: /var/log/snortamv/alert_fast)")
+        tail.add_argument("--from-start", action="store_true", help="Replay the existing alerts first")
+        tail.set_defaults(func=lambda args: tail_alerts(args.file, from_start=args.from_start))
+        parse = alerts_sub.add_parser("parse", help="Summarize an alert file")
+        parse.add_argument("--file", help="alert_fast file (default: /var/log/snortamv/alert_fast)")
+        parse.add_argument("--top", type=int, default=10, help="How many SIDs/sources to show")
+        parse.add_argument("--json", action="store_true", help="Print one JSON record per alert")
+        parse.set_defaults(
+            func=lambda args: parse_alerts(args.file, top=args.top, as_json=args.json)
+        )
+        ingest = alerts_sub.add_parser("ingest", help="Load new alerts into the alert store")
+        ingest.add_argument("--file", help="alert_fast file (default: /var/log/snortamv/alert_fast)")
+        ingest.add_argument("--follow", action="store_true", help="Keep ingesting as Snort writes")
+        ingest.add_argument(
+            "--from-start", action="store_true", help="Ignore the saved offset and re-read the file"
+        )
+        ingest.add_argument(
+            "--suppress",
+            type=float,
+            metavar="SECONDS",
+            help="Collapse repeats of the same sid/src/dst within SECONDS into one stored record",
+        )
+        ingest.add_argument(
+            "--suppress-sid",
+            action="append",
+            default=[],
+            metavar="SID=SECONDS",
+            help="Per-SID suppression window (0 stores every alert); repeatable",
+        )
+        ingest.set_defaults(
+            func=lambda args: ingest_alerts(
+                args.file,
+                follow=args.follow,
+                from_start=args.from_start,
+                suppress=args.suppress,
+                suppress_sids=args.suppress_sid,
+            )
+        )
+        receive = alerts_sub.add_parser(
+            "receive", help="Store alerts Snort sends over alert_unixsock or an alert_json stream"
+        )
+        receive.add_argument(
+            "--socket", help="alert_unixsock socket to bind (default: /var/log/snortamv/snort_alert)"
+        )
+        receive.add_argument(
+            "--json", metavar="SOURCE", help="Read Snort 3 alert_json lines from a FIFO or file, - for stdin"
+        )
+        receive.add_argument("--suppress", type=float, metavar="SECONDS", help="As for ingest")
+        receive.add_argument(
+            "--suppress-sid", action="append", default=[], metavar="SID=SECONDS", help="As for ingest"
+        )
+        receive.set_defaults(
+            func=lambda args: receive_alerts(
+                socket_path=args.socket,
+                json_source=args.json,
+                suppress=args.suppress,
+                suppress_sids=args.suppress_sid,
+            )
+        )
+        query = alerts_sub.add_parser("query", help="Search stored alerts, newest first")
+        query.add_argument("--since", help="Start time: 15m, 2h, 7d, epoch or ISO date")
+        query.add_argument("--until", help="End time, same formats as --since")
+        query.add_argument("--sid", type=int, help="Only this SID")
+        query.add_argument("--src", help="Only this source address")
+        query.add_argument("--dst", help="Only this destination address")
+        query.add_argument("--limit", type=int, default=100, help="Maximum alerts to show")
+        query.set_defaults(
+            func=lambda args: query_alerts(
+                since=args.since,
+                until=args.until,
+                sid=args.sid,
+                src=args.src,
+                dst=args.dst,
+                limit=args.limit,
+            )
+        )
+        packets_cmd = alerts_sub.add_parser(
+            "packets", help="Extract an alert's triggering packet and flow from Snort's captures"
+        )
+        packets_cmd.add_argument("alert_id", nargs="?", help="Alert id from `alerts query`; omit for a batch")
+        packets_cmd.add_argument("-o", "--output", help="pcap to write (batch: directory, default ./evidence)")
+        packets_cmd.add_argument("--since", help="Batch: start time (15m, 2h, 7d, epoch or ISO date)")
+        packets_cmd.add_argument("--until", help="Batch: end time")
+        packets_cmd.add_argument("--sid", type=int, help="Batch: only this SID")
+        packets_cmd.add_argument("--src", help="Batch: only this source address")
+        packets_cmd.add_argument("--dst", help="Batch: only this destination address")
+        packets_cmd.add_argument("--limit", type=int, default=1000, help="Batch: maximum alerts")
+        packets_cmd.add_argument(
+            "--window", type=float, default=30.0, help="Seconds of the flow to keep either side of the alert"
+        )
+        packets_cmd.add_argument("--dir", default=str(LOG_DIR), help="Capture directory (default: /var/log/snortamv)")
+        packets_cmd.set_defaults(
+            func=lambda args: alert_packets(
+                args.alert_id,
+                output=args.output,
+                since=args.since,
+                until=args.until,
+                sid=args.sid,
+                src=args.src,
+                dst=args.dst,
+                limit=args.limit,
+                window=args.window,
+                log_dir=args.dir,
+            )
+        )
+        top = alerts_sub.add_parser("top", help="Top talkers or SIDs over the last minutes")
+        top.add_argument("--by", choices=["src", "dst", "sid"], default="src", help="What to rank")
+        top.add_argument("--sid", type=int, help="Only alerts for this SID")
+        top.add_argument("--minutes", type=int, default=5, help="Window length")
+        top.add_argument("-n", type=int, default=10, help="How many to show")
+        top.add_argument("--until", help="End of the window (default: now)")
+        top.set_defaults(
+            func=lambda args: top_talkers(
+                by=args.by, sid=args.sid, minutes=args.minutes, n=args.n, until=args.until
+            )
+        )
+        rate = alerts_sub.add_parser("rate", help="Alerts per minute")
+        rate.add_argument("--sid", type=int, help="Only this SID")
+        rate.add_argument("--minutes", type=int, default=60, help="How far back to go")
+        rate.add_argument("--until", help="End of the window (default: now)")
+        rate.set_defaults(
+            func=lambda args: alert_rate(sid=args.sid, minutes=args.minutes, until=args.until)
+        )
+        bench_alerts = alerts_sub.add_parser("bench", help="Measure alert parser throughput")
+        bench_alerts.add_argument("--lines", type=int, default=1_000_000, help="Synthetic lines")
+        bench_alerts.add_argument(
+            "--receiver", action="store_true", help="Time alert_unixsock intake into a scratch store instead"
+        )
+        bench_alerts.set_defaults(
+            func=lambda args: bench_receiver(args.lines) if args.receiver else bench_parser(args.lines)
+        )
+
+        logs = sub.add_parser("logs", help="Log retention and search")
+        logs_sub = logs.add_subparsers(dest="action", required=True)
+        clean = logs_sub.add_parser(
+            "clean", help="Compress rotated logs and pcaps, then apply the age and size budgets"
+        )
+        clean.add_argument("--dir", default=str(LOG_DIR), help="Log directory (default: /var/log/snortamv)")
+        clean.add_argument("--days", type=float, default=DEFAULT_DAYS, help="Delete files older than N days")
+        clean.add_argument("--max-size", help="Size budget for the directory, e.g. 20G")
+        clean.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Compression threads")
+        clean.add_argument(
+            "--rate", type=float, default=DEFAULT_RATE / 1024**2, help="Read rate cap in MiB/s (0: no cap)"
+        )
+        clean.add_argument(
+            "--settle", type=float, default=SETTLE_SECONDS, help="Leave files written in the last N seconds"
+        )
+        clean.add_argument(
+            "--alerts", action="store_true", help="Also drop alert store days older than --days"
+        )
+        clean.set_defaults(
+            func=lambda args: clean_logs(
+                args.dir,
+                days=args.days,
+                max_size=args.max_size,
+                workers=args.workers,
+                rate=args.rate * 1024**2,
+                settle=args.settle,
+                alerts=args.alerts,
+                dry_run=args.dry_run,
+            )
+        )
+        search_cmd = logs_sub.add_parser("search", help="Search current and compressed logs in time order")
+        search_cmd.add_argument("pattern", help="Text to find (a regular expression with --regex)")
+        search_cmd.add_argument("--dir", default=str(LOG_DIR), help="Log directory (default: /var/log/snortamv)")
+        search_cmd.add_argument("--since", help="Start time: 15m, 2h, 7d, epoch or ISO date")
+        search_cmd.add_argument("--until", help="End time, same formats as --since")
+        search_cmd.add_argument("--regex", action="store_true", help="Treat the pattern as a regular expression")
+        search_cmd.add_argument("-i", "--ignore-case", action="store_true", help="Case-insensitive match")
+        search_cmd.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+        search_cmd.add_argument("--limit", type=int, default=1000, help="Maximum hits to show")
+        search_cmd.set_defaults(
+            func=lambda args: search_logs(
+                args.pattern,
+                args.dir,
+                since=args.since,
+                until=args.until,
+                regex=args.regex,
+                ignore_case=args.ignore_case,
+                workers=args.workers,
+                limit=args.limit,
+            )
+        )
+        packets = logs_sub.add_parser("packets", help="Packets of a capture by number or time range (indexed)")
+        packets.add_argument("capture", help="pcap/pcapng file, e.g. /var/log/snort/snort.log.1790000000")
+        packets.add_argument("--since", help="Start time: 15m, 2h, 7d, epoch or ISO date")
+        packets.add_argument("--until", help="End time, same formats as --since")
+        packets.add_argument("-n", "--number", type=int, help="Only packet N (counting from 1)")
+        packets.add_argument("--limit", type=int, default=1000, help="Maximum packets to show")
+        packets.add_argument("--write", help="Write the selected packets to this pcap instead of listing them")
+        packets.set_defaults(
+            func=lambda args: show_packets(
+                args.capture,
+                since=args.since,
+                until=args.until,
+                number=args.number,
+                limit=args.limit,
+                write=args.write,
+            )
+        )
+
+        metrics_parser = sub.add_parser("metrics", help="Show or serve operational metrics")
+        metrics_sub = metrics_parser.add_subparsers(dest="action", required=True)
+        show = metrics_sub.add_parser("show", help="Print metrics in Prometheus text format")
+        show.add_argument("--json", action="store_true", help="Print JSON instead")
+        show.set_defaults(func=metrics_show_cmd)
+        serve = metrics_sub.add_parser("serve", help="Expose /metrics over HTTP for Prometheus")
+        serve.add_argument("--port", type=int, default=metrics.DEFAULT_PORT, help="Port (default: 9477)")
+        serve.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+        serve.set_defaults(func=metrics_serve_cmd)
 
         # acc = sub.add_parser(
         #     "acc", help="Create, Delete and update project profile or users"
@@ -282,6 +762,7 @@ def main():
         # )
 
         args = parser.parse_args()
+        metrics.enable_persistence()
         if args.dry_run:
             console.print(
                 "[⚠️] Dry-run mode enabled: No changes will be made to the system.",
@@ -0,0 +1,367 @@
+"""Alert store: daily partitioned SQLite tables tuned for bulk ingest.
+
+Alerts live in one table per UTC day (``alerts_YYYYMMDD``), listed in
+``alert_partitions`` with their time range, so retention is a cheap
+``DROP TABLE`` and queries only touch the days they cover. Message and
+classification are stored once per gid:sid:rev in ``alert_signatures``.
+
+Unlike the accounts database, the store keeps one long-lived connection in
+WAL mode with ``synchronous=NORMAL`` and a large page cache, and ingests
+with ``executemany`` in large transactions.
+"""
+
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from modules.alerts.alert_fast import Alert
+from modules.alerts.rollups import MINUTE, MinuteBucket
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+PAGE_SIZE = 8192
+CACHE_KIB = 65536
+MMAP_SIZE = 256 * 1024 * 1024
+BATCH_SIZE = 50000
+DAY = 86400
+# 1: partitions gained the ``hits`` column (duplicate suppression)
+SCHEMA_VERSION = 1
+
+PRAGMAS = (
+    f"PRAGMA page_size={PAGE_SIZE}",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{CACHE_KIB}",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+)
+
+
+class StoredAlert(NamedTuple):
+    ts: float
+    gid: int
+    sid: int
+    rev: int
+    msg: str
+    classification: str
+    priority: int
+    proto: str
+    src: str
+    sport: int
+    dst: str
+    dport: int
+    hits: int
+    id: str = ""  # YYYYMMDD-rowid, see AlertStore.get
+
+
+class Partition(NamedTuple):
+    name: str
+    start: float
+    end: float
+    rows: int
+
+
+PARTITION_PREFIX = "alerts_"
+ID_RE = re.compile(r"^(\d{8})-(\d+)$")
+
+
+def partition_name(ts: float) -> str:
+    return time.strftime("alerts_%Y%m%d", time.gmtime(ts))
+
+
+def _stored(name: str, row, signatures) -> StoredAlert:
+    rowid, ts, gid, sid, rev, priority, proto, src, sport, dst, dport, hits = row
+    msg, classification = signatures.get((gid, sid, rev), ("", ""))
+    alert_id = f"{name[len(PARTITION_PREFIX):]}-{rowid}"
+    return StoredAlert(
+        ts, gid, sid, rev, msg, classification, priority, proto, src, sport, dst, dport, hits, alert_id
+    )
+
+
+class AlertStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS alert_signatures (
+                gid INTEGER NOT NULL,
+                sid INTEGER NOT NULL,
+                rev INTEGER NOT NULL,
+                msg TEXT,
+                classification TEXT,
+                PRIMARY KEY (gid, sid, rev)
+            );
+            CREATE TABLE IF NOT EXISTS alert_partitions (
+                name TEXT PRIMARY KEY,
+                start REAL NOT NULL,
+                end REAL NOT NULL,
+                rows INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS alert_sources (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                offset INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS alert_rollups (
+                minute INTEGER PRIMARY KEY,
+                total INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                cms BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS alert_sid_minutes (
+                minute INTEGER NOT NULL,
+                sid INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (minute, sid)
+            );
+            """
+        )
+        self.signatures: Dict[Tuple[int, int, int], Tuple[str, str]] = {
+            (g, s, r): (m, c)
+            for g, s, r, m, c in self.conn.execute("SELECT * FROM alert_signatures")
+        }
+        self.partitions: Dict[str, Partition] = {
+            row[0]: Partition(*row) for row in self.conn.execute("SELECT * FROM alert_partitions")
+        }
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate()
+
+    def _migrate(self):
+        """Bring partitions created by older versions up to the current columns."""
+        cur = self.conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            for name in self.partitions:
+                columns = {row[1] for row in cur.execute(f"PRAGMA table_info({name})")}
+                if columns and "hits" not in columns:
+                    cur.execute(f"ALTER TABLE {name} ADD COLUMN hits INTEGER NOT NULL DEFAULT 1")
+                    logger.info(f"Added the hits column to {name}")
+            cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        self.conn.close()
+
+    # ---------------- Partitions ---------------- #
+    def _ensure_partition(self, name: str, ts: float):
+        if name in self.partitions:
+            return
+        start = ts - ts % DAY
+        self.conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS {name} (
+                ts REAL NOT NULL,
+                gid INTEGER NOT NULL,
+                sid INTEGER NOT NULL,
+                rev INTEGER NOT NULL,
+                priority INTEGER,
+                proto TEXT,
+                src TEXT,
+                sport INTEGER,
+                dst TEXT,
+                dport INTEGER,
+                hits INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE INDEX IF NOT EXISTS {name}_ts ON {name} (ts);
+            CREATE INDEX IF NOT EXISTS {name}_sid ON {name} (sid, ts);
+            CREATE INDEX IF NOT EXISTS {name}_src ON {name} (src, ts);
+            CREATE INDEX IF NOT EXISTS {name}_dst ON {name} (dst, ts);
+            """
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO alert_partitions (name, start, end, rows) VALUES (?, ?, ?, 0)",
+            (name, start, start + DAY),
+        )
+        self.partitions[name] = Partition(name, start, start + DAY, 0)
+
+    def list_partitions(self) -> List[Partition]:
+        return sorted(self.partitions.values(), key=lambda p: p.start)
+
+    def drop_before(self, cutoff: float) -> List[str]:
+        """Drop every partition (and rollup minute) older than ``cutoff``.
+
+        Returns the names of the partitions dropped.
+        """
+        dropped = [p.name for p in self.list_partitions() if p.end <= cutoff]
+        minute = int(cutoff // MINUTE)
+        self.conn.execute("BEGIN")
+        for name in dropped:
+            self.conn.execute(f"DROP TABLE IF EXISTS {name}")
+            self.conn.execute("DELETE FROM alert_partitions WHERE name = ?", (name,))
+            del self.partitions[name]
+        self.conn.execute("DELETE FROM alert_rollups WHERE minute < ?", (minute,))
+        self.conn.execute("DELETE FROM alert_sid_minutes WHERE minute < ?", (minute,))
+        self.conn.execute("COMMIT")
+        if not dropped:
+            return dropped
+        logger.info(f"Dropped {len(dropped)} alert partition(s) older than {cutoff:.0f}")
+        return dropped
+
+    # ---------------- Ingest ---------------- #
+    def ingest(
+        self,
+        alerts: Iterable[Alert],
+        batch_size: int = BATCH_SIZE,
+        source: Optional[Tuple[Path, int, int]] = None,
+    ) -> int:
+        """Store ``alerts``, committing every ``batch_size`` rows; returns rows stored.
+
+        ``source`` is the (path, inode, offset) the alerts were read up to; it
+        is recorded in the same transaction as the last batch, so the saved
+        offset never runs ahead of the stored alerts.
+        """
+        total = 0
+        batch: List[Alert] = []
+        for alert in alerts:
+            batch.append(alert)
+            if len(batch) >= batch_size:
+                total += self._write(batch)
+                batch = []
+        if batch or source:
+            total += self._write(batch, source)
+        return total
+
+    def _write(self, batch: List[Alert], source: Optional[Tuple[Path, int, int]] = None) -> int:
+        by_partition: Dict[str, list] = {}
+        new_sigs = []
+        signatures = self.signatures
+        for a in batch:
+            key = (a.gid, a.sid, a.rev)
+            if key not in signatures:
+                signatures[key] = (a.msg, a.classification)
+                new_sigs.append((*key, a.msg, a.classification))
+            name = partition_name(a.ts)
+            rows = by_partition.get(name)
+            if rows is None:
+                self._ensure_partition(name, a.ts)
+                rows = by_partition[name] = []
+            rows.append(
+                (a.ts, a.gid, a.sid, a.rev, a.priority, a.proto, a.src, a.sport, a.dst, a.dport, a.hits)
+            )
+
+        cur = self.conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            if new_sigs:
+                cur.executemany("INSERT OR IGNORE INTO alert_signatures VALUES (?, ?, ?, ?, ?)", new_sigs)
+            for name, rows in by_partition.items():
+                cur.executemany(f"INSERT INTO {name} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                cur.execute(
+                    "UPDATE alert_partitions SET rows = rows + ? WHERE name = ?", (len(rows), name)
+                )
+                p = self.partitions[name]
+                self.partitions[name] = p._replace(rows=p.rows + len(rows))
+            if source:
+                path, inode, offset = source
+                cur.execute(
+                    "INSERT OR REPLACE INTO alert_sources (path, inode, offset) VALUES (?, ?, ?)",
+                    (str(path), inode, offset),
+                )
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        return len(batch)
+
+    # ---------------- Source offsets ---------------- #
+    def source_offset(self, path: Path) -> Optional[Tuple[int, int]]:
+        """(inode, offset) ingested so far from ``path``, if known."""
+        row = self.conn.execute(
+            "SELECT inode, offset FROM alert_sources WHERE path = ?", (str(path),)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    # ---------------- Rollups ---------------- #
+    def save_rollups(self, buckets: Iterable[MinuteBucket]):
+        """Persist (or overwrite) per-minute rollup buckets in one transaction."""
+        cur = self.conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            for b in buckets:
+                cur.execute(
+                    "INSERT OR REPLACE INTO alert_rollups (minute, total, data, cms) VALUES (?, ?, ?, ?)",
+                    (b.minute, b.total, b.to_json(), b.cms.to_bytes()),
+                )
+                cur.executemany(
+                    "INSERT OR REPLACE INTO alert_sid_minutes (minute, sid, count) VALUES (?, ?, ?)",
+                    [(b.minute, sid, count) for sid, count in b.sids.counts.items()],
+                )
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+
+    def load_rollups(self, since: float) -> List[MinuteBucket]:
+        rows = self.conn.execute(
+            "SELECT minute, data, cms FROM alert_rollups WHERE minute >= ? ORDER BY minute",
+            (int(since // MINUTE),),
+        )
+        return [MinuteBucket.from_row(*row) for row in rows]
+
+    def sid_minutes(self, since: float, sid: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(minute start epoch, alerts) history from persisted rollups."""
+        if sid is None:
+            sql = "SELECT minute, total FROM alert_rollups WHERE minute >= ? ORDER BY minute"
+            params: tuple = (int(since // MINUTE),)
+        else:
+            sql = "SELECT minute, count FROM alert_sid_minutes WHERE minute >= ? AND sid = ? ORDER BY minute"
+            params = (int(since // MINUTE), sid)
+        return [(minute * MINUTE, count) for minute, count in self.conn.execute(sql, params)]
+
+    # ---------------- Query ---------------- #
+    def query(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        sid: Optional[int] = None,
+        src: Optional[str] = None,
+        dst: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[StoredAlert]:
+        """Newest matching alerts first, visiting only the partitions in range."""
+        where, params = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        for column, value in (("sid", sid), ("src", src), ("dst", dst)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        results: List[StoredAlert] = []
+        for p in reversed(self.list_partitions()):
+            if len(results) >= limit:
+                break
+            if (since is not None and p.end <= since) or (until is not None and p.start >= until):
+                continue
+            rows = self.conn.execute(
+                f"SELECT rowid, * FROM {p.name} {clause} ORDER BY ts DESC LIMIT ?",
+                (*params, limit - len(results)),
+            )
+            results.extend(_stored(p.name, row, self.signatures) for row in rows)
+        return results
+
+    def get(self, alert_id: str) -> Optional[StoredAlert]:
+        """The alert with ``id`` (as shown by ``alerts query``), if it is still stored."""
+        m = ID_RE.match(alert_id.strip())
+        name = f"{PARTITION_PREFIX}{m.group(1)}" if m else None
+        if name not in self.partitions:
+            return None
+        row = self.conn.execute(f"SELECT rowid, * FROM {name} WHERE rowid = ?", (int(m.group(2)),)).fetchone()
+        return _stored(name, row, self.signatures) if row else None
+
+    def count(self) -> int:
+        return sum(p.rows for p in self.partitions.values())
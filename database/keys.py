@@ -0,0 +1,141 @@
+"""TLS key store: the NSS key log (SSLKEYLOGFILE) deduplicated and indexed.
+
+Browsers append to the key log for as long as it is exported, so it grows
+without bound and repeats secrets. Every ``LABEL <client random> <secret>``
+line is stored once in ``tls_secrets`` keyed by (client random, label), and
+``key_sources`` remembers how far each key log has been read so a sync only
+parses what was appended since. ``RSA`` lines are keyed by the encrypted
+pre-master secret rather than a client random and are not kept.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+KEYLOG_RE = re.compile(rb"^([A-Z][A-Z_0-9]*) ([0-9A-Fa-f]{64}) ([0-9A-Fa-f]+)\s*$", re.M)
+# SQLite's default limit on bound parameters in one statement.
+LOOKUP_BATCH = 999
+CHUNK = 4 * 1024 * 1024
+
+
+class SyncStats(NamedTuple):
+    lines: int  # secrets read from the key log
+    added: int  # of which new to the store
+    bytes: int  # key log bytes read
+    elapsed: float
+
+
+class KeyStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists():
+            # Secrets: readable by the owner only, like the key log itself.
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tls_secrets (
+                client_random BLOB NOT NULL,
+                label TEXT NOT NULL,
+                secret BLOB NOT NULL,
+                PRIMARY KEY (client_random, label)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS key_sources (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                offset INTEGER NOT NULL
+            );
+            """
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tls_secrets").fetchone()[0]
+
+    def sync(self, keylog: Path) -> SyncStats:
+        """Add the secrets appended to ``keylog`` since the last sync, in one transaction."""
+        start = time.perf_counter()
+        keylog = Path(keylog)
+        try:
+            f = open(keylog, "rb")
+        except FileNotFoundError:
+            return SyncStats(0, 0, 0, 0.0)
+        cur = self.conn.cursor()
+        before = self.conn.total_changes
+        lines = 0
+        with f:
+            st = os.fstat(f.fileno())
+            known = self.source_offset(keylog)
+            # A replaced or truncated key log is read again from the start.
+            offset = known[1] if known and known[0] == st.st_ino and known[1] <= st.st_size else 0
+            f.seek(offset)
+            end, carry = offset, b""
+            cur.execute("BEGIN")
+            try:
+                while True:
+                    data = f.read(CHUNK)
+                    if not data:
+                        break
+                    data = carry + data
+                    # A line still being written is left for the next sync.
+                    cut = data.rfind(b"\n") + 1
+                    data, carry = data[:cut], data[cut:]
+                    end += len(data)
+                    rows = [
+                        (bytes.fromhex(random.decode()), label.decode(), bytes.fromhex(secret.decode()))
+                        for label, random, secret in KEYLOG_RE.findall(data)
+                    ]
+                    lines += len(rows)
+                    cur.executemany("INSERT OR IGNORE INTO tls_secrets VALUES (?, ?, ?)", rows)
+                added = self.conn.total_changes - before
+                cur.execute(
+                    "INSERT OR REPLACE INTO key_sources (path, inode, offset) VALUES (?, ?, ?)",
+                    (str(keylog), st.st_ino, end),
+                )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+        if added:
+            logger.info(f"Stored {added} new TLS secret(s) from {keylog}")
+        return SyncStats(lines, added, end - offset, time.perf_counter() - start)
+
+    def lookup(self, randoms: Iterable[bytes]) -> Dict[bytes, List[Tuple[str, bytes]]]:
+        """(label, secret) pairs for each of ``randoms`` that the store has keys for."""
+        randoms = list(set(randoms))
+        found: Dict[bytes, List[Tuple[str, bytes]]] = {}
+        for i in range(0, len(randoms), LOOKUP_BATCH):
+            chunk = randoms[i : i + LOOKUP_BATCH]
+            marks = ", ".join("?" * len(chunk))
+            for random, label, secret in self.conn.execute(
+                f"SELECT client_random, label, secret FROM tls_secrets "
+                f"WHERE client_random IN ({marks}) ORDER BY client_random, label",
+                chunk,
+            ):
+                found.setdefault(random, []).append((label, secret))
+        return found
+
+    def source_offset(self, keylog: Path) -> Optional[Tuple[int, int]]:
+        """(inode, offset) read so far from ``keylog``, if known."""
+        row = self.conn.execute(
+            "SELECT inode, offset FROM key_sources WHERE path = ?", (str(keylog),)
+        ).fetchone()
+        return tuple(row) if row else None
@@ -0,0 +1,209 @@
+"""SQLite rule catalog with FTS5 full-text search.
+
+Every rule in the rules tree is stored in ``rule_catalog`` together with its
+references and content strings, and indexed by an external-content FTS5
+table so ``rule search`` answers from the index instead of grepping files.
+
+Ingestion is incremental: ``catalog_files`` records the size and mtime of
+each file as of its last load, and only files that changed are replaced.
+All changes of one sync go through a single transaction.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from modules.configuration.rule_parser import Rule, iter_rules, unquote
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_KEYS = ("content", "uricontent", "protected_content")
+FTS_COLUMNS = ("msg", "classtype", "refs", "contents")
+DEFAULT_LIMIT = 50
+
+
+class CatalogHit(NamedTuple):
+    sid: int
+    gid: int
+    rev: int
+    msg: str
+    classtype: str
+    path: str
+    line_no: int
+    state: str
+    active: bool
+
+
+class SyncStats(NamedTuple):
+    files: int
+    rules: int
+    elapsed: float
+
+
+# -------------------------
+# Schema
+# -------------------------
+def init_catalog(conn: sqlite3.Connection):
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS catalog_files (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS rule_catalog (
+            id INTEGER PRIMARY KEY,
+            sid INTEGER NOT NULL,
+            gid INTEGER NOT NULL,
+            rev INTEGER NOT NULL,
+            msg TEXT,
+            classtype TEXT,
+            refs TEXT,
+            contents TEXT,
+            path TEXT NOT NULL,
+            line_no INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            active INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS rule_catalog_sid ON rule_catalog (sid);
+        CREATE INDEX IF NOT EXISTS rule_catalog_path ON rule_catalog (path);
+        CREATE VIRTUAL TABLE IF NOT EXISTS rule_catalog_fts USING fts5 (
+            msg, classtype, refs, contents,
+            content='rule_catalog', content_rowid='id'
+        );
+        """
+    )
+
+
+# -------------------------
+# Ingestion
+# -------------------------
+def _row(rule: Rule, rel: str) -> tuple:
+    refs, contents = [], []
+    for key, value in rule.options:
+        if key == "reference":
+            refs.append(value.strip())
+        elif key in CONTENT_KEYS:
+            contents.append(unquote(value.lstrip("!").strip()))
+    state = rel.split("/", 1)[0]
+    return (
+        rule.sid,
+        rule.gid,
+        rule.rev,
+        rule.msg,
+        rule.classtype,
+        " ".join(refs),
+        " ".join(contents),
+        rel,
+        rule.line_no,
+        state,
+        int(state == "enabled" and rule.enabled),
+    )
+
+
+def _drop_file(cur: sqlite3.Cursor, rel: str):
+    # External-content FTS tables need the old values to remove their tokens.
+    cur.execute(
+        "INSERT INTO rule_catalog_fts (rule_catalog_fts, rowid, msg, classtype, refs, contents) "
+        "SELECT 'delete', id, msg, classtype, refs, contents FROM rule_catalog WHERE path = ?",
+        (rel,),
+    )
+    cur.execute("DELETE FROM rule_catalog WHERE path = ?", (rel,))
+    cur.execute("DELETE FROM catalog_files WHERE path = ?", (rel,))
+
+
+def sync_catalog(conn: sqlite3.Connection, files: Iterable[Path], root: Path) -> SyncStats:
+    """Reload every file under ``root`` whose size or mtime changed."""
+    start = time.perf_counter()
+    init_catalog(conn)
+    cur = conn.cursor()
+    known = {
+        row[0]: (row[1], row[2])
+        for row in cur.execute("SELECT path, mtime_ns, size FROM catalog_files")
+    }
+    seen = set()
+    changed = loaded = 0
+    try:
+        cur.execute("BEGIN")
+        for path in files:
+            rel = path.relative_to(root).as_posix()
+            seen.add(rel)
+            st = path.stat()
+            if known.get(rel) == (st.st_mtime_ns, st.st_size):
+                continue
+            _drop_file(cur, rel)
+            rows = [_row(rule, rel) for rule in iter_rules(path)]
+            cur.executemany(
+                "INSERT INTO rule_catalog (sid, gid, rev, msg, classtype, refs, contents, "
+                "path, line_no, state, active) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            cur.execute(
+                "INSERT INTO rule_catalog_fts (rowid, msg, classtype, refs, contents) "
+                "SELECT id, msg, classtype, refs, contents FROM rule_catalog WHERE path = ?",
+                (rel,),
+            )
+            cur.execute(
+                "INSERT INTO catalog_files (path, mtime_ns, size) VALUES (?, ?, ?)",
+                (rel, st.st_mtime_ns, st.st_size),
+            )
+            changed += 1
+            loaded += len(rows)
+        for rel in known.keys() - seen:
+            _drop_file(cur, rel)
+            changed += 1
+        cur.execute("COMMIT")
+    except BaseException:
+        cur.execute("ROLLBACK")
+        raise
+    stats = SyncStats(changed, loaded, time.perf_counter() - start)
+    if changed:
+        logger.info(
+            f"Rule catalog synced: {changed} file(s), {loaded} rule(s) in {stats.elapsed:.3f}s"
+        )
+    return stats
+
+
+# -------------------------
+# Search
+# -------------------------
+def _quote_terms(query: str) -> str:
+    """Turn free text into an FTS5 query of quoted terms (all must match)."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def search_rules(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int = DEFAULT_LIMIT,
+    state: Optional[str] = None,
+) -> List[CatalogHit]:
+    """Best matches for ``query`` (FTS5 syntax, or plain words), best first.
+
+    A bare SID is looked up directly. Queries that are not valid FTS5 syntax
+    are retried with every word quoted, so ``ET-2024 cve:1234`` still works.
+    """
+    init_catalog(conn)
+    where = " AND c.state = ?" if state else ""
+    params: Tuple = (state,) if state else ()
+    columns = "c.sid, c.gid, c.rev, c.msg, c.classtype, c.path, c.line_no, c.state, c.active"
+
+    if query.strip().isdigit():
+        rows = conn.execute(
+            f"SELECT {columns} FROM rule_catalog c WHERE c.sid = ?{where} "
+            f"ORDER BY c.path, c.line_no LIMIT ?",
+            (int(query), *params, limit),
+        ).fetchall()
+        return [CatalogHit(*row[:-1], bool(row[-1])) for row in rows]
+
+    sql = (
+        f"SELECT {columns} FROM rule_catalog_fts f JOIN rule_catalog c ON c.id = f.rowid "
+        f"WHERE rule_catalog_fts MATCH ?{where} ORDER BY f.rank LIMIT ?"
+    )
+    try:
+        rows = conn.execute(sql, (query, *params, limit)).fetchall()
+    except sqlite3.OperationalError:
+        rows = conn.execute(sql, (_quote_terms(query), *params, limit)).fetchall()
+    return [CatalogHit(*row[:-1], bool(row[-1])) for row in rows]
@@ -11,8 +11,6 @@ SSLKEYLOGFILE="$LOCK_DIR/ssl.log.txt"
 LOG_DIR="/var/log/snort"
 OUT_DIR="/tmp/snort_decrypt"
 
-COMBINED="$OUT_DIR/snort_combined.log"
-HEXFILE="$OUT_DIR/snort_hex.txt"
 PCAP="$OUT_DIR/snort_reconstruct.pcap"
 
 # ==============================
@@ -92,24 +90,30 @@ if echo "$FILETYPE" | grep -qi "pcap"; then
   PCAP="$FILEPATH"
 else
   echo "[*] Converting text log → PCAP"
-  cat "$FILEPATH" > "$COMBINED"
-
-  sed -nE 's/^[[:space:]]*[0-9A-Fa-f]{4}[[:space:]]+//p' "$COMBINED" \
-    | sed -E 's/[[:space:]]{2,}.*$//' > "$HEXFILE"
-
-  text2pcap -l 1 "$HEXFILE" "$PCAP"
+  (cd "$SCRIPT_DIR" && python3 -m modules.decrypt.hexdump "$FILEPATH" "$PCAP")
 fi
 
 # ==============================
 # Decrypt
 # ==============================
+FLOWS="$OUT_DIR/flows-$(basename "$PCAP")"
+KEYS="$OUT_DIR/$(basename "$PCAP").keys"
+echo
+echo ">>> Selecting the keys of this capture's handshakes"
+(cd "$SCRIPT_DIR" && python3 -m modules.decrypt.keylog "$PCAP" "$KEYS" --keylog "$SSLKEYLOGFILE")
 echo
-echo ">>> Showing first 200 decrypted packets"
-tshark -o tls.keylog_file:"$SSLKEYLOGFILE" -r "$PCAP" -V | head -n 200
+if [ -s "$KEYS" ]; then
+  echo ">>> Decrypting TLS flows with keys (one tshark per core)"
+  (cd "$SCRIPT_DIR" && python3 -m modules.decrypt.flows "$PCAP" "$FLOWS" --keylog "$KEYS" --keyed)
+else
+  echo ">>> No TLS keys for this capture, dissecting every TCP flow (one tshark per core)"
+  (cd "$SCRIPT_DIR" && python3 -m modules.decrypt.flows "$PCAP" "$FLOWS")
+fi
 
 echo
 echo "========================================"
 echo "✅ DONE"
-echo " PCAP : $PCAP"
-echo " KEYS : $SSLKEYLOGFILE"
+echo " PCAP  : $PCAP"
+echo " KEYS  : $KEYS"
+echo " FLOWS : $FLOWS"
 echo "========================================"
@@ -10,7 +10,6 @@ Write-Host "=== Snort TLS Decrypt (Windows) ==="
 
 # ---- Dependency check ----
 $tshark = Get-Command tshark -ErrorAction SilentlyContinue
-$text2pcap = Get-Command text2pcap -ErrorAction SilentlyContinue
 
 if (-not $tshark) {
     Write-Host "Missing required tool: tshark.exe" -ForegroundColor Red
@@ -19,14 +18,6 @@ if (-not $tshark) {
     exit 1
 }
 
-if (-not $text2pcap) {
-    Write-Host "Missing required tool: text2pcap.exe" -ForegroundColor Red
-    Write-Host "Install Wireshark with TShark support."
-    Write-Host "Install Wireshark from:"
-    Write-Host "https://www.wireshark.org/download.html"
-    exit 1
-}
-
 # ---- Prepare output ----
 New-Item -ItemType Directory -Force -Path $OutDir | Out-Null
 $Pcap = Join-Path $OutDir "snort_reconstruct.pcap"
@@ -59,15 +50,24 @@ if ($LASTEXITCODE -eq 0) {
     Write-Host "Detected PCAP format"
 } else {
     Write-Host "Detected text log → converting to PCAP"
-    & text2pcap -l 1 $FilePath $Pcap
+    Push-Location $PSScriptRoot
+    & python -m modules.decrypt.hexdump $FilePath $Pcap
+    Pop-Location
 }
 
 # ---- Decrypt ----
-Write-Host "`n>>> Showing first 200 decrypted packets"
-& tshark -o tls.keylog_file="$KeyLog" -r $Pcap -V | Select-Object -First 200
+$Flows = Join-Path $OutDir ("flows-" + (Split-Path $Pcap -Leaf))
+$Keys = Join-Path $OutDir ((Split-Path $Pcap -Leaf) + ".keys")
+Push-Location $PSScriptRoot
+Write-Host "`n>>> Selecting the keys of this capture's handshakes"
+& python -m modules.decrypt.keylog $Pcap $Keys --keylog $KeyLog
+Write-Host "`n>>> Decrypting TLS flows with keys (one tshark per core)"
+& python -m modules.decrypt.flows $Pcap $Flows --keylog $Keys --keyed
+Pop-Location
 
 Write-Host "`n========================================"
 Write-Host "DONE"
-Write-Host "PCAP : $Pcap"
-Write-Host "KEYS : $KeyLog"
+Write-Host "PCAP  : $Pcap"
+Write-Host "KEYS  : $Keys"
+Write-Host "FLOWS : $Flows"
 Write-Host "========================================"
@@ -0,0 +1,474 @@
+import json
+import multiprocessing
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+
+from database.alerts import AlertStore
+from modules.alerts.alert_fast import Alert, AlertParser, parse_file, parse_time, synthetic_lines
+from modules.alerts.evidence import FLOW_WINDOW, collect, write_pcap
+from modules.alerts.pipeline import AlertPipeline
+from modules.alerts.receiver import (
+    SOCKET_NAME,
+    ReceiverStats,
+    UnixSockReceiver,
+    json_batches,
+    open_json_stream,
+    pack_alertpkt,
+)
+from modules.alerts.rollups import MINUTE, Rollups
+from modules.alerts.suppression import Suppressor, parse_overrides
+from modules.alerts.tailer import FileTailer
+from modules.utilities import metrics
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+console = Console()
+
+LOG_DIR = Path("/var/log/snortamv")
+# Snort 2 writes alert_fast (alert), Snort 3 alert_fast.txt.
+ALERT_FILES = ("alert_fast", "alert_fast.txt", "alert")
+BENCH_BATCH = 10000
+# The receiver bench gives up on datagrams still missing after this long idle.
+BENCH_IDLE = 2.0
+ALERTS_DB = LOG_DIR / "alerts.db"
+BAR_WIDTH = 40
+SHOW_PACKETS = 20
+
+
+def default_alert_file() -> Path:
+    for name in ALERT_FILES:
+        if (LOG_DIR / name).exists():
+            return LOG_DIR / name
+    return LOG_DIR / ALERT_FILES[0]
+
+
+def format_alert(a: Alert) -> str:
+    when = datetime.fromtimestamp(a.ts).strftime("%m/%d %H:%M:%S")
+    src = f"{a.src}:{a.sport}" if a.sport else a.src
+    dst = f"{a.dst}:{a.dport}" if a.dport else a.dst
+    hits = f" (x{a.hits})" if a.hits > 1 else ""
+    return (
+        f"{when} [{a.gid}:{a.sid}:{a.rev}] p{a.priority} {a.proto} {src} -> {dst}  {a.msg}{hits}"
+    )
+
+
+def open_store():
+    ALERTS_DB.parent.mkdir(parents=True, exist_ok=True)
+    return AlertStore(ALERTS_DB)
+
+
+def make_suppressor(suppress=None, suppress_sids=()):
+    """A :class:`Suppressor` for ``--suppress``/``--suppress-sid``, or None when unused."""
+    if suppress is None and not suppress_sids:
+        return None
+    return Suppressor(window=suppress or 0, overrides=parse_overrides(suppress_sids))
+
+
+def report_suppression(suppressor):
+    if not suppressor:
+        return
+    stats = suppressor.stats
+    console.print(
+        f"[cyan]Suppression: {stats.seen} alerts in, {stats.suppressed} collapsed "
+        f"({stats.reduction:.1%}), {stats.evicted} window(s) closed early[/cyan]"
+    )
+    logger.info(f"Alert suppression stats: {stats.as_dict()}")
+
+
+# ---------------- Alert Ops ---------------- #
+def tail_alerts(path=None, from_start=False):
+    path = Path(path) if path else default_alert_file()
+    parser = AlertParser()
+    tailer = FileTailer(path, from_start=from_start)
+    console.print(f"[bold green]Following {path}; Ctrl+C to stop[/bold green]")
+    try:
+        for lines in tailer.follow():
+            for alert in parser.parse_lines(lines):
+                style = "red" if alert.priority == 1 else "yellow" if alert.priority == 2 else "white"
+                console.print(f"[{style}]{format_alert(alert)}[/{style}]", highlight=False)
+    except KeyboardInterrupt:
+        logger.info("Alert tail stopped by the user")
+    finally:
+        tailer.close()
+
+
+def parse_alerts(path=None, top=10, as_json=False):
+    """Parse a whole alert file: JSON lines with ``as_json``, else a summary."""
+    path = Path(path) if path else default_alert_file()
+    if not path.exists():
+        console.print(f"[yellow]No alerts yet ({path} does not exist).[/yellow]")
+        return None
+    parser = AlertParser()
+    total, first, last = 0, None, None
+    by_sid, msgs, sources = Counter(), {}, Counter()
+    start = time.perf_counter()
+    for batch in parse_file(path, parser):
+        if not batch:
+            continue
+        if as_json:
+            sys.stdout.write("".join(json.dumps(a._asdict()) + "\n" for a in batch))
+            continue
+        total += len(batch)
+        first = batch[0].ts if first is None else min(first, batch[0].ts)
+        last = batch[-1].ts if last is None else max(last, batch[-1].ts)
+        by_sid.update(a.sid for a in batch)
+        sources.update(a.src for a in batch)
+        for a in batch:
+            msgs.setdefault(a.sid, a.msg)
+    elapsed = time.perf_counter() - start
+    if as_json:
+        return None
+    if not total:
+        console.print(f"[yellow]No alerts in {path}[/yellow]")
+        return by_sid
+
+    span = f"{datetime.fromtimestamp(first):%Y-%m-%d %H:%M:%S} → {datetime.fromtimestamp(last):%Y-%m-%d %H:%M:%S}"
+    console.print(f"\n[bold]{total} alerts from {len(by_sid)} SIDs[/bold] ({span})")
+    console.print("[bold]Top SIDs:[/bold]")
+    for sid, count in by_sid.most_common(top):
+        console.print(f"  {count:>8}  sid:{sid:<10} {msgs[sid]}", highlight=False)
+    console.print("[bold]Top sources:[/bold]")
+    for src, count in sources.most_common(top):
+        console.print(f"  {count:>8}  {src}", highlight=False)
+    if parser.bad_lines:
+        console.print(f"[yellow]{parser.bad_lines} unparseable line(s) skipped[/yellow]")
+    logger.info(f"Parsed {total} alerts from {path} in {elapsed:.3f}s")
+    return by_sid
+
+
+def ingest_alerts(path=None, follow=False, from_start=False, suppress=None, suppress_sids=()):
+    """Load new alerts from the alert file into the alert store.
+
+    Ingest resumes from the offset stored for the file, so running it
+    repeatedly (or after a restart) only adds what Snort wrote since.
+
+    With ``suppress`` (seconds) repeats of the same sid/src/dst are stored
+    as one record with a hit count; ``suppress_sids`` ("SID=SECONDS")
+    override the window per SID. Rollups always see every alert. Windows
+    still open when ingest is killed (rather than stopped) are lost.
+    """
+    path = Path(path) if path else default_alert_file()
+    if not path.exists() and not follow:
+        console.print(f"[yellow]No alerts yet ({path} does not exist).[/yellow]")
+        return 0
+    try:
+        suppressor = make_suppressor(suppress, suppress_sids)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        return 0
+    store = open_store()
+    parser = AlertParser()
+    tailer = FileTailer(path, from_start=True)
+    saved = store.source_offset(path.resolve())
+    if saved and not from_start and tailer.resume(*saved):
+        logger.info(f"Resuming ingest of {path} at offset {saved[1]}")
+    pipeline = AlertPipeline(store, suppressor)
+    start = time.perf_counter()
+    try:
+        batches = tailer.follow() if follow else iter(tailer.read_lines, [])
+        if follow:
+            console.print(f"[bold green]Ingesting {path} into {ALERTS_DB}; Ctrl+C to stop[/bold green]")
+        for lines in batches:
+            pipeline.feed(parser.parse_lines(lines), source=(path.resolve(), tailer.inode, tailer.position))
+    except KeyboardInterrupt:
+        logger.info("Alert ingest stopped by the user")
+    finally:
+        pipeline.close()
+        tailer.close()
+        store.close()
+    total = pipeline.stored
+    elapsed = time.perf_counter() - start
+    console.print(f"[green]Stored {total} alert records from {path} in {elapsed:.2f}s[/green]")
+    report_suppression(suppressor)
+    if parser.bad_lines:
+        console.print(f"[yellow]{parser.bad_lines} unparseable line(s) skipped[/yellow]")
+    logger.info(f"Ingested {total} alert records from {path} in {elapsed:.2f}s")
+    return total
+
+
+def receive_alerts(socket_path=None, json_source=None, suppress=None, suppress_sids=()):
+    """Store alerts Snort sends directly: ``alert_unixsock`` datagrams or an ``alert_json`` stream.
+
+    Snort 2: ``output alert_unixsock`` with the receiver bound to
+    ``<logdir>/snort_alert`` (start the receiver first). Snort 3: pipe
+    ``alert_json`` (``file = false``) into ``--json -`` or point ``--json``
+    at a FIFO.
+    """
+    try:
+        suppressor = make_suppressor(suppress, suppress_sids)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        return 0
+    stats = ReceiverStats()
+    if json_source:
+        stream = open_json_stream(json_source)
+        batches = json_batches(stream, stats=stats)
+        close = stream.close
+        label = "stdin" if json_source == "-" else json_source
+    else:
+        receiver = UnixSockReceiver(Path(socket_path) if socket_path else LOG_DIR / SOCKET_NAME)
+        stats = receiver.stats
+        batches = receiver.batches()
+        close = receiver.close
+        label = str(receiver.path)
+    store = open_store()
+    pipeline = AlertPipeline(store, suppressor, source="json" if json_source else "unixsock")
+    console.print(f"[bold green]Receiving alerts on {label} into {ALERTS_DB}; Ctrl+C to stop[/bold green]")
+    start = time.perf_counter()
+    try:
+        pipeline.run(batches)
+    except KeyboardInterrupt:
+        logger.info("Alert receiver stopped by the user")
+    finally:
+        pipeline.close()
+        close()
+        store.close()
+    elapsed = time.perf_counter() - start
+    console.print(
+        f"[green]Received {stats.received} alerts ({pipeline.stored} records stored) in {elapsed:.2f}s[/green]"
+    )
+    if stats.gaps:
+        metrics.counter(
+            "snortamv_alert_events_lost_total", "Gaps in Snort's alert_unixsock event ids"
+        ).inc(stats.gaps)
+        console.print(f"[yellow]{stats.gaps} event(s) missing from the Snort event sequence[/yellow]")
+    if stats.bad:
+        console.print(f"[yellow]{stats.bad} undecodable record(s) skipped[/yellow]")
+    report_suppression(suppressor)
+    logger.info(f"Alert receiver on {label}: {stats.as_dict()}, {pipeline.stored} stored")
+    return stats.received
+
+
+def query_alerts(since=None, until=None, sid=None, src=None, dst=None, limit=100):
+    store = open_store()
+    try:
+        start = time.perf_counter()
+        results = store.query(
+            since=parse_time(since), until=parse_time(until), sid=sid, src=src, dst=dst, limit=limit
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        store.close()
+    if not results:
+        console.print("[yellow]No matching alerts[/yellow]")
+        return results
+    for a in results:
+        console.print(f"[dim]{a.id}[/dim] {format_alert(a)}", highlight=False)
+    console.print(f"[dim]{len(results)} alert(s) in {elapsed * 1000:.1f}ms[/dim]")
+    return results
+
+
+def alert_packets(
+    alert_id=None,
+    output=None,
+    since=None,
+    until=None,
+    sid=None,
+    src=None,
+    dst=None,
+    limit=1000,
+    window=FLOW_WINDOW,
+    log_dir=LOG_DIR,
+):
+    """Extract the triggering packet and surrounding flow of one alert, or of a batch, to pcap."""
+    start = time.perf_counter()
+    store = open_store()
+    try:
+        if alert_id:
+            alert = store.get(alert_id)
+            if alert is None:
+                console.print(f"[red]No stored alert {alert_id} (see `snortamv alerts query`)[/red]")
+                return None
+            alerts = [alert]
+        else:
+            alerts = store.query(
+                since=parse_time(since), until=parse_time(until), sid=sid, src=src, dst=dst, limit=limit
+            )
+    finally:
+        store.close()
+    if not alerts:
+        console.print("[yellow]No matching alerts[/yellow]")
+        return []
+    evidence = collect(alerts, Path(log_dir), window)
+    if alert_id:
+        found = evidence[0]
+        target = Path(output) if output else Path(f"alert-{alert_id}.pcap")
+        console.print(format_alert(found.alert), highlight=False)
+        if not found.packets:
+            console.print(f"[yellow]No packets of this flow in the captures under {log_dir}[/yellow]")
+            return evidence
+        # The packets around the trigger; the pcap has the whole flow.
+        first = max(0, (found.trigger or 0) - SHOW_PACKETS // 2)
+        shown = found.packets[first : first + SHOW_PACKETS]
+        for pos, (path, packet) in enumerate(shown, first):
+            mark = "[bold red]→[/bold red]" if pos == found.trigger else " "
+            console.print(
+                f" {mark} {path.name} #{packet.number} "
+                f"{datetime.fromtimestamp(packet.ts).strftime('%H:%M:%S.%f')} {packet.wirelen} bytes",
+                highlight=False,
+            )
+        if len(shown) < len(found.packets):
+            console.print(f"   [dim]… {len(found.packets) - len(shown)} more in the pcap[/dim]")
+        write_pcap(found, target)
+        how = "exact match" if found.exact else "nearest packet" if found.trigger is not None else "no trigger"
+        console.print(
+            f"[green]{len(found.packets)} packet(s) ({how}) → {target} "
+            f"in {(time.perf_counter() - start) * 1000:.0f}ms[/green]"
+        )
+        return evidence
+    out_dir = Path(output or "evidence")
+    written = 0
+    for item in evidence:
+        if item.packets:
+            write_pcap(item, out_dir / f"{item.alert.id}.pcap")
+            written += 1
+    exact = sum(1 for item in evidence if item.exact)
+    console.print(
+        f"[green]Evidence for {written} of {len(evidence)} alert(s) → {out_dir}/ "
+        f"({exact} exact trigger matches) in {time.perf_counter() - start:.2f}s[/green]"
+    )
+    logger.info(f"Extracted packet evidence for {written}/{len(evidence)} alerts into {out_dir}")
+    return evidence
+
+
+def top_talkers(by="src", sid=None, minutes=5, n=10, until=None):
+    """Heavy hitters over the last ``minutes`` from the persisted rollups."""
+    end = parse_time(until) or time.time()
+    store = open_store()
+    try:
+        rollups = Rollups(minutes)
+        rollups.load(store.load_rollups(end - minutes * MINUTE))
+    finally:
+        store.close()
+    rows = rollups.top(by=by, sid=sid, minutes=minutes, n=n, now=end)
+    scope = f" for sid {sid}" if sid is not None else ""
+    console.print(f"\n[bold]Top {by}{scope} over the last {minutes} minute(s)[/bold]")
+    if not rows:
+        console.print("[yellow]No alerts in that window[/yellow]")
+        return rows
+    for item, count, error in rows:
+        bound = f" (≥{count - error})" if error else ""
+        console.print(f"  {count:>8}{bound}  {item}", highlight=False)
+    return rows
+
+
+def alert_rate(sid=None, minutes=60, until=None):
+    """Alerts per minute (for one SID or all) from the persisted rollups."""
+    end = parse_time(until) or time.time()
+    store = open_store()
+    try:
+        series = [
+            (minute, count)
+            for minute, count in store.sid_minutes(end - minutes * MINUTE, sid)
+            if minute < end
+        ]
+    finally:
+        store.close()
+    if not series:
+        console.print("[yellow]No alerts in that window[/yellow]")
+        return series
+    peak = max(count for _, count in series)
+    for minute, count in series:
+        bar = "█" * max(1, round(count / peak * BAR_WIDTH)) if count else ""
+        console.print(f"  {datetime.fromtimestamp(minute):%m/%d %H:%M} {count:>8} {bar}", highlight=False)
+    return series
+
+
+def bench_parser(lines=1_000_000):
+    """Time the alert_fast parser on synthetic lines, in pipeline-sized batches."""
+    sample = synthetic_lines(lines)
+    parser = AlertParser()
+    start = time.perf_counter()
+    parsed = 0
+    for i in range(0, len(sample), BENCH_BATCH):
+        parsed += len(parser.parse_lines(sample[i : i + BENCH_BATCH]))
+    elapsed = time.perf_counter() - start
+    rate = parsed / elapsed if elapsed else 0.0
+    console.print(
+        f"[bold]Parsed {parsed} alert_fast lines in {elapsed:.3f}s → {rate:,.0f} lines/s[/bold]"
+    )
+    logger.info(f"Alert parser bench: {rate:.0f} lines/s over {parsed} lines")
+    return rate
+
+
+def _emit_alertpkts(path, count):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    now = time.time()
+    templates = [
+        pack_alertpkt(
+            now + i / 1000,
+            1,
+            2010000 + i % 200,
+            1,
+            f"ET POLICY Synthetic signature {i % 200}",
+            f"192.168.{i % 256}.{i * 7 % 256}",
+            f"10.0.{i % 16}.1",
+            1024 + i,
+            80,
+        )
+        for i in range(1000)
+    ]
+    for i in range(count):
+        sock.sendto(templates[i % len(templates)], str(path))
+    sock.close()
+
+
+def bench_receiver(count=500_000):
+    """Time socket intake end to end: an emitter process → decode → rollups → store.
+
+    Stops once every datagram arrived, or when the emitter has exited and
+    the socket stayed idle (``BENCH_IDLE`` at most); datagrams that never
+    arrived are reported as dropped.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        receiver = UnixSockReceiver(Path(tmp) / SOCKET_NAME)
+        store = AlertStore(Path(tmp) / "alerts.db")
+        pipeline = AlertPipeline(store, rollups=Rollups())
+        emitter = multiprocessing.Process(target=_emit_alertpkts, args=(receiver.path, count))
+        start = time.perf_counter()
+        emitter.start()
+
+        def until_done():
+            received, idle_since = 0, None
+            for batch in receiver.batches():
+                received += len(batch)
+                yield batch
+                if received >= count:
+                    break
+                if batch:
+                    idle_since = None
+                    continue
+                now = time.monotonic()
+                idle_since = idle_since or now
+                if not emitter.is_alive() or now - idle_since >= BENCH_IDLE:
+                    break
+
+        try:
+            received = pipeline.run(until_done())
+            pipeline.close()
+        finally:
+            if emitter.is_alive():
+                emitter.terminate()
+            emitter.join()
+            receiver.close()
+            store.close()
+        elapsed = time.perf_counter() - start
+    rate = received / elapsed if elapsed else 0.0
+    dropped = count - received
+    console.print(
+        f"[bold]Received and stored {received} of {count} alert_unixsock datagrams in {elapsed:.3f}s "
+        f"→ {rate:,.0f} alerts/s, {dropped} dropped[/bold]"
+    )
+    logger.info(f"Alert receiver bench: {rate:.0f} alerts/s over {received} datagrams, {dropped} dropped")
+    return rate
+
+
+if __name__ == "__main__":
+    parse_alerts(sys.argv[1] if len(sys.argv) > 1 else None)
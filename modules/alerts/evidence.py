@@ -0,0 +1,165 @@
+"""Find the packets behind stored alerts in Snort's indexed captures.
+
+An alert carries the time of the packet that triggered it (to the
+microsecond) and its 5-tuple. The captures covering ``window`` seconds
+either side of it are opened through their sidecar index (see
+``modules.logs.pcap_index``) and the index records in that span are
+matched against the flow in both directions; the packet in the alert's
+direction closest to its time is the trigger.
+
+A batch is grouped by capture and each capture is served in one pass over
+the merged time spans of its alerts: records are compared by their raw
+address/port bytes against a dict of every wanted flow, and only the
+packets that match are read from the capture.
+"""
+
+import ipaddress
+import struct
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from database.alerts import StoredAlert
+from modules.decrypt.hexdump import PcapWriter, is_capture
+from modules.logs.pcap_index import HEADER_SIZE, RECORD, Capture, Packet
+from modules.logs.retention import SERIES_RE, scan
+
+FLOW_WINDOW = 30.0
+EXACT = 5e-6  # alert and packet stamps are both microseconds
+# src, dst, sport, dport as laid out in a pcap_index record
+KEY_START, KEY_END = 24, 60
+PORTS = struct.Struct("<HH")
+
+
+class Evidence(NamedTuple):
+    alert: StoredAlert
+    packets: List[Tuple[Path, Packet]]  # the flow around the alert, in capture order
+    trigger: Optional[int]  # position in ``packets`` of the triggering packet
+    exact: bool  # the trigger's time equals the alert's
+
+
+def _address(value: str) -> Optional[bytes]:
+    try:
+        packed = ipaddress.ip_address(value.strip("[]")).packed
+    except ValueError:
+        return None
+    return packed + bytes(16 - len(packed))
+
+
+def flow_keys(alert) -> Optional[Tuple[bytes, bytes]]:
+    """Index key bytes for the alert's flow as sent and as answered."""
+    src, dst = _address(alert.src or ""), _address(alert.dst or "")
+    if src is None or dst is None:
+        return None
+    sport, dport = alert.sport or 0, alert.dport or 0
+    return src + dst + PORTS.pack(sport, dport), dst + src + PORTS.pack(dport, sport)
+
+
+def captures(log_dir: Path) -> Dict[str, List[Tuple[int, Path]]]:
+    """Snort capture series in ``log_dir``: name -> [(start epoch, path)], oldest first."""
+    series = defaultdict(list)
+    for f in scan(Path(log_dir)):
+        name = f.path.name
+        if name.startswith("."):
+            continue
+        m = SERIES_RE.match(name[:-3] if name.endswith(".gz") else name)
+        if m and is_capture(f.path):
+            series[m.group(1)].append((int(m.group(2)), f.path))
+    return {name: sorted(files) for name, files in series.items()}
+
+
+def covering(series: Dict[str, List[Tuple[int, Path]]], since: float, until: float) -> List[Path]:
+    """Captures that may hold packets in [since, until): each runs until the next one starts."""
+    paths = []
+    for files in series.values():
+        for i, (start, path) in enumerate(files):
+            end = files[i + 1][0] if i + 1 < len(files) else float("inf")
+            if start < until and end > since:
+                paths.append(path)
+    return paths
+
+
+def _merge(spans: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    merged: List[Tuple[float, float]] = []
+    for lo, hi in sorted(spans):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def match_capture(cap: Capture, alerts: List, window: float = FLOW_WINDOW) -> List[List[int]]:
+    """Record numbers (from 1) of each alert's flow within ``window`` seconds, in one pass."""
+    wanted: Dict[bytes, List[Tuple[int, float, float]]] = defaultdict(list)
+    spans = []
+    for j, alert in enumerate(alerts):
+        keys = flow_keys(alert)
+        if keys is None:
+            continue
+        lo, hi = alert.ts - window, alert.ts + window
+        for key in set(keys):
+            wanted[key].append((j, lo, hi))
+        spans.append((lo, hi))
+    results: List[List[int]] = [[] for _ in alerts]
+    if not spans:
+        return results
+    spans = _merge(spans) if cap.sorted else [(None, None)]
+    index, size = cap.index, RECORD.size
+    for lo, hi in spans:
+        start, end = cap.span(lo, hi)
+        for i in range(start, end):
+            offset = HEADER_SIZE + i * size
+            hits = wanted.get(index[offset + KEY_START : offset + KEY_END])
+            if hits:
+                ts = struct.unpack_from("<d", index, offset)[0]
+                for j, lo_, hi_ in hits:
+                    if lo_ <= ts < hi_:
+                        results[j].append(i + 1)
+    return results
+
+
+def _trigger(alert, packets: List[Tuple[Path, Packet]]) -> Tuple[Optional[int], bool]:
+    src = _address(alert.src or "")
+    best, best_gap = None, None
+    for pos, (_, packet) in enumerate(packets):
+        flow = packet.flow
+        if flow is None or _address(flow.src) != src or flow.sport != (alert.sport or 0):
+            continue
+        gap = abs(packet.ts - alert.ts)
+        if best_gap is None or gap < best_gap:
+            best, best_gap = pos, gap
+    return best, best_gap is not None and best_gap <= EXACT
+
+
+def collect(alerts: Iterable, log_dir: Path, window: float = FLOW_WINDOW) -> List[Evidence]:
+    """Evidence for each alert; every capture involved is opened and scanned once."""
+    alerts = list(alerts)
+    series = captures(log_dir)
+    plan: Dict[Path, List[int]] = defaultdict(list)
+    for j, alert in enumerate(alerts):
+        for path in covering(series, alert.ts - window, alert.ts + window):
+            plan[path].append(j)
+    found: List[List[Tuple[Path, Packet]]] = [[] for _ in alerts]
+    for path in sorted(plan):
+        members = plan[path]
+        with Capture(path) as cap:
+            matches = match_capture(cap, [alerts[j] for j in members], window)
+            for j, numbers in zip(members, matches):
+                found[j].extend((path, cap.packet(n)) for n in numbers)
+    evidence = []
+    for alert, packets in zip(alerts, found):
+        packets.sort(key=lambda item: item[1].ts)
+        trigger, exact = _trigger(alert, packets)
+        evidence.append(Evidence(alert, packets, trigger, exact))
+    return evidence
+
+
+def write_pcap(evidence: Evidence, path: Path) -> Path:
+    """The evidence packets as a small pcap (link type of the first packet)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as out:
+        linktype = evidence.packets[0][1].linktype if evidence.packets else 1
+        PcapWriter(out, linktype).write([(p.ts, p.data) for _, p in evidence.packets])
+    return path
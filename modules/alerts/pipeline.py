@@ -0,0 +1,162 @@
+"""The sink every alert intake path feeds: rollups, optional suppression, store."""
+
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from database.alerts import AlertStore
+from modules.alerts.alert_fast import Alert
+from modules.alerts.rollups import MINUTE, Rollups
+from modules.alerts.suppression import Suppressor
+from modules.utilities import metrics
+
+ROLLUP_FLUSH_INTERVAL = 10.0
+QUEUE_BATCHES = 256
+READER_GRACE = 2.0
+COALESCE = 50000
+
+
+class AlertPipeline:
+    """Rollups see every alert; the store gets what suppression lets through."""
+
+    def __init__(
+        self,
+        store: AlertStore,
+        suppressor: Optional[Suppressor] = None,
+        rollups: Optional[Rollups] = None,
+        flush_interval: float = ROLLUP_FLUSH_INTERVAL,
+        source: str = "file",
+    ):
+        self.store = store
+        self.suppressor = suppressor
+        if rollups is None:
+            rollups = Rollups()
+            rollups.load(store.load_rollups(time.time() - rollups.minutes * MINUTE))
+        self.rollups = rollups
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.alerts = 0
+        self.stored = 0
+        self.m_alerts = metrics.counter("snortamv_alerts_total", "Alerts taken in", source=source)
+        self.m_stored = metrics.counter(
+            "snortamv_alert_records_stored_total", "Alert records written to the store", source=source
+        )
+        self.m_suppressed = metrics.counter(
+            "snortamv_alerts_suppressed_total", "Alerts collapsed by suppression", source=source
+        )
+        self.m_batch = metrics.histogram(
+            "snortamv_alert_batch_seconds", "Time to aggregate and store one batch", source=source
+        )
+        self.m_rate = metrics.gauge(
+            "snortamv_alert_rate", "Alerts per second over the last flush interval", source=source
+        )
+        self.rate_mark = (time.monotonic(), 0)
+
+    def feed(self, alerts: List[Alert], source: Optional[Tuple[Path, int, int]] = None) -> int:
+        """Process one batch; ``source`` is the file position it was read up to."""
+        start = time.perf_counter()
+        self.alerts += len(alerts)
+        self.m_alerts.inc(len(alerts))
+        self.rollups.add(alerts)
+        if self.suppressor:
+            before = len(alerts)
+            alerts = self.suppressor.process(alerts)
+            self.m_suppressed.inc(before - len(alerts))
+        stored = self.store.ingest(alerts, source=source) if alerts or source else 0
+        self.stored += stored
+        self.m_stored.inc(stored)
+        self.m_batch.observe(time.perf_counter() - start)
+        now = time.monotonic()
+        if now - self.last_flush >= self.flush_interval:
+            self.store.save_rollups(self.rollups.take_dirty())
+            self.last_flush = now
+            mark, count = self.rate_mark
+            self.m_rate.set((self.alerts - count) / (now - mark))
+            self.rate_mark = (now, self.alerts)
+            metrics.REGISTRY.maybe_flush()
+        return stored
+
+    def close(self) -> int:
+        """Release open suppression windows and persist rollups; returns rows stored."""
+        stored = 0
+        if self.suppressor:
+            stored = self.store.ingest(self.suppressor.flush())
+            self.stored += stored
+        self.store.save_rollups(self.rollups.take_dirty())
+        return stored
+
+    def run(
+        self,
+        batches: Iterator[List[Alert]],
+        stop: Optional[threading.Event] = None,
+        queue_batches: int = QUEUE_BATCHES,
+    ) -> int:
+        """Feed ``batches`` until they end or ``stop`` is set.
+
+        The batches are pulled on a reader thread, so a socket keeps being
+        drained while a large transaction commits; up to ``queue_batches``
+        batches are buffered before the reader waits, and whatever is buffered
+        is stored in one transaction. Returns alerts fed.
+        """
+        stop = stop or threading.Event()
+        pending: "queue.Queue[Optional[List[Alert]]]" = queue.Queue(queue_batches)
+        failure: List[BaseException] = []
+
+        def reader():
+            try:
+                for batch in batches:
+                    if stop.is_set():
+                        break
+                    if batch:
+                        pending.put(batch)
+            except BaseException as e:
+                failure.append(e)
+            finally:
+                pending.put(None)
+
+        thread = threading.Thread(target=reader, name="alert-reader", daemon=True)
+        thread.start()
+        fed = 0
+        interrupted = False
+        leftover: List[Optional[List[Alert]]] = []
+        try:
+            done = False
+            while not done:
+                batch = pending.get()
+                if batch is None:
+                    break
+                # Whatever queued up while the last batch was stored goes into one
+                # transaction: fewer commits is what lets the store keep up.
+                while len(batch) < COALESCE:
+                    try:
+                        more = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if more is None:
+                        done = True
+                        break
+                    batch += more
+                self.feed(batch)
+                fed += len(batch)
+        except KeyboardInterrupt:
+            interrupted = True
+        finally:
+            stop.set()
+            # Unblock a reader waiting on a full queue and keep what it queued.
+            deadline = time.monotonic() + READER_GRACE
+            while thread.is_alive() and time.monotonic() < deadline:
+                try:
+                    leftover.append(pending.get(timeout=0.1))
+                except queue.Empty:
+                    pass
+            while not pending.empty():
+                leftover.append(pending.get_nowait())
+        if failure:
+            raise failure[0]
+        if interrupted:
+            for batch in filter(None, leftover):
+                self.feed(batch)
+            raise KeyboardInterrupt
+        return fed
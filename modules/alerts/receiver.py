@@ -0,0 +1,297 @@
+"""Receive alerts straight from Snort instead of tailing text files.
+
+Snort 2's ``output alert_unixsock`` sends one fixed-size ``Alertpkt``
+datagram per event to ``<logdir>/snort_alert``, a Unix datagram socket the
+receiver binds::
+
+    char     alertmsg[256];
+    struct   pcap_pkthdr pkth;         /* timeval (2 x long), caplen, len */
+    uint32_t dlthdr, nethdr, transhdr, data, val;
+    uint8_t  pkt[65535];
+    Event    event;                    /* gid, sid, rev, class, priority,
+                                          event_id, reference, ref_time */
+
+(native layout of 64-bit Linux). Each datagram is received into one
+preallocated buffer and decoded in place with ``struct.unpack_from`` on a
+memoryview; the message is only decoded the first time a gid:sid:rev is
+seen. ``event_id`` increases by one per event, so gaps reveal events Snort
+could not deliver.
+
+Snort 3's ``alert_json`` writes one JSON object per line; ``json_batches``
+reads that stream from a pipe, FIFO or file.
+"""
+
+import json
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from modules.alerts.alert_fast import Alert, parse_stamp
+
+ALERTMSG_LENGTH = 256
+SNAPLEN = 65535
+PKTHDR = struct.Struct("=qqII")
+OFFSETS = struct.Struct("=IIIII")
+EVENT = struct.Struct("=IIIIIIIII")
+PKT_OFFSET = ALERTMSG_LENGTH + PKTHDR.size + OFFSETS.size
+EVENT_OFFSET = (PKT_OFFSET + SNAPLEN + 3) & ~3
+ALERTPKT_SIZE = (EVENT_OFFSET + EVENT.size + 7) & ~7
+NOPACKET_STRUCT = 0x1
+NO_TRANSHDR = 0x2
+PORTS = struct.Struct(">HH")
+# version/IHL, protocol and both addresses of an IPv4 header
+IPV4 = struct.Struct(">B8xB2x4s4s")
+PROTOCOLS = {1: "ICMP", 6: "TCP", 17: "UDP", 58: "ICMP", 132: "SCTP"}
+PORT_PROTOCOLS = (6, 17, 132)
+
+SOCKET_NAME = "snort_alert"
+BATCH_SIZE = 5000
+BATCH_WAIT = 0.2
+RCVBUF = 64 * 1024 * 1024
+
+
+class ReceiverStats:
+    __slots__ = ("received", "bad", "gaps", "last_event")
+
+    def __init__(self):
+        self.received = 0
+        self.bad = 0
+        self.gaps = 0
+        self.last_event: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"received": self.received, "bad": self.bad, "gaps": self.gaps}
+
+
+class AlertpktDecoder:
+    """Decodes ``Alertpkt`` buffers into :class:`Alert` records."""
+
+    def __init__(self):
+        self.messages: Dict[Tuple[int, int, int], str] = {}
+        self.stats = ReceiverStats()
+
+    def decode(self, buf: memoryview) -> Optional[Alert]:
+        stats = self.stats
+        if len(buf) < EVENT_OFFSET + EVENT.size:
+            stats.bad += 1
+            return None
+        gid, sid, rev, _class_id, priority, event_id, *_ = EVENT.unpack_from(buf, EVENT_OFFSET)
+        last = stats.last_event
+        if last is not None and event_id > last + 1:
+            stats.gaps += event_id - last - 1
+        stats.last_event = event_id
+        stats.received += 1
+
+        key = (gid, sid, rev)
+        msg = self.messages.get(key)
+        if msg is None:
+            raw = bytes(buf[:ALERTMSG_LENGTH])
+            msg = self.messages[key] = raw.partition(b"\0")[0].decode("utf-8", "replace")
+        sec, usec, caplen, _len = PKTHDR.unpack_from(buf, ALERTMSG_LENGTH)
+        ts = sec + usec * 1e-6
+        _dlt, nethdr, transhdr, _data, val = OFFSETS.unpack_from(buf, ALERTMSG_LENGTH + PKTHDR.size)
+
+        proto, src, sport, dst, dport = "IP", "", 0, "", 0
+        if not val & NOPACKET_STRUCT and nethdr + 20 <= caplen:
+            ip = PKT_OFFSET + nethdr
+            version = buf[ip] >> 4
+            if version == 4:
+                _vhl, number, src, dst = IPV4.unpack_from(buf, ip)
+                src, dst = socket.inet_ntoa(src), socket.inet_ntoa(dst)
+            elif version == 6 and nethdr + 40 <= caplen:
+                number = buf[ip + 6]
+                src = socket.inet_ntop(socket.AF_INET6, buf[ip + 8 : ip + 24])
+                dst = socket.inet_ntop(socket.AF_INET6, buf[ip + 24 : ip + 40])
+            else:
+                number = 0
+            proto = PROTOCOLS.get(number, "IP")
+            if number in PORT_PROTOCOLS and not val & NO_TRANSHDR and transhdr + 4 <= caplen:
+                sport, dport = PORTS.unpack_from(buf, PKT_OFFSET + transhdr)
+        return Alert(ts, gid, sid, rev, msg, "", priority, proto, src, sport, dst, dport)
+
+
+def pack_alertpkt(
+    ts: float,
+    gid: int,
+    sid: int,
+    rev: int,
+    msg: str,
+    src: str,
+    dst: str,
+    sport: int = 0,
+    dport: int = 0,
+    protocol: int = 6,
+    priority: int = 2,
+    event_id: int = 1,
+) -> bytes:
+    """A synthetic IPv4 ``Alertpkt`` as Snort 2 would send it (tests, benchmarks)."""
+    buf = bytearray(ALERTPKT_SIZE)
+    buf[: len(msg)] = msg.encode()[: ALERTMSG_LENGTH - 1]
+    ip = bytes([0x45, 0, 0, 40, 0, 0, 0, 0, 64, protocol, 0, 0])
+    ip += socket.inet_aton(src) + socket.inet_aton(dst)
+    frame = bytes(14) + ip + PORTS.pack(sport, dport) + bytes(16)
+    sec = int(ts)
+    PKTHDR.pack_into(buf, ALERTMSG_LENGTH, sec, int(round((ts - sec) * 1e6)), len(frame), len(frame))
+    OFFSETS.pack_into(buf, ALERTMSG_LENGTH + PKTHDR.size, 0, 14, 34, 54, 0)
+    buf[PKT_OFFSET : PKT_OFFSET + len(frame)] = frame
+    EVENT.pack_into(buf, EVENT_OFFSET, gid, sid, rev, 0, priority, event_id, 0, sec, 0)
+    return bytes(buf)
+
+
+class UnixSockReceiver:
+    """Binds Snort 2's alert socket and yields decoded alerts in batches."""
+
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE, rcvbuf: int = RCVBUF):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.decoder = AlertpktDecoder()
+        if self.path.is_socket():
+            self.path.unlink()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        except OSError:
+            pass
+        self.sock.bind(str(self.path))
+        self.sock.setblocking(False)
+        self.buffer = bytearray(ALERTPKT_SIZE)
+
+    @property
+    def stats(self) -> ReceiverStats:
+        return self.decoder.stats
+
+    def drain(self, limit: Optional[int] = None) -> List[Alert]:
+        """Decode every datagram already queued (up to ``limit``)."""
+        limit = limit or self.batch_size
+        out: List[Alert] = []
+        buf = memoryview(self.buffer)
+        recv_into, decode = self.sock.recv_into, self.decoder.decode
+        while len(out) < limit:
+            try:
+                n = recv_into(buf)
+            except BlockingIOError:
+                break
+            alert = decode(buf[:n])
+            if alert is not None:
+                out.append(alert)
+        return out
+
+    def batches(
+        self, stop: Optional[threading.Event] = None, wait: float = BATCH_WAIT
+    ) -> Iterator[List[Alert]]:
+        """Yield a batch once ``batch_size`` alerts arrived or ``wait`` seconds passed.
+
+        Snort's send buffer only holds a few datagrams, so each drain returns
+        a handful; they are gathered into full batches because every batch
+        costs a transaction and a rollup update downstream. An empty list
+        means ``wait`` idle seconds.
+        """
+        stop = stop or threading.Event()
+        sock, size = self.sock, self.batch_size
+        while not stop.is_set():
+            batch = self.drain()
+            deadline = time.monotonic() + wait
+            while len(batch) < size:
+                left = deadline - time.monotonic()
+                if left <= 0 or not select.select([sock], [], [], left)[0]:
+                    break
+                batch += self.drain(size - len(batch))
+            yield batch
+
+    def close(self):
+        self.sock.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def decode_json(record: dict, stamps: Dict[str, float]) -> Alert:
+    """One Snort 3 ``alert_json`` object → :class:`Alert`.
+
+    Uses ``seconds`` when configured (more exact than ``timestamp``, which
+    has no year), and either ``src_addr``/``src_port`` or ``src_ap``.
+    """
+    gid, sid, rev = (int(x) for x in record["rule"].split(":"))
+    if "seconds" in record:
+        ts = float(record["seconds"])
+    else:
+        stamp, _, frac = record["timestamp"].partition(".")
+        base = stamps.get(stamp)
+        if base is None:
+            base = stamps[stamp] = parse_stamp(stamp)
+        ts = base + int(frac) * 1e-6 if frac else base
+    if "src_addr" in record:
+        src, sport = record["src_addr"], int(record.get("src_port") or 0)
+        dst, dport = record.get("dst_addr", ""), int(record.get("dst_port") or 0)
+    else:
+        src, _, sport = record.get("src_ap", "").rpartition(":")
+        dst, _, dport = record.get("dst_ap", "").rpartition(":")
+        sport, dport = int(sport or 0), int(dport or 0)
+    return Alert(
+        ts,
+        gid,
+        sid,
+        rev,
+        record.get("msg", ""),
+        record.get("class", ""),
+        int(record.get("priority") or 0),
+        record.get("proto", ""),
+        src,
+        sport,
+        dst,
+        dport,
+    )
+
+
+def json_batches(
+    stream: BinaryIO, batch_size: int = BATCH_SIZE, stats: Optional[ReceiverStats] = None
+) -> Iterator[List[Alert]]:
+    """Yield alerts from a stream of ``alert_json`` lines as they arrive.
+
+    Reads whatever is available (``read1``) so a slow trickle is not held
+    back waiting for a full batch.
+    """
+    stats = stats or ReceiverStats()
+    stamps: Dict[str, float] = {}
+    loads = json.loads
+    partial = b""
+    read = getattr(stream, "read1", stream.read)
+    while True:
+        chunk = read(1024 * 1024)
+        if not chunk:
+            break
+        chunk = partial + chunk
+        cut = chunk.rfind(b"\n") + 1
+        partial = chunk[cut:]
+        out: List[Alert] = []
+        for line in chunk[:cut].splitlines():
+            if not line.strip():
+                continue
+            try:
+                out.append(decode_json(loads(line), stamps))
+            except (ValueError, KeyError, AttributeError):
+                stats.bad += 1
+        stats.received += len(out)
+        for i in range(0, len(out), batch_size):
+            yield out[i : i + batch_size]
+    if partial.strip():
+        try:
+            alert = decode_json(loads(partial), stamps)
+        except (ValueError, KeyError, AttributeError):
+            stats.bad += 1
+        else:
+            stats.received += 1
+            yield [alert]
+
+
+def open_json_stream(source: str) -> BinaryIO:
+    """``-`` for stdin, otherwise a file or FIFO path."""
+    if source == "-":
+        return os.fdopen(os.dup(0), "rb")
+    return open(source, "rb")
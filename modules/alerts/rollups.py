@@ -0,0 +1,288 @@
+"""Fixed-memory rollups over the alert stream.
+
+For each minute the rollup keeps an alert total, Space-Saving summaries of
+the busiest SIDs, sources and destinations (and of the top talkers per
+SID), and a Count-Min sketch that estimates the count of any source or
+(SID, source) pair. Only the last ``minutes`` minutes stay in memory and
+every structure has a fixed capacity, so memory does not grow with the
+alert rate or the number of distinct addresses.
+
+Counts from Space-Saving are upper bounds (``count - error`` is a lower
+bound); Count-Min estimates never undercount.
+"""
+
+import heapq
+import json
+import zlib
+from array import array
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from modules.alerts.alert_fast import Alert
+
+MINUTE = 60
+DEFAULT_MINUTES = 60
+TOP_K = 64
+SID_K = 512
+TALKER_K = 16
+MAX_SID_TALKERS = 256
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+
+
+class SpaceSaving:
+    """Space-Saving top-k summary (Metwally et al.) with a lazy min-heap."""
+
+    __slots__ = ("k", "counts", "errors", "_heap")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[int, Hashable]] = []
+
+    def add(self, item: Hashable, n: int = 1):
+        counts = self.counts
+        count = counts.get(item)
+        if count is not None:
+            count += n
+        elif len(counts) < self.k:
+            count = n
+            self.errors[item] = 0
+        else:
+            # Evict the current minimum; stale heap entries are skipped.
+            heap = self._heap
+            while True:
+                low, victim = heapq.heappop(heap)
+                if counts.get(victim) == low:
+                    break
+            del counts[victim]
+            del self.errors[victim]
+            count = low + n
+            self.errors[item] = low
+        counts[item] = count
+        heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 8 * self.k + 64:
+            self._heap = [(c, i) for i, c in counts.items()]
+            heapq.heapify(self._heap)
+
+    def update(self, counter: Dict[Hashable, int]):
+        for item, n in counter.items():
+            self.add(item, n)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, int, int]]:
+        """(item, count, error) for the ``n`` largest counts."""
+        items = sorted(self.counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        return [(item, count, self.errors[item]) for item, count in items[:n]]
+
+    def to_list(self) -> list:
+        return [[item, count, self.errors[item]] for item, count in self.counts.items()]
+
+    @classmethod
+    def from_list(cls, k: int, rows: Iterable[list]) -> "SpaceSaving":
+        summary = cls(k)
+        for item, count, error in rows:
+            summary.counts[item] = count
+            summary.errors[item] = error
+        summary._heap = [(c, i) for i, c in summary.counts.items()]
+        heapq.heapify(summary._heap)
+        return summary
+
+
+def merge_top(summaries: Iterable[SpaceSaving], n: int) -> List[Tuple[Hashable, int, int]]:
+    """Combine per-minute summaries into the ``n`` largest (item, count, error)."""
+    counts: Counter = Counter()
+    errors: Counter = Counter()
+    for summary in summaries:
+        counts.update(summary.counts)
+        errors.update(summary.errors)
+    return [(item, count, errors[item]) for item, count in counts.most_common(n)]
+
+
+class CountMinSketch:
+    """Count-Min sketch with stable (process-independent) hashing."""
+
+    __slots__ = ("width", "depth", "table")
+
+    def __init__(self, width: int = CMS_WIDTH, depth: int = CMS_DEPTH, table: Optional[array] = None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else array("Q", bytes(8 * width * depth))
+
+    def _cells(self, key: str) -> List[int]:
+        # Double hashing (Kirsch-Mitzenmacher) from two stable C hashes.
+        data = key.encode()
+        h1 = zlib.crc32(data)
+        h2 = zlib.adler32(data) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key: str, n: int = 1):
+        table = self.table
+        for cell in self._cells(key):
+            table[cell] += n
+
+    def update(self, counter: Dict[str, int]):
+        table, width, rows = self.table, self.width, range(self.depth)
+        crc32, adler32 = zlib.crc32, zlib.adler32
+        for key, n in counter.items():
+            data = key.encode()
+            h1 = crc32(data)
+            h2 = adler32(data) | 1
+            for row in rows:
+                table[row * width + (h1 + row * h2) % width] += n
+
+    def estimate(self, key: str) -> int:
+        table = self.table
+        return min(table[cell] for cell in self._cells(key))
+
+    def to_bytes(self) -> bytes:
+        return self.table.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, width: int = CMS_WIDTH, depth: int = CMS_DEPTH):
+        table = array("Q")
+        table.frombytes(data)
+        return cls(width, depth, table)
+
+
+class MinuteBucket:
+    __slots__ = ("minute", "total", "sids", "src", "dst", "sid_src", "sid_dst", "cms")
+
+    def __init__(self, minute: int):
+        self.minute = minute
+        self.total = 0
+        self.sids = SpaceSaving(SID_K)
+        self.src = SpaceSaving(TOP_K)
+        self.dst = SpaceSaving(TOP_K)
+        self.sid_src: Dict[int, SpaceSaving] = {}
+        self.sid_dst: Dict[int, SpaceSaving] = {}
+        self.cms = CountMinSketch()
+
+    def add(self, alerts: List[Alert]):
+        self.total += len(alerts)
+        self.sids.update(Counter(a.sid for a in alerts))
+        self.src.update(Counter(a.src for a in alerts))
+        self.dst.update(Counter(a.dst for a in alerts))
+        pairs = Counter((a.sid, a.src, a.dst) for a in alerts)
+        keys: Counter = Counter()
+        sid_src, sid_dst = self.sid_src, self.sid_dst
+        for (sid, src, dst), n in pairs.items():
+            keys[src] += n
+            keys[f"{sid}|{src}"] += n
+            talkers = sid_src.get(sid)
+            if talkers is None:
+                if len(sid_src) >= MAX_SID_TALKERS:
+                    continue
+                talkers = sid_src[sid] = SpaceSaving(TALKER_K)
+                sid_dst[sid] = SpaceSaving(TALKER_K)
+            talkers.add(src, n)
+            sid_dst[sid].add(dst, n)
+        self.cms.update(keys)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "total": self.total,
+                "sids": self.sids.to_list(),
+                "src": self.src.to_list(),
+                "dst": self.dst.to_list(),
+                "sid_src": {sid: s.to_list() for sid, s in self.sid_src.items()},
+                "sid_dst": {sid: s.to_list() for sid, s in self.sid_dst.items()},
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_row(cls, minute: int, data: str, cms: bytes) -> "MinuteBucket":
+        state = json.loads(data)
+        bucket = cls(minute)
+        bucket.total = state["total"]
+        bucket.sids = SpaceSaving.from_list(SID_K, state["sids"])
+        bucket.src = SpaceSaving.from_list(TOP_K, state["src"])
+        bucket.dst = SpaceSaving.from_list(TOP_K, state["dst"])
+        bucket.sid_src = {int(s): SpaceSaving.from_list(TALKER_K, r) for s, r in state["sid_src"].items()}
+        bucket.sid_dst = {int(s): SpaceSaving.from_list(TALKER_K, r) for s, r in state["sid_dst"].items()}
+        bucket.cms = CountMinSketch.from_bytes(cms)
+        return bucket
+
+
+class Rollups:
+    """Sliding window of per-minute buckets; the aggregation stage of the alert pipeline."""
+
+    def __init__(self, minutes: int = DEFAULT_MINUTES):
+        self.minutes = minutes
+        self.buckets: Dict[int, MinuteBucket] = {}
+        self.dirty: set = set()
+        self.late = 0
+
+    def add(self, alerts: Iterable[Alert]):
+        by_minute: Dict[int, List[Alert]] = {}
+        for a in alerts:
+            by_minute.setdefault(int(a.ts // MINUTE), []).append(a)
+        if not by_minute:
+            return
+        newest = max(max(by_minute), max(self.buckets, default=0))
+        oldest = newest - self.minutes + 1
+        for minute, batch in by_minute.items():
+            if minute < oldest:
+                self.late += len(batch)
+                continue
+            bucket = self.buckets.get(minute)
+            if bucket is None:
+                bucket = self.buckets[minute] = MinuteBucket(minute)
+            bucket.add(batch)
+            self.dirty.add(minute)
+        for minute in [m for m in self.buckets if m < oldest]:
+            del self.buckets[minute]
+
+    def _window(self, minutes: int, now: Optional[float]) -> List[MinuteBucket]:
+        if now is None:
+            end = max(self.buckets, default=0)
+        else:
+            end = int(now // MINUTE)
+        return [b for m, b in self.buckets.items() if end - minutes < m <= end]
+
+    # ---------------- Queries ---------------- #
+    def top(
+        self,
+        by: str = "src",
+        sid: Optional[int] = None,
+        minutes: int = 5,
+        n: int = 10,
+        now: Optional[float] = None,
+    ) -> List[Tuple[Hashable, int, int]]:
+        """Top sources, destinations (``by``) or SIDs (``by="sid"``) over the window."""
+        buckets = self._window(minutes, now)
+        if by == "sid":
+            return merge_top((b.sids for b in buckets), n)
+        if sid is None:
+            return merge_top((getattr(b, by) for b in buckets), n)
+        attr = "sid_src" if by == "src" else "sid_dst"
+        return merge_top((getattr(b, attr)[sid] for b in buckets if sid in getattr(b, attr)), n)
+
+    def estimate(self, src: str, sid: Optional[int] = None, minutes: int = 5, now: Optional[float] = None) -> int:
+        """Count-Min estimate of alerts from ``src`` (for ``sid``) over the window."""
+        key = f"{sid}|{src}" if sid is not None else src
+        return sum(b.cms.estimate(key) for b in self._window(minutes, now))
+
+    def rate(self, sid: Optional[int] = None, minutes: int = 60, now: Optional[float] = None) -> List[Tuple[int, int]]:
+        """(minute start epoch, alerts) per minute, oldest first."""
+        series = []
+        for bucket in sorted(self._window(minutes, now), key=lambda b: b.minute):
+            count = bucket.total if sid is None else bucket.sids.counts.get(sid, 0)
+            series.append((bucket.minute * MINUTE, count))
+        return series
+
+    # ---------------- Persistence ---------------- #
+    def take_dirty(self) -> List[MinuteBucket]:
+        buckets = [self.buckets[m] for m in sorted(self.dirty) if m in self.buckets]
+        self.dirty.clear()
+        return buckets
+
+    def load(self, buckets: Iterable[MinuteBucket]):
+        for bucket in buckets:
+            self.buckets[bucket.minute] = bucket
+        newest = max(self.buckets, default=0)
+        for minute in [m for m in self.buckets if m <= newest - self.minutes]:
+            del self.buckets[minute]
@@ -0,0 +1,115 @@
+"""Follow a growing alert file across rotation and truncation.
+
+The tailer reads whatever was appended since the last call in large
+chunks and hands back complete lines only; a line Snort is halfway through
+writing is held until its newline arrives. Rotation is detected by the
+path pointing at a different inode (the old file is drained first), and
+truncation by the file shrinking below the read position (a file that is
+truncated and then regrows past that position between two reads cannot be
+told apart from one that only grew).
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+READ_SIZE = 1024 * 1024
+POLL_INTERVAL = 0.25
+
+
+class FileTailer:
+    def __init__(self, path: Path, from_start: bool = False, read_size: int = READ_SIZE):
+        self.path = Path(path)
+        self.read_size = read_size
+        self.f = None
+        self.inode = None
+        self.partial = b""
+        self.rotations = 0
+        self.truncations = 0
+        self._open(seek_end=not from_start)
+
+    def _open(self, seek_end: bool = False) -> bool:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self.close()
+        self.f = f
+        self.inode = os.fstat(f.fileno()).st_ino
+        if seek_end:
+            f.seek(0, os.SEEK_END)
+        self.partial = b""
+        return True
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    @property
+    def position(self) -> int:
+        """Offset just past the last complete line returned."""
+        return self.f.tell() - len(self.partial) if self.f is not None else 0
+
+    def resume(self, inode: int, offset: int) -> bool:
+        """Continue from ``offset`` if the file is still the one (``inode``) it refers to."""
+        if self.f is None or inode != self.inode:
+            return False
+        if offset > os.fstat(self.f.fileno()).st_size:
+            return False
+        self.f.seek(offset)
+        self.partial = b""
+        return True
+
+    def _drain(self) -> List[str]:
+        lines: List[str] = []
+        while True:
+            chunk = self.f.read(self.read_size)
+            if not chunk:
+                return lines
+            chunk = self.partial + chunk
+            cut = chunk.rfind(b"\n") + 1
+            self.partial = chunk[cut:]
+            if cut:
+                lines += chunk[:cut].decode("utf-8", "replace").splitlines()
+
+    def read_lines(self) -> List[str]:
+        """Complete lines appended since the last call (may be empty)."""
+        if self.f is None and not self._open():
+            return []
+        if os.fstat(self.f.fileno()).st_size < self.f.tell():
+            # Truncated in place (copytruncate): start over. Checked before
+            # reading so new data is not read from the stale offset.
+            self.truncations += 1
+            logger.info(f"{self.path} was truncated, reading from the start")
+            self.f.seek(0)
+            self.partial = b""
+        lines = self._drain()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return lines  # rotated away and not yet recreated; keep the old handle
+        if st.st_ino != self.inode:
+            # Rotated: the old file is fully drained above, continue with the new one.
+            self.rotations += 1
+            logger.info(f"{self.path} was rotated, following the new file")
+            if self._open():
+                lines += self._drain()
+        return lines
+
+    def follow(
+        self, stop: Optional[threading.Event] = None, interval: float = POLL_INTERVAL
+    ) -> Iterator[List[str]]:
+        """Yield batches of new lines until ``stop`` is set."""
+        while not (stop and stop.is_set()):
+            lines = self.read_lines()
+            if lines:
+                yield lines
+            else:
+                time.sleep(interval)
@@ -0,0 +1,259 @@
+"""Content-addressed, deduplicated backups of the rules tree.
+
+Layout under ``rules/backups``::
+
+    objects/ab/cdef...   zlib-compressed chunks, named by SHA-256 of the raw data
+    snapshots/<id>.json  one manifest per backup: path -> size, mtime, mode, chunks
+
+Files are split into fixed-size chunks and only chunks not already in the
+store are written. Files whose size and mtime match the previous snapshot
+reuse its chunk list without being read, so backing up an unchanged tree
+costs a directory walk and one small manifest.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotInfo(NamedTuple):
+    id: str
+    created: float
+    files: int
+    size: int
+
+
+class BackupStats(NamedTuple):
+    id: str
+    files: int
+    size: int
+    files_read: int
+    chunks_written: int
+    bytes_written: int
+    elapsed: float
+
+
+class RestoreStats(NamedTuple):
+    restored: List[str]
+    removed: List[str]  # files the snapshot did not have
+
+
+class BackupStore:
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.objects = self.store_dir / "objects"
+        self.snapshots = self.store_dir / "snapshots"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.snapshots.mkdir(parents=True, exist_ok=True)
+
+    # ---------------- Objects ---------------- #
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def _put_chunk(self, data: bytes) -> Tuple[str, int]:
+        """Store ``data`` if new; returns (digest, compressed bytes written)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if path.exists():
+            return digest, 0
+        path.parent.mkdir(exist_ok=True)
+        packed = zlib.compress(data, 1)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp.")
+        with os.fdopen(fd, "wb") as f:
+            f.write(packed)
+        os.replace(tmp, path)
+        return digest, len(packed)
+
+    def _get_chunk(self, digest: str) -> bytes:
+        data = zlib.decompress(self._object_path(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Corrupt backup chunk {digest}")
+        return data
+
+    # ---------------- Snapshots ---------------- #
+    def _snapshot_path(self, snapshot_id: str) -> Path:
+        return self.snapshots / f"{snapshot_id}.json"
+
+    def load(self, snapshot_id: str) -> dict:
+        path = self._snapshot_path(snapshot_id)
+        if not path.exists():
+            raise FileNotFoundError(f"No such snapshot: {snapshot_id}")
+        return json.loads(path.read_text())
+
+    def snapshot_ids(self) -> List[str]:
+        return sorted(p.stem for p in self.snapshots.glob("*.json"))
+
+    def list_snapshots(self) -> List[SnapshotInfo]:
+        infos = []
+        for snapshot_id in self.snapshot_ids():
+            data = self.load(snapshot_id)
+            files = data["files"]
+            infos.append(
+                SnapshotInfo(
+                    snapshot_id,
+                    data["created"],
+                    len(files),
+                    sum(f["size"] for f in files.values()),
+                )
+            )
+        return infos
+
+    def _new_id(self) -> str:
+        base = datetime.now().strftime("%Y%m%d_%H%M%S")
+        snapshot_id, n = base, 1
+        while self._snapshot_path(snapshot_id).exists():
+            n += 1
+            snapshot_id = f"{base}_{n}"
+        return snapshot_id
+
+    # ---------------- Backup / restore ---------------- #
+    def _walk(self, root: Path):
+        for dirpath, dirnames, filenames in os.walk(root):
+            here = Path(dirpath)
+            # never back up the store itself, or hidden scratch dirs
+            dirnames[:] = sorted(
+                d for d in dirnames if not d.startswith(".") and here / d != self.store_dir
+            )
+            for name in sorted(filenames):
+                if not name.startswith("."):
+                    yield here / name
+
+    def backup(self, root: Path) -> BackupStats:
+        start = time.perf_counter()
+        root = Path(root)
+        ids = self.snapshot_ids()
+        previous = self.load(ids[-1])["files"] if ids else {}
+        files: Dict[str, dict] = {}
+        files_read = chunks_written = bytes_written = 0
+
+        for path in self._walk(root):
+            rel = path.relative_to(root).as_posix()
+            st = path.stat()
+            old = previous.get(rel)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                files[rel] = old
+                continue
+            chunks = []
+            with open(path, "rb") as f:
+                for data in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest, written = self._put_chunk(data)
+                    chunks.append(digest)
+                    if written:
+                        chunks_written += 1
+                        bytes_written += written
+            files_read += 1
+            files[rel] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "mode": st.st_mode & 0o777,
+                "chunks": chunks,
+            }
+
+        snapshot_id = self._new_id()
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "id": snapshot_id,
+            "created": time.time(),
+            "root": str(root),
+            "files": files,
+        }
+        fd, tmp = tempfile.mkstemp(dir=self.snapshots, prefix=".tmp.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self._snapshot_path(snapshot_id))
+        stats = BackupStats(
+            snapshot_id,
+            len(files),
+            sum(f["size"] for f in files.values()),
+            files_read,
+            chunks_written,
+            bytes_written,
+            time.perf_counter() - start,
+        )
+        logger.info(
+            f"Backup {snapshot_id}: {stats.files} files, {files_read} read, "
+            f"{chunks_written} new chunks ({bytes_written} bytes) in {stats.elapsed:.3f}s"
+        )
+        return stats
+
+    def stale(self, snapshot_id: str, root: Path) -> List[str]:
+        """Files under ``root`` that are not in the snapshot (the store and dot-files excluded)."""
+        root = Path(root)
+        files = self.load(snapshot_id)["files"]
+        return [
+            rel for rel in (path.relative_to(root).as_posix() for path in self._walk(root)) if rel not in files
+        ]
+
+    def restore(self, snapshot_id: str, root: Path) -> RestoreStats:
+        """Put ``root`` back as it was: rewrite the snapshot's files and delete the others."""
+        root = Path(root)
+        removed = self.stale(snapshot_id, root)
+        restored = []
+        for rel, entry in self.load(snapshot_id)["files"].items():
+            dest = root / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for digest in entry["chunks"]:
+                        f.write(self._get_chunk(digest))
+                os.chmod(tmp, entry.get("mode", 0o644))
+                os.replace(tmp, dest)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            restored.append(rel)
+        for rel in removed:
+            (root / rel).unlink()
+        logger.info(f"Restored {len(restored)} files from backup {snapshot_id}, removed {len(removed)}")
+        return RestoreStats(restored, removed)
+
+    # ---------------- Retention ---------------- #
+    def prune(self, keep_last: Optional[int] = None, keep_days: Optional[float] = None):
+        """Drop snapshots outside the retention policy, then unreferenced chunks.
+
+        A snapshot is kept if it is among the ``keep_last`` newest or younger
+        than ``keep_days``. Returns (snapshots removed, chunks removed).
+        """
+        ids = self.snapshot_ids()
+        cutoff = time.time() - keep_days * 86400 if keep_days is not None else None
+        keep = set(ids[-keep_last:]) if keep_last else set()
+        removed = 0
+        for snapshot_id in ids:
+            if snapshot_id in keep:
+                continue
+            if cutoff is not None and self.load(snapshot_id)["created"] >= cutoff:
+                continue
+            if keep_last is None and cutoff is None:
+                continue
+            self._snapshot_path(snapshot_id).unlink()
+            removed += 1
+
+        live = set()
+        for snapshot_id in self.snapshot_ids():
+            for entry in self.load(snapshot_id)["files"].values():
+                live.update(entry["chunks"])
+        dropped = 0
+        for bucket in self.objects.iterdir():
+            if not bucket.is_dir():
+                continue
+            for obj in bucket.iterdir():
+                if bucket.name + obj.name not in live:
+                    obj.unlink()
+                    dropped += 1
+        logger.info(f"Pruned {removed} snapshot(s) and {dropped} unreferenced chunk(s)")
+        return removed, dropped
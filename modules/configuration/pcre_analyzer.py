@@ -0,0 +1,364 @@
+"""ReDoS / catastrophic-backtracking checks for ``pcre:`` options.
+
+Two passes over every pcre in the enabled ruleset:
+
+* a static scan of the pattern structure for nested unbounded quantifiers
+  (``(a+)+``), quantified alternations whose branches can match the same
+  character (``(a|ab)*``, ``(\\w|\\d)+``) and adjacent unbounded quantifiers
+  over overlapping atoms (``\\d+\\d*``);
+* a bounded fuzz that times Python's backtracking ``re`` engine (close
+  enough to PCRE's behaviour) on adversarial "pump + non-matching suffix"
+  inputs. Patterns run in worker processes; a worker that blows its
+  per-pattern time budget is killed and the pattern reported.
+"""
+
+import multiprocessing
+import re
+import time
+from functools import lru_cache
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from modules.configuration.rule_parser import iter_rules
+
+# Snort-only modifiers (R, U, B, P, H, ...) select buffers and do not change
+# the regex language, so only these need translating.
+PY_FLAGS = {"i": re.IGNORECASE, "s": re.DOTALL, "m": re.MULTILINE, "x": re.VERBOSE}
+ASCII = [chr(c) for c in range(128)]
+PUMP_LENGTHS = (32, 256, 2048)
+DEFAULT_BUDGET = 0.25
+
+
+class PcreFinding(NamedTuple):
+    sid: int
+    path: str
+    line_no: int
+    pattern: str
+    issues: List[str]
+    fuzz_seconds: Optional[float] = None
+    timed_out: bool = False
+
+    @property
+    def pathological(self) -> bool:
+        return self.timed_out or any(i.startswith("exponential") for i in self.issues)
+
+
+# ---------------- Pattern extraction ---------------- #
+def split_pcre(value: str) -> Tuple[str, str]:
+    """Turn a rule's ``"/regex/flags"`` value into (regex, flags)."""
+    raw = value.lstrip("!").strip()
+    if raw.startswith('"') and raw.endswith('"'):
+        raw = raw[1:-1]
+    if raw.startswith("m") and len(raw) > 1 and not raw[1].isalnum():
+        delim, raw = raw[1], raw[2:]
+    elif raw.startswith("/"):
+        delim, raw = "/", raw[1:]
+    else:
+        return raw, ""
+    end = raw.rfind(delim)
+    return (raw[:end], raw[end + 1 :]) if end >= 0 else (raw, "")
+
+
+def to_python(pattern: str, flags: str) -> Tuple[str, int]:
+    py_flags = 0
+    for flag in flags:
+        py_flags |= PY_FLAGS.get(flag, 0)
+    # PCRE's \x{hh} escape is the common incompatibility in rule packs.
+    pattern = re.sub(r"\\x\{([0-9A-Fa-f]{1,2})\}", r"\\x\1", pattern)
+    return pattern, py_flags
+
+
+def extract_pcres(files: Iterable[Path], root: Path):
+    """Yield (sid, path, line_no, value) for every pcre in active rules."""
+    for path in files:
+        rel = path.relative_to(root).as_posix()
+        for rule in iter_rules(path):
+            if not rule.enabled:
+                continue
+            for key, value in rule.options:
+                if key == "pcre":
+                    yield rule.sid, rel, rule.line_no, value
+
+
+# ---------------- Static analysis ---------------- #
+class _Group:
+    __slots__ = ("branches", "start")
+
+    def __init__(self, start):
+        # each branch is a list of (text, chars, repeats, mandatory) elements;
+        # ``repeats`` is true when the element is or contains an unbounded
+        # quantifier
+        self.branches: List[List[tuple]] = [[]]
+        self.start = start
+
+    @property
+    def repeats(self) -> bool:
+        return any(elem[2] for branch in self.branches for elem in branch)
+
+    def chars(self) -> FrozenSet[str]:
+        return frozenset().union(*(elem[1] for branch in self.branches for elem in branch))
+
+
+@lru_cache(maxsize=4096)
+def _atom_chars(atom: str, flags: int) -> FrozenSet[str]:
+    """ASCII characters an atom can match (empty if it cannot be compiled)."""
+    try:
+        compiled = re.compile(atom, flags & ~re.VERBOSE)
+    except re.error:
+        return frozenset()
+    return frozenset(c for c in ASCII if compiled.fullmatch(c))
+
+
+def _branch_is_ambiguous(branch: List[tuple]) -> bool:
+    """True if repeating ``branch`` can split the same input several ways.
+
+    A branch is safe when some mandatory element matches characters the
+    repeated elements never do, e.g. the ``\\.`` in ``(\\d+\\.)+``.
+    """
+    repeated = frozenset().union(*(elem[1] for elem in branch if elem[2]))
+    if not repeated:
+        return False
+    return not any(elem[3] and elem[1] and not (elem[1] & repeated) for elem in branch)
+
+
+def _quantifier_at(pattern: str, i: int) -> Tuple[int, bool, bool]:
+    """Return (length, unbounded, mandatory) of the quantifier at ``pattern[i]``.
+
+    Length is 0 when there is no quantifier (the atom then occurs once).
+    """
+    if i >= len(pattern):
+        return 0, False, True
+    ch = pattern[i]
+    if ch in "*+?":
+        n, unbounded, mandatory = 1, ch != "?", ch == "+"
+    elif ch == "{":
+        m = re.match(r"\{(\d*)(,?)(\d*)\}", pattern[i:])
+        if not m or not (m.group(1) or m.group(3)):
+            return 0, False, True
+        n = len(m.group(0))
+        unbounded = bool(m.group(2)) and not m.group(3)
+        mandatory = int(m.group(1) or 0) > 0
+    else:
+        return 0, False, True
+    if i + n < len(pattern) and pattern[i + n] in "?+":
+        n += 1
+    return n, unbounded, mandatory
+
+
+def _next_atom(pattern: str, i: int) -> int:
+    """Index just past the atom starting at ``pattern[i]`` (non-group atoms)."""
+    ch = pattern[i]
+    if ch == "\\":
+        if i + 1 < len(pattern) and pattern[i + 1] in "xX" and i + 2 < len(pattern):
+            if pattern[i + 2] == "{":
+                return pattern.find("}", i) + 1 or len(pattern)
+            return min(i + 4, len(pattern))
+        return i + 2
+    if ch == "[":
+        j = i + 1
+        if j < len(pattern) and pattern[j] == "^":
+            j += 1
+        if j < len(pattern) and pattern[j] == "]":
+            j += 1
+        while j < len(pattern) and pattern[j] != "]":
+            j += 2 if pattern[j] == "\\" else 1
+        return j + 1
+    return i + 1
+
+
+def static_issues(pattern: str, flags: int = 0) -> List[str]:
+    """Structural ReDoS findings for a Python-compatible pattern."""
+    issues: List[str] = []
+    stack = [_Group(0)]
+    # previous unbounded element at each nesting level, for adjacency checks
+    prev: List[Optional[tuple]] = [None]
+    i = 0
+    n = len(pattern)
+    while i < n:
+        ch = pattern[i]
+        if ch == "(":
+            j = i + 1
+            if pattern.startswith("?", j):
+                # (?:...), (?i), lookarounds, named groups
+                m = re.match(r"\?(?:[:=!>|]|<[=!]|P?<[A-Za-z_]\w*>|[a-zA-Z-]+[:)])", pattern[j:])
+                if m and m.group(0).endswith(")"):
+                    i = j + len(m.group(0))
+                    continue
+                j += len(m.group(0)) if m else 1
+            stack.append(_Group(i))
+            prev.append(None)
+            i = j
+            continue
+
+        if ch == ")" and len(stack) > 1:
+            group = stack.pop()
+            prev.pop()
+            qlen, unbounded, mandatory = _quantifier_at(pattern, i + 1)
+            text = pattern[group.start : i + 1 + qlen]
+            if unbounded and group.repeats and any(
+                _branch_is_ambiguous(branch) for branch in group.branches
+            ):
+                issues.append(f"exponential: nested quantifier in {text}")
+            elif unbounded and len(group.branches) > 1:
+                firsts = [branch[0][1] if branch else frozenset() for branch in group.branches]
+                bodies = ["".join(elem[0] for elem in branch) for branch in group.branches]
+                if len(set(bodies)) < len(bodies) or any(
+                    firsts[a] & firsts[b]
+                    for a in range(len(firsts))
+                    for b in range(a + 1, len(firsts))
+                ):
+                    issues.append(f"exponential: ambiguous alternation in {text}")
+            stack[-1].branches[-1].append(
+                (text, group.chars(), unbounded or group.repeats, mandatory)
+            )
+            prev[-1] = None
+            i += 1 + qlen
+            continue
+
+        if ch == "|":
+            stack[-1].branches.append([])
+            prev[-1] = None
+            i += 1
+            continue
+        if ch in "^$":
+            i += 1
+            continue
+
+        end = _next_atom(pattern, i)
+        atom = pattern[i:end]
+        qlen, unbounded, mandatory = _quantifier_at(pattern, end)
+        elem = (pattern[i : end + qlen], _atom_chars(atom, flags), unbounded, mandatory)
+        stack[-1].branches[-1].append(elem)
+        if unbounded:
+            last = prev[-1]
+            if last and last[1] & elem[1]:
+                issues.append(f"polynomial: adjacent quantifiers {last[0]}{elem[0]} overlap")
+            prev[-1] = elem
+        elif mandatory:
+            prev[-1] = None
+        i = end + qlen
+    return issues
+
+
+# ---------------- Fuzzing ---------------- #
+def adversarial_inputs(pattern: str, flags: int) -> List[str]:
+    """Pump strings built from the characters the pattern itself repeats."""
+    pumps = {"a", "0", " ", "\t", "aa", "a0", "ab"}
+    for lit in re.findall(r"[A-Za-z0-9 _\-./:=]", re.sub(r"\\.", "", pattern))[:16]:
+        pumps.add(lit)
+    for cls in re.findall(r"\\[dws]|\[[^\]]+\]|\.", pattern)[:8]:
+        chars = sorted(_atom_chars(cls, flags))
+        if chars:
+            pumps.add(chars[len(chars) // 2])
+    inputs = []
+    for pump in sorted(pumps):
+        for length in PUMP_LENGTHS:
+            body = pump * (length // len(pump))
+            inputs.extend((body + "\x00", body + "!\n"))
+    return inputs
+
+
+def _fuzz_worker(conn, items):
+    for key, pattern, flags in items:
+        conn.send(("start", key))
+        try:
+            compiled = re.compile(pattern, flags)
+        except re.error as e:
+            conn.send(("done", key, None, f"not compilable: {e}"))
+            continue
+        start = time.perf_counter()
+        for text in adversarial_inputs(pattern, flags):
+            compiled.search(text)
+        conn.send(("done", key, time.perf_counter() - start, None))
+    conn.send(("exit", None))
+    conn.close()
+
+
+def fuzz_patterns(
+    items: List[Tuple[int, str, int]], budget=DEFAULT_BUDGET, jobs: Optional[int] = None
+) -> Dict[int, Tuple[Optional[float], bool, Optional[str]]]:
+    """Time every (key, pattern, flags); returns key -> (seconds, timed_out, error).
+
+    Each worker process takes a chunk of patterns and reports when it starts
+    and finishes each one. A worker still on the same pattern after
+    ``budget`` seconds is killed, the pattern is marked timed out and a new
+    worker picks up the rest of its chunk.
+    """
+    jobs = max(1, min(jobs or multiprocessing.cpu_count(), len(items) or 1))
+    chunks = [items[k::jobs] for k in range(jobs)]
+    results: Dict[int, Tuple[Optional[float], bool, Optional[str]]] = {}
+    running = {}  # conn -> [process, remaining items, current key, started]
+
+    def spawn(chunk):
+        if not chunk:
+            return
+        parent, child = multiprocessing.Pipe(duplex=False)
+        proc = multiprocessing.Process(target=_fuzz_worker, args=(child, chunk), daemon=True)
+        proc.start()
+        child.close()
+        running[parent] = [proc, list(chunk), None, None]
+
+    for chunk in chunks:
+        spawn(chunk)
+
+    while running:
+        for conn in wait(list(running), timeout=0.02):
+            state = running[conn]
+            try:
+                msg = conn.recv()
+            except EOFError:
+                msg = ("exit", None)
+            if msg[0] == "start":
+                state[2], state[3] = msg[1], time.perf_counter()
+            elif msg[0] == "done":
+                _, key, seconds, error = msg
+                results[key] = (seconds, False, error)
+                state[1] = [item for item in state[1] if item[0] != key]
+                state[2] = None
+            else:
+                state[0].join()
+                del running[conn]
+
+        now = time.perf_counter()
+        for conn, (proc, remaining, key, started) in list(running.items()):
+            if key is not None and now - started > budget:
+                proc.kill()
+                proc.join()
+                del running[conn]
+                results[key] = (now - started, True, None)
+                spawn([item for item in remaining if item[0] != key])
+    return results
+
+
+# ---------------- Report ---------------- #
+def analyze(
+    files: Iterable[Path],
+    root: Path,
+    fuzz=True,
+    budget=DEFAULT_BUDGET,
+    jobs: Optional[int] = None,
+) -> List[PcreFinding]:
+    """Return a finding for every pcre with static issues or a slow/failed fuzz."""
+    entries = list(extract_pcres(files, root))
+    compiled = []
+    static = {}
+    for key, (sid, rel, line_no, value) in enumerate(entries):
+        pattern, flags = to_python(*split_pcre(value))
+        static[key] = static_issues(pattern, flags)
+        compiled.append((key, pattern, flags))
+
+    fuzzed = fuzz_patterns(compiled, budget=budget, jobs=jobs) if fuzz and compiled else {}
+
+    findings = []
+    for key, (sid, rel, line_no, value) in enumerate(entries):
+        issues = list(static[key])
+        seconds, timed_out, error = fuzzed.get(key, (None, False, None))
+        if error:
+            issues.append(error)
+        if timed_out:
+            issues.append(f"fuzz exceeded {budget:.2f}s budget")
+        if issues:
+            findings.append(PcreFinding(sid, rel, line_no, value, issues, seconds, timed_out))
+    findings.sort(key=lambda f: (not f.pathological, -(f.fuzz_seconds or 0), f.path, f.line_no))
+    return findings
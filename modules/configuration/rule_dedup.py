@@ -0,0 +1,64 @@
+"""Duplicate-SID detection across the enabled ruleset.
+
+Snort refuses (or silently collapses) two active rules with the same
+gid:sid. Before a build we make one pass over every active rule, keep the
+highest ``rev`` for each gid:sid and comment out the rest in the output.
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Set
+
+from modules.configuration.rule_index import Location
+
+
+class Conflict(NamedTuple):
+    gid: int
+    sid: int
+    kept: Location
+    dropped: List[Location]
+
+    def describe(self) -> str:
+        dropped = ", ".join(f"{d.path}:{d.line_no} (rev {d.rev})" for d in self.dropped)
+        return (
+            f"{self.gid}:{self.sid} kept {self.kept.path}:{self.kept.line_no} "
+            f"(rev {self.kept.rev}), dropped {dropped}"
+        )
+
+
+def _order(loc: Location):
+    return (loc.path, loc.line_no)
+
+
+def find_duplicates(locations: Iterable[Location]) -> List[Conflict]:
+    """Return one :class:`Conflict` per gid:sid that is active more than once.
+
+    The winner is the highest rev; ties go to the rule that comes first in
+    build order (file name, then line). Runs in linear time.
+    """
+    winners: Dict[tuple, Location] = {}
+    losers: Dict[tuple, List[Location]] = {}
+    for loc in locations:
+        if not loc.active:
+            continue
+        key = (loc.gid, loc.sid)
+        best = winners.get(key)
+        if best is None:
+            winners[key] = loc
+            continue
+        if loc.rev > best.rev or (loc.rev == best.rev and _order(loc) < _order(best)):
+            winners[key] = loc
+            loc = best
+        losers.setdefault(key, []).append(loc)
+
+    return [
+        Conflict(key[0], key[1], winners[key], sorted(dropped, key=_order))
+        for key, dropped in sorted(losers.items())
+    ]
+
+
+def skipped_offsets(conflicts: Iterable[Conflict]) -> Dict[str, Set[int]]:
+    """Map enabled file name -> byte offsets of the rule lines to leave out."""
+    skip: Dict[str, Set[int]] = {}
+    for conflict in conflicts:
+        for loc in conflict.dropped:
+            skip.setdefault(loc.path.rsplit("/", 1)[-1], set()).add(loc.offset)
+    return skip
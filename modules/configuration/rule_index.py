@@ -0,0 +1,329 @@
+"""Persistent SID index over rules/sources, rules/enabled and rules/disabled.
+
+The index maps every SID to the file, line and byte offset it lives at, its
+rev and whether it is active. It is stored next to the rule directories and
+refreshed incrementally: only files whose size or mtime changed since the
+last run are re-parsed.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from modules.configuration.rule_parser import iter_rules
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_VERSION = 1
+STATES = ("sources", "enabled", "disabled")
+# Rules enabled by SID from sources/ or disabled/ are appended here.
+OVERRIDE_FILE = "sid-overrides.rules"
+COPY_BUFSIZE = 1024 * 1024
+
+
+class Location(NamedTuple):
+    sid: int
+    gid: int
+    rev: int
+    path: str  # relative to the rules dir, e.g. "enabled/emerging-scan.rules"
+    line_no: int
+    offset: int
+    enabled: bool
+
+    @property
+    def state(self) -> str:
+        return self.path.split("/", 1)[0]
+
+    @property
+    def active(self) -> bool:
+        """True when Snort will load this rule (enabled dir and not commented)."""
+        return self.state == "enabled" and self.enabled
+
+
+class RuleIndex:
+    def __init__(self, rules_dir: Path, index_path: Optional[Path] = None):
+        self.rules_dir = Path(rules_dir)
+        self.index_path = index_path or self.rules_dir / ".index.json"
+        self.journal_path = self.rules_dir / ".journal.json"
+        self.files: Dict[str, dict] = {}
+        self.by_sid: Dict[int, List[Location]] = {}
+        if recover_journal(self.journal_path):
+            logger.warning("Completed an interrupted rule transaction")
+        self._load()
+
+    # ---------------- Persistence ---------------- #
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            logger.warning(f"Rule index at {self.index_path} is unreadable, rebuilding")
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.files = data.get("files", {})
+        for rel, entry in self.files.items():
+            self._add_entries(rel, entry["rules"])
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "files": self.files}
+        fd, tmp = tempfile.mkstemp(dir=self.index_path.parent, prefix=".index.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+
+    # ---------------- Maintenance ---------------- #
+    def _add_entries(self, rel: str, rows: Iterable[list]):
+        for sid, gid, rev, line_no, offset, enabled in rows:
+            loc = Location(sid, gid, rev, rel, line_no, offset, bool(enabled))
+            self.by_sid.setdefault(sid, []).append(loc)
+
+    def _drop_entries(self, rel: str):
+        entry = self.files.pop(rel, None)
+        if not entry:
+            return
+        for row in entry["rules"]:
+            locs = self.by_sid.get(row[0], [])
+            locs[:] = [loc for loc in locs if loc.path != rel]
+            if not locs:
+                self.by_sid.pop(row[0], None)
+
+    def update_file(self, path: Path):
+        """Re-parse a single rules file (or forget it if it no longer exists)."""
+        rel = path.relative_to(self.rules_dir).as_posix()
+        self._drop_entries(rel)
+        if not path.exists():
+            return
+        st = path.stat()
+        rows = [
+            [r.sid, r.gid, r.rev, r.line_no, r.offset, int(r.enabled)]
+            for r in iter_rules(path)
+        ]
+        self.files[rel] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "rules": rows}
+        self._add_entries(rel, rows)
+
+    def rule_files(self) -> Iterator[Path]:
+        for state in STATES:
+            d = self.rules_dir / state
+            if d.is_dir():
+                yield from sorted(d.glob("*.rules"))
+
+    def refresh(self) -> int:
+        """Bring the index up to date; returns the number of files re-parsed."""
+        seen = set()
+        changed = 0
+        for path in self.rule_files():
+            rel = path.relative_to(self.rules_dir).as_posix()
+            seen.add(rel)
+            st = path.stat()
+            entry = self.files.get(rel)
+            if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                continue
+            self.update_file(path)
+            changed += 1
+
+        for rel in [rel for rel in self.files if rel not in seen]:
+            self._drop_entries(rel)
+            changed += 1
+
+        if changed:
+            self.save()
+            logger.info(f"Rule index refreshed ({changed} file(s) re-parsed)")
+        return changed
+
+    # ---------------- Lookups ---------------- #
+    def lookup(self, sid: int) -> List[Location]:
+        return list(self.by_sid.get(sid, ()))
+
+    def lookup_range(self, lo: int, hi: int) -> Dict[int, List[Location]]:
+        if hi - lo < len(self.by_sid):
+            sids = (sid for sid in range(lo, hi + 1) if sid in self.by_sid)
+        else:
+            sids = (sid for sid in self.by_sid if lo <= sid <= hi)
+        return {sid: self.lookup(sid) for sid in sorted(sids)}
+
+    def locations(self, state: Optional[str] = None) -> Iterator[Location]:
+        for locs in self.by_sid.values():
+            for loc in locs:
+                if state is None or loc.state == state:
+                    yield loc
+
+    def file_counts(self, rel: str) -> Tuple[int, int]:
+        """Return (active, commented) rule counts for one indexed file."""
+        rows = self.files.get(rel, {}).get("rules", [])
+        active = sum(1 for row in rows if row[5])
+        return active, len(rows) - active
+
+    # ---------------- Editing ---------------- #
+    def read_line(self, loc: Location) -> str:
+        """Fetch a rule's raw line straight from its byte offset."""
+        with open(self.rules_dir / loc.path, "rb") as f:
+            f.seek(loc.offset)
+            return f.readline().decode("utf-8", "replace").rstrip("\r\n")
+
+    def plan_state(
+        self, sids: Iterable[int], enable: bool, file: Optional[str] = None
+    ) -> List[Tuple[str, Location]]:
+        """Work out the line edits needed to enable/disable ``sids``.
+
+        Returns ``(action, location)`` pairs where action is one of
+        ``"uncomment"``, ``"comment"`` or ``"copy"`` (append the rule from
+        sources/disabled to :data:`OVERRIDE_FILE` under enabled/). With a
+        ``file`` glob only copies in matching files are edited or copied.
+        """
+        plan = []
+        for sid in sids:
+            locs = self.by_sid.get(sid, [])
+            if enable:
+                if any(loc.active for loc in locs):
+                    continue
+                if file:
+                    locs = [loc for loc in locs if fnmatch(loc.path.split("/", 1)[1], file)]
+                commented = [loc for loc in locs if loc.state == "enabled"]
+                if commented:
+                    plan.append(("uncomment", commented[0]))
+                elif locs:
+                    plan.append(("copy", locs[0]))
+            else:
+                plan.extend(
+                    ("comment", loc)
+                    for loc in locs
+                    if loc.active and (not file or fnmatch(loc.path.split("/", 1)[1], file))
+                )
+        return plan
+
+    def apply_plan(self, plan: List[Tuple[str, Location]]) -> List[Path]:
+        """Apply a plan from :meth:`plan_state` as one transaction.
+
+        Every affected file is first rewritten to a staged temp copy. The
+        list of pending renames is then written to a journal, the renames
+        are performed and the journal is removed. A crash after the journal
+        is written is rolled forward by :func:`recover_journal` on the next
+        run; a crash before leaves the rule files untouched.
+        """
+        edits: Dict[str, Dict[int, str]] = {}
+        appended: List[str] = []
+        for action, loc in plan:
+            line = self.read_line(loc)
+            text = line.strip().lstrip("#").strip()
+            if action == "copy":
+                appended.append(text)
+            else:
+                new = text if action == "uncomment" else f"# {text}"
+                edits.setdefault(loc.path, {})[loc.offset] = new
+
+        override = f"enabled/{OVERRIDE_FILE}"
+        if appended:
+            edits.setdefault(override, {})
+
+        staged: List[Tuple[str, Path]] = []
+        try:
+            for rel, file_edits in edits.items():
+                path = self.rules_dir / rel
+                extra = appended if rel == override else ()
+                staged.append((splice_lines(path, file_edits, extra, stage=True), path))
+        except BaseException:
+            for tmp, _ in staged:
+                os.unlink(tmp)
+            raise
+
+        commit_renames(self.journal_path, staged)
+        touched = [path for _, path in staged]
+        for path in touched:
+            self.update_file(path)
+        if touched:
+            self.save()
+        return touched
+
+
+def commit_renames(journal_path: Path, staged: List[Tuple[str, Path]]):
+    """Rename staged temp files over their targets, guarded by a journal."""
+    if not staged:
+        return
+    fd, tmp = tempfile.mkstemp(dir=journal_path.parent, prefix=".journal.")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"renames": [[str(src), str(dst)] for src, dst in staged]}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, journal_path)
+    recover_journal(journal_path)
+
+
+def recover_journal(journal_path: Path) -> int:
+    """Finish an interrupted transaction; returns the number of files renamed."""
+    if not journal_path.exists():
+        return 0
+    try:
+        renames = json.loads(journal_path.read_text())["renames"]
+    except (OSError, ValueError, KeyError):
+        logger.warning(f"Discarding unreadable rule journal {journal_path}")
+        journal_path.unlink()
+        return 0
+    done = 0
+    for src, dst in renames:
+        if os.path.exists(src):
+            os.replace(src, dst)
+            done += 1
+    journal_path.unlink()
+    return done
+
+
+def splice_lines(
+    path: Path, edits: Dict[int, str], append: Iterable[str] = (), stage=False
+):
+    """Replace the lines starting at the given byte offsets, streaming the rest.
+
+    Untouched bytes are block-copied, so the cost is one sequential pass
+    over the file no matter how many lines change; ``append`` lines are
+    added at the end. The result is renamed into place atomically, or with
+    ``stage`` left next to ``path`` and its temp name returned.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".txn")
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            if path.exists():
+                with open(path, "rb") as src:
+                    pos = 0
+                    last = b"\n"
+                    for offset in sorted(edits):
+                        _copy_range(src, dst, offset - pos)
+                        old = src.readline()
+                        newline = b"\r\n" if old.endswith(b"\r\n") else b"\n"
+                        dst.write(edits[offset].encode("utf-8") + newline)
+                        pos = offset + len(old)
+                        last = b"\n"
+                    for block in iter(lambda: src.read(COPY_BUFSIZE), b""):
+                        dst.write(block)
+                        last = block[-1:]
+                    if append and last != b"\n":
+                        dst.write(b"\n")
+                shutil.copymode(path, tmp)
+            else:
+                os.chmod(tmp, 0o644)
+            for text in append:
+                dst.write(f"{text}\n".encode("utf-8"))
+            dst.flush()
+            os.fsync(dst.fileno())
+        if stage:
+            return tmp
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return None
+
+
+def _copy_range(src, dst, length: int):
+    while length > 0:
+        block = src.read(min(COPY_BUFSIZE, length))
+        if not block:
+            break
+        dst.write(block)
+        length -= len(block)
@@ -0,0 +1,126 @@
+"""Static detection-cost lint for enabled rules.
+
+Scores each active rule by how much work it is likely to cost Snort per
+packet, using only the rule text. The weights are relative, not
+microseconds: a rule without a fast pattern that falls back to pcre on
+every packet of every flow scores far higher than an anchored content
+match on a specific port.
+"""
+
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Tuple
+
+from modules.configuration.rule_parser import Rule, iter_rules
+
+CONTENT_KEYS = ("content", "uricontent", "protected_content")
+SHORT_PATTERN = 4
+
+COST_NO_CONTENT = 40
+COST_PCRE_ONLY = 40
+COST_PCRE = 8
+COST_SHORT_PATTERN = 15
+COST_TINY_PATTERN = 30
+COST_ANY_ANY = 20
+COST_ANY_PORTS = 10
+COST_IP_PROTO = 10
+COST_NO_FLOW = 5
+COST_BYTE_OPS = 3
+COST_UNANCHORED_PCRE = 5
+BASE_COST = 1
+
+
+class LintResult(NamedTuple):
+    sid: int
+    path: str
+    line_no: int
+    cost: int
+    reasons: List[str]
+
+
+def content_length(value: str) -> int:
+    """Byte length of a content string, counting ``|41 42|`` hex as bytes."""
+    raw = value.lstrip("!").strip()
+    if raw.startswith('"'):
+        raw = raw[1 : raw.rfind('"')] if raw.rfind('"') > 0 else raw[1:]
+    length = 0
+    for i, chunk in enumerate(raw.split("|")):
+        if i % 2:
+            length += len(chunk.replace(" ", "")) // 2
+        else:
+            length += len(chunk) - chunk.count("\\")
+    return length
+
+
+def _pcre_body(value: str) -> str:
+    raw = value.lstrip("!").strip().strip('"')
+    if raw.startswith("/"):
+        return raw[1 : raw.rfind("/")]
+    return raw
+
+
+def score_rule(rule: Rule) -> Tuple[int, List[str]]:
+    cost = BASE_COST
+    reasons = []
+    keys = [key for key, _ in rule.options]
+    contents = [
+        value for key, value in rule.options if key in CONTENT_KEYS and not value.startswith("!")
+    ]
+    pcres = [value for key, value in rule.options if key == "pcre"]
+
+    if not contents:
+        cost += COST_NO_CONTENT
+        reasons.append("no content anchor")
+        if pcres:
+            cost += COST_PCRE_ONLY
+            reasons.append("pcre-only matching")
+    else:
+        longest = max(content_length(value) for value in contents)
+        if longest < 2:
+            cost += COST_TINY_PATTERN
+            reasons.append(f"fast pattern only {longest} byte(s)")
+        elif longest < SHORT_PATTERN:
+            cost += COST_SHORT_PATTERN
+            reasons.append(f"short fast pattern ({longest} bytes)")
+
+    for value in pcres:
+        cost += COST_PCRE
+        body = _pcre_body(value)
+        if not body.startswith("^") and body.startswith((".*", ".+")):
+            cost += COST_UNANCHORED_PCRE
+            reasons.append("pcre starts with an unanchored wildcard")
+    if len(pcres) > 1:
+        reasons.append(f"{len(pcres)} pcre options")
+
+    tokens = rule.header.split()
+    if len(tokens) == 7:
+        _, proto, src, sport, _, dst, dport = tokens
+        if src == dst == "any" and sport == dport == "any":
+            cost += COST_ANY_ANY
+            reasons.append("any any -> any any header")
+        elif sport == dport == "any":
+            cost += COST_ANY_PORTS
+            reasons.append("matches any port in both directions")
+        if proto == "ip":
+            cost += COST_IP_PROTO
+            reasons.append("ip protocol (every packet)")
+        if proto == "tcp" and "flow" not in keys:
+            cost += COST_NO_FLOW
+            reasons.append("tcp rule without flow")
+
+    byte_ops = sum(1 for key in keys if key in ("byte_test", "byte_jump", "byte_math", "isdataat"))
+    cost += byte_ops * COST_BYTE_OPS
+    return cost, reasons
+
+
+def lint_files(files: Iterable[Path], root: Path) -> List[LintResult]:
+    """Score every active rule in ``files``, most expensive first."""
+    results = []
+    for path in files:
+        rel = path.relative_to(root).as_posix()
+        for rule in iter_rules(path):
+            if not rule.enabled:
+                continue
+            cost, reasons = score_rule(rule)
+            results.append(LintResult(rule.sid, rel, rule.line_no, cost, reasons))
+    results.sort(key=lambda r: (-r.cost, r.path, r.line_no))
+    return results
@@ -1,16 +1,36 @@
 from pathlib import Path
+import re
 import shutil
+import sqlite3
 from datetime import datetime
 from rich.console import Console
 import time
 from modules.utilities.logger import get_logger
 from modules.utilities.error_handler import get_error_logger
+from modules.configuration import (
+    backup_store,
+    pcre_analyzer,
+    rule_dedup,
+    rule_lint,
+    rule_select,
+    rule_validator,
+    rule_watch,
+    ruleset_builder,
+    validation_cache,
+)
+from modules.configuration.rule_index import RuleIndex
+from modules.configuration.rule_parser import parse_sid_spec
+from modules.configuration.rule_select import Selector
+from modules.utilities import metrics, snort_probe
+from modules.utilities.file_watch import Watcher
 
 errorlog = get_error_logger(__name__)
 
 logger = get_logger(__name__)
 console = Console()
 
+BUILD_SECONDS = metrics.histogram("snortamv_rule_build_seconds", "Time to generate snort.rules")
+
 ROOT = Path(__file__).resolve().parents[2]
 RULES_DIR = ROOT / "rules"
 
@@ -19,16 +39,117 @@ ENABLED = RULES_DIR / "enabled"
 DISABLED = RULES_DIR / "disabled"
 GENERATED = RULES_DIR / "generated"
 BACKUPS = RULES_DIR / "backups"
+CATALOG_DB = RULES_DIR / ".catalog.db"
 
 for d in [SOURCES, ENABLED, DISABLED, GENERATED, BACKUPS]:
     d.mkdir(parents=True, exist_ok=True)
 
+_index = None
+DRY_RUN_PREVIEW = 20
+
+
+def get_index() -> RuleIndex:
+    """Load the SID index once per process and sync it with the rule dirs."""
+    global _index
+    if _index is None:
+        _index = RuleIndex(RULES_DIR)
+    _index.refresh()
+    return _index
+
+
+# ---------------- SID Ops ---------------- #
+def list_sids(spec):
+    index = get_index()
+    matches = index.lookup_range(*spec)
+    if not matches:
+        console.print(f"[red]No rules found for SID {spec[0]}-{spec[1]}[/red]")
+        return
+    for sid, locs in matches.items():
+        for loc in locs:
+            mark = "✔" if loc.active else "✖"
+            console.print(
+                f"  {mark} {sid:<10} rev:{loc.rev:<4} {loc.path}:{loc.line_no}"
+            )
+
+
+def _describe(selector: Selector) -> str:
+    parts = []
+    if selector.sids:
+        lo, hi = selector.sids
+        parts.append(f"sid {lo}" if lo == hi else f"sid {lo}-{hi}")
+    if selector.classtype:
+        parts.append(f"classtype {selector.classtype}")
+    if selector.msg:
+        parts.append(f"msg /{selector.msg}/")
+    if selector.file:
+        parts.append(f"file {selector.file}")
+    return ", ".join(parts)
+
+
+def set_rules_state(selector: Selector, enable: bool, dry_run=False, rebuild=True):
+    """Enable/disable every rule matching ``selector`` in one transaction."""
+    verb = "enable" if enable else "disable"
+    what = _describe(selector)
+    index = get_index()
+    try:
+        sids = rule_select.select_sids(index, selector, enable)
+    except re.error as e:
+        console.print(f"[red]Invalid --msg regex: {e}[/red]")
+        return
+    if not sids:
+        console.print(f"[red]No rules found for {what}[/red]")
+        return
+
+    plan = index.plan_state(sorted(sids), enable, selector.file)
+    if not plan:
+        console.print(f"[yellow]Nothing to {verb}: {len(sids)} SID(s) already {verb}d[/yellow]")
+        logger.info(f"{what} already {verb}d")
+        return
+
+    summary = rule_select.summarize(plan)
+    if dry_run:
+        console.print(f"[yellow][DRY-RUN] {verb} {len(plan)} rule(s) matching {what}:[/yellow]")
+        for rel, counts in sorted(summary.items()):
+            detail = ", ".join(f"{action} {n}" for action, n in sorted(counts.items()))
+            console.print(f"  [yellow]{rel}: {detail}[/yellow]")
+        for action, loc in plan[:DRY_RUN_PREVIEW]:
+            sign = "+" if action != "comment" else "-"
+            console.print(f"  {sign} sid:{loc.sid} {loc.path}:{loc.line_no}")
+        if len(plan) > DRY_RUN_PREVIEW:
+            console.print(f"  ... and {len(plan) - DRY_RUN_PREVIEW} more")
+        logger.info(f"[DRY-RUN] {verb} {len(plan)} rule(s) matching {what}")
+        return
+
+    try:
+        touched = index.apply_plan(plan)
+        console.print(
+            f"[green]{verb.capitalize()}d {len(plan)} rule(s) across {len(touched)} file(s)[/green]"
+        )
+        logger.info(f"{verb}d {len(plan)} rule(s) matching {what}")
+    except Exception:
+        errorlog.exception(f"Failed to {verb} rules matching {what}")
+        console.print(f"[red]Unable to {verb} rules, check the error log.[/red]")
+        return
+
+    if rebuild:
+        build_ruleset()
+
 
 # ---------------- Core Ops ---------------- #
-def list_rules():
+def list_rules(sid=None):
+    if sid:
+        spec = parse_sid_spec(sid)
+        if not spec:
+            console.print(f"[red]Invalid SID or SID range: {sid}[/red]")
+            return
+        list_sids(spec)
+        return
+
+    index = get_index()
     console.print("\n[bold green]Enabled rules:[/bold green]")
     for f in ENABLED.glob("*.rules"):
-        console.print(f"  ✔ {f.name}")
+        active, commented = index.file_counts(f"enabled/{f.name}")
+        console.print(f"  ✔ {f.name} ({active} active, {commented} commented)")
 
     console.print("\n[bold yellow]Disabled rules:[/bold yellow]")
     for f in DISABLED.glob("*.rules"):
@@ -39,7 +160,58 @@ def list_rules():
         console.print(f"  📄 {f.name}")
 
 
-def enable_rule(name: str, path: str, dry_run=False):
+def search_rules(query, limit=50, state=None):
+    from database import rule_catalog
+
+    conn = sqlite3.connect(CATALOG_DB)
+    try:
+        index = get_index()
+        rule_catalog.sync_catalog(conn, index.rule_files(), RULES_DIR)
+        start = time.perf_counter()
+        hits = rule_catalog.search_rules(conn, query, limit=limit, state=state)
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+    if not hits:
+        console.print(f"[red]No rules match {query!r}[/red]")
+        return []
+    for hit in hits:
+        mark = "✔" if hit.active else "✖"
+        console.print(
+            f"  {mark} {hit.sid:<10} rev:{hit.rev:<4} {hit.path}:{hit.line_no}  {hit.msg}"
+            + (f" [dim]({hit.classtype})[/dim]" if hit.classtype else "")
+        )
+    console.print(f"[dim]{len(hits)} match(es) in {elapsed * 1000:.1f}ms[/dim]")
+    return hits
+
+
+def _selector_for(name, selector):
+    """Fold ``name`` into ``selector``; None means a plain whole-file operation.
+
+    A SID or SID range becomes the SID selector; a file name combined with
+    other selectors narrows them to that file.
+    """
+    selector = selector or Selector()
+    spec = parse_sid_spec(name) if name else None
+    if spec:
+        selector = selector._replace(sids=spec)
+    elif name and not selector.empty() and not selector.file:
+        selector = selector._replace(file=name)
+    return None if selector.empty() else selector
+
+
+def enable_rule(name: str = None, path: str = None, dry_run=False, selector=None, rebuild=True):
+    bulk = _selector_for(name, selector)
+    if bulk:
+        set_rules_state(bulk, enable=True, dry_run=dry_run, rebuild=rebuild)
+        return
+    if not name:
+        console.print("[red]Give a rules file, SID/SID range or a selector.[/red]")
+        return
+    if not path:
+        console.print("[red]--from is required when enabling a rules file.[/red]")
+        return
+
     try:
         if path.lower() == "sources":
             src = SOURCES / name
@@ -85,7 +257,15 @@ def enable_rule(name: str, path: str, dry_run=False):
         )
 
 
-def disable_rule(name: str, dry_run=False):
+def disable_rule(name: str = None, dry_run=False, selector=None, rebuild=True):
+    bulk = _selector_for(name, selector)
+    if bulk:
+        set_rules_state(bulk, enable=False, dry_run=dry_run, rebuild=rebuild)
+        return
+    if not name:
+        console.print("[red]Give a rules file, SID/SID range or a selector.[/red]")
+        return
+
     src = ENABLED / name
     dst = DISABLED / name
 
@@ -116,42 +296,290 @@ def disable_rule(name: str, dry_run=False):
         )
 
 
-def build_ruleset(dry_run=False):
+def report_conflicts(conflicts):
+    console.print(f"[yellow]{len(conflicts)} duplicate SID(s) in enabled rules:[/yellow]")
+    for conflict in conflicts:
+        console.print(f"  [yellow]⚠ {conflict.describe()}[/yellow]")
+        logger.warning(f"Duplicate SID {conflict.describe()}")
+
+
+def lint_rules(top=20, budget=None):
+    results = rule_lint.lint_files(sorted(ENABLED.glob("*.rules")), RULES_DIR)
+    total = sum(r.cost for r in results)
+    console.print(
+        f"\n[bold]Estimated detection cost: {total} across {len(results)} active rules[/bold]"
+    )
+    for r in results[:top]:
+        console.print(
+            f"  [red]{r.cost:>4}[/red] sid:{r.sid:<10} {r.path}:{r.line_no}  "
+            f"[yellow]{'; '.join(r.reasons) or 'ok'}[/yellow]"
+        )
+    if budget is not None and total > budget:
+        console.print(f"[red]Over budget: {total} > {budget}[/red]")
+    logger.info(f"Rule lint: total cost {total} over {len(results)} rules")
+    return total
+
+
+def check_pcres(fuzz=True, budget=pcre_analyzer.DEFAULT_BUDGET, jobs=None):
+    findings = pcre_analyzer.analyze(
+        sorted(ENABLED.glob("*.rules")), RULES_DIR, fuzz=fuzz, budget=budget, jobs=jobs
+    )
+    bad = [f for f in findings if f.pathological]
+    if not findings:
+        console.print("[green]No risky pcre patterns found in enabled rules[/green]")
+    for f in findings:
+        style = "red" if f.pathological else "yellow"
+        timing = f" fuzz {f.fuzz_seconds * 1000:.0f}ms" if f.fuzz_seconds is not None else ""
+        console.print(f"[{style}]sid:{f.sid} {f.path}:{f.line_no}{timing}  pcre:{f.pattern}[/{style}]")
+        for issue in f.issues:
+            console.print(f"    - {issue}")
+    logger.info(f"pcre check: {len(findings)} finding(s), {len(bad)} pathological")
+    return bad
+
+
+def build_ruleset(
+    dry_run=False, force=False, strict=False, budget=None, pcre_gate=False, grouped=None
+):
     try:
         target = GENERATED / "snort.rules"
-        rules = []
-
-        for rule_file in ENABLED.glob("*.rules"):
-            rules.append(rule_file.read_text())
+        if pcre_gate and check_pcres():
+            console.print("[red]Build aborted: pathological pcre patterns (see above)[/red]")
+            logger.error("Build aborted by pcre gate")
+            _count_build("aborted")
+            return None
+        if budget is not None:
+            results = rule_lint.lint_files(sorted(ENABLED.glob("*.rules")), RULES_DIR)
+            total = sum(r.cost for r in results)
+            if total > budget:
+                console.print(
+                    f"[red]Build aborted: estimated rule cost {total} exceeds budget {budget}. "
+                    "Run `snortamv rule lint` to see the worst offenders.[/red]"
+                )
+                logger.error(f"Build aborted: rule cost {total} > budget {budget}")
+                _count_build("aborted")
+                return None
+        conflicts = rule_dedup.find_duplicates(get_index().locations("enabled"))
+        if conflicts:
+            report_conflicts(conflicts)
+            if strict:
+                console.print("[red]Build aborted: duplicate SIDs (--strict)[/red]")
+                logger.error(f"Build aborted: {len(conflicts)} duplicate SID(s)")
+                _count_build("aborted")
+                return None
+
+        with BUILD_SECONDS.time():
+            result = ruleset_builder.build(
+                ENABLED,
+                target,
+                force=force,
+                dry_run=dry_run,
+                skip=rule_dedup.skipped_offsets(conflicts),
+                grouped=grouped,
+            )
+        _count_build("changed" if result.changed else "unchanged")
 
         if dry_run:
+            state = "would rebuild" if result.changed else "up to date,"
             console.print(
-                f"[yellow][DRY-RUN] build ruleset with {len(rules)} files[/yellow]"
+                f"[yellow][DRY-RUN] {state} ruleset with {result.files} files[/yellow]"
             )
-            logger.info(f"[DRY-RUN] build ruleset with {len(rules)} files")
-            return
+            logger.info(f"[DRY-RUN] {state} ruleset with {result.files} files")
+            return result
 
-        target.write_text("\n".join(rules))
-        console.print(f"[green]Generated ruleset → {target}[/green]")
+        if not result.changed:
+            console.print(f"[blue]Ruleset up to date → {target}[/blue]")
+            return result
+
+        console.print(
+            f"[green]Generated ruleset → {target} "
+            f"({result.bytes_written} bytes from {result.files} files "
+            f"in {result.elapsed:.3f}s)[/green]"
+        )
         logger.info(f"Generated ruleset → {target}")
+        return result
     except KeyboardInterrupt:
         logger.info("Altered by the user")
         
         return "Altered by the user"
     except Exception as e:
+        _count_build("error")
         errorlog.exception("Error occured while building the rules ", e)
         return
 
 
-def backup_rules():
+def _count_build(result):
+    metrics.counter("snortamv_rule_builds_total", "Ruleset builds by outcome", result=result).inc()
+
+
+def bench_startup(conf=None, runs=3, snort=None):
+    """Compare Snort's config-test start-up time on flat vs grouped output."""
+    snort = snort_probe.find_snort(snort)
+    if not snort:
+        console.print("[red]Snort binary not found; cannot measure start-up time.[/red]")
+        return None
+    kind, banner = snort_probe.snort_version(snort)
+    conf = Path(conf) if conf else Path("/etc/snort") / (
+        "snort.lua" if kind == "snort3" else "snort.conf"
+    )
+    if not conf.exists():
+        console.print(f"[red]Snort config not found: {conf}[/red]")
+        return None
+
+    files = sorted(ENABLED.glob("*.rules"))
+    conflicts = rule_dedup.find_duplicates(get_index().locations("enabled"))
+    skip = rule_dedup.skipped_offsets(conflicts)
+    bench_dir = GENERATED / ".bench"
+    shutil.rmtree(bench_dir, ignore_errors=True)
+    (bench_dir / "flat").mkdir(parents=True)
+    (bench_dir / "grouped").mkdir()
+    timings = {}
     try:
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        archive = BACKUPS / f"rules_{ts}"
+        ruleset_builder.stream_concat(files, bench_dir / "flat" / "snort.rules", skip)
+        _, groups = ruleset_builder.stream_grouped(
+            files, bench_dir / "grouped" / "snort.rules", skip
+        )
+        for mode in ("flat", "grouped"):
+            runs_ok = []
+            for _ in range(runs):
+                run = snort_probe.config_test(snort, conf, bench_dir / mode / "snort.rules", kind)
+                if not run.ok:
+                    console.print(f"[red]snort -T failed on {mode} output:[/red]\n{run.output[-2000:]}")
+                    return None
+                runs_ok.append(run.seconds)
+            timings[mode] = sorted(runs_ok)[len(runs_ok) // 2]
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+    console.print(f"\n[bold]{banner}[/bold] ({runs} run(s) each, median)")
+    console.print(f"  flat    : {timings['flat']:.2f}s")
+    console.print(f"  grouped : {timings['grouped']:.2f}s ({len(groups)} groups)")
+    logger.info(f"Start-up bench flat={timings['flat']:.2f}s grouped={timings['grouped']:.2f}s")
+    return timings
+
+
+def _validate_changes(changed, snort=None, conf=None):
+    """Validate the changed enabled files, then the full ruleset with ``snort -T``."""
+    errors = []
+    for name in sorted(changed):
+        path = ENABLED / name
+        if path.exists():
+            errors += [f"{name}: {e}" for e in rule_validator.validate_file(path)]
+    if not errors and snort and conf:
+        run = validation_cache.cached_config_test(snort, Path(conf), GENERATED / "snort.rules")
+        if not run.ok:
+            errors.append(f"snort -T failed:\n{run.output[-2000:]}")
+    return errors
+
+
+def watch_rules(debounce=0.5, pid=None, pidfile=None, control=None, conf=None, snort=None, poll=False):
+    """Rebuild and hot-reload on every change to rules/enabled until interrupted."""
+    target = GENERATED / "snort.rules"
+    snort = snort_probe.find_snort(snort) if conf else None
+    if conf and not snort:
+        console.print("[yellow]Snort binary not found; skipping snort -T validation[/yellow]")
+    if target.exists() and not rule_watch.last_good_path(target).exists():
+        rule_watch.remember_good(target)
+
+    watcher = Watcher(ENABLED, pattern="*.rules", debounce=debounce, poll=poll)
+    console.print(
+        f"[bold green]Watching {ENABLED} ({watcher.mode}); Ctrl+C to stop[/bold green]"
+    )
+    logger.info(f"Watching {ENABLED} for rule changes ({watcher.mode})")
+    try:
+        for changed in watcher.batches():
+            console.print(f"[cyan]Changed: {', '.join(sorted(changed))}[/cyan]")
+            result = rule_watch.reload_cycle(
+                build_ruleset,
+                lambda: _validate_changes(changed, snort, conf),
+                target,
+                pid=pid or rule_watch.find_snort_pid(pidfile),
+                control=control,
+            )
+            metrics.counter(
+                "snortamv_rule_reloads_total", "Rule watch cycles by outcome", status=result.status
+            ).inc()
+            metrics.REGISTRY.maybe_flush()
+            for error in result.errors:
+                console.print(f"  [red]{error}[/red]")
+            if result.status == "reloaded":
+                console.print("[green]Ruleset rebuilt and Snort reloaded[/green]")
+            elif result.status == "built":
+                console.print("[yellow]Ruleset rebuilt; no running Snort was reloaded[/yellow]")
+            elif result.status == "rolled-back":
+                console.print("[red]Validation failed; restored the last good ruleset[/red]")
+            elif result.status == "failed":
+                console.print("[red]Rebuild failed; Snort was not reloaded[/red]")
+    except KeyboardInterrupt:
+        logger.info("Rule watch stopped by the user")
+    finally:
+        watcher.close()
+
 
-        shutil.make_archive(str(archive), "gztar", RULES_DIR)
-        console.print(f"[blue]Rules backed up → {archive}.tar.gz[/blue]")
-        logger.info(f"Rules backed up → {archive}.tar.gz")
+def backup_rules():
+    try:
+        stats = backup_store.BackupStore(BACKUPS).backup(RULES_DIR)
+        console.print(
+            f"[blue]Rules backed up → snapshot {stats.id} "
+            f"({stats.files} files, {stats.files_read} read, "
+            f"{stats.bytes_written} new bytes, {stats.elapsed * 1000:.0f}ms)[/blue]"
+        )
+        logger.info(f"Rules backed up → snapshot {stats.id}")
+        return stats
     except KeyboardInterrupt:
         logger.info("Altered by the user")
     except Exception as e:
         errorlog.exception("an unkown error occured ",e)
+
+
+def list_backups():
+    snapshots = backup_store.BackupStore(BACKUPS).list_snapshots()
+    if not snapshots:
+        console.print("[yellow]No backups yet. Run `snortamv rule backup`.[/yellow]")
+        return
+    console.print("\n[bold cyan]Rule backups:[/bold cyan]")
+    for info in snapshots:
+        created = datetime.fromtimestamp(info.created).strftime("%Y-%m-%d %H:%M:%S")
+        console.print(f"  💾 {info.id}  {created}  {info.files} files  {info.size} bytes")
+
+
+def restore_rules(snapshot: str, dry_run=False):
+    store = backup_store.BackupStore(BACKUPS)
+    try:
+        files = store.load(snapshot)["files"]
+    except FileNotFoundError:
+        console.print(f"[red]Backup not found: {snapshot}[/red]")
+        return
+    if dry_run:
+        stale = store.stale(snapshot, RULES_DIR)
+        console.print(
+            f"[yellow][DRY-RUN] restore {len(files)} files from {snapshot}, remove {len(stale)}[/yellow]"
+        )
+        for rel in stale:
+            console.print(f"  - {rel}")
+        logger.info(f"[DRY-RUN] restore {snapshot}")
+        return
+    try:
+        # Keep the current state restorable too.
+        safety = store.backup(RULES_DIR)
+        result = store.restore(snapshot, RULES_DIR)
+        for rel in result.removed:
+            console.print(f"  - {rel}")
+        console.print(
+            f"[green]Restored {len(result.restored)} files from {snapshot}, removed {len(result.removed)} "
+            f"not in it (previous state saved as {safety.id})[/green]"
+        )
+        logger.info(f"Restored rules from {snapshot}")
+    except Exception:
+        errorlog.exception(f"Failed to restore backup {snapshot}")
+        console.print("[red]Unable to restore backup, check the error log.[/red]")
+
+
+def prune_backups(keep=None, days=None, dry_run=False):
+    if keep is None and days is None:
+        console.print("[red]Give --keep and/or --days to prune backups.[/red]")
+        return
+    if dry_run:
+        console.print(f"[yellow][DRY-RUN] prune backups keep={keep} days={days}[/yellow]")
+        return
+    removed, chunks = backup_store.BackupStore(BACKUPS).prune(keep_last=keep, keep_days=days)
+    console.print(f"[blue]Pruned {removed} backup(s), {chunks} unused chunk(s)[/blue]")
@@ -0,0 +1,143 @@
+"""Parse Snort 2/3 rule lines into light-weight records.
+
+Rules are expected one per line, which is how every vendor pack we ship
+(ET, Talos, local.rules) is laid out. A rule commented out with a leading
+``#`` is still returned, flagged as disabled, so packs tuned by commenting
+lines keep their SIDs visible.
+"""
+
+import re
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+ACTIONS = {
+    "alert",
+    "log",
+    "pass",
+    "drop",
+    "reject",
+    "sdrop",
+    "block",
+    "rewrite",
+    "activate",
+    "dynamic",
+}
+
+# One option: keyword, optionally followed by ``:value``; quoted strings and
+# backslash escapes in the value may contain ';'.
+OPTION_RE = re.compile(
+    r'\s*([A-Za-z_][\w.-]*)\s*(?::\s*((?:[^;"\\]|\\.|"(?:[^"\\]|\\.)*")*?))?\s*;'
+)
+SID_SPEC_RE = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+)\s*)?$")
+
+
+class Rule(NamedTuple):
+    sid: int
+    gid: int
+    rev: int
+    msg: str
+    classtype: str
+    enabled: bool
+    header: str
+    options: List[Tuple[str, str]]
+    line_no: int
+    offset: int
+    text: str
+
+
+def split_options(body: str) -> List[Tuple[str, str]]:
+    """Split the text between a rule's parentheses into (keyword, value) pairs."""
+    return [(m.group(1).lower(), (m.group(2) or "").strip()) for m in OPTION_RE.finditer(body)]
+
+
+def unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _to_int(value: str, default: int) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def strip_comment(line: str) -> Tuple[str, bool]:
+    """Return the rule text without a leading ``#`` and whether it was active."""
+    text = line.strip()
+    if text.startswith("#"):
+        return text.lstrip("#").strip(), False
+    return text, True
+
+
+def is_rule_text(text: str) -> bool:
+    action = text.split(None, 1)[0] if text else ""
+    return action in ACTIONS and "(" in text
+
+
+def parse_line(line: str, line_no: int = 0, offset: int = 0) -> Optional[Rule]:
+    """Parse one line of a .rules file, or return None if it is not a rule."""
+    text, enabled = strip_comment(line)
+    if not is_rule_text(text):
+        return None
+
+    start = text.find("(")
+    end = text.rfind(")")
+    header = text[:start].strip()
+    body = text[start + 1 : end] if end > start else text[start + 1 :]
+    options = split_options(body)
+
+    sid = gid = rev = None
+    msg = classtype = ""
+    for key, value in options:
+        if key == "sid":
+            sid = _to_int(value, None)
+        elif key == "gid":
+            gid = _to_int(value, None)
+        elif key == "rev":
+            rev = _to_int(value, None)
+        elif key == "msg":
+            msg = unquote(value)
+        elif key == "classtype":
+            classtype = value
+
+    if sid is None:
+        return None
+
+    return Rule(
+        sid=sid,
+        gid=gid if gid is not None else 1,
+        rev=rev if rev is not None else 0,
+        msg=msg,
+        classtype=classtype,
+        enabled=enabled,
+        header=header,
+        options=options,
+        line_no=line_no,
+        offset=offset,
+        text=text,
+    )
+
+
+def iter_rules(path: Path) -> Iterator[Rule]:
+    """Yield every rule in ``path`` with its 1-based line number and byte offset."""
+    offset = 0
+    with open(path, "rb") as f:
+        for line_no, raw in enumerate(f, start=1):
+            rule = parse_line(raw.decode("utf-8", "replace"), line_no, offset)
+            if rule is not None:
+                yield rule
+            offset += len(raw)
+
+
+def parse_sid_spec(spec: str) -> Optional[Tuple[int, int]]:
+    """Parse ``"2010001"`` or ``"2010000-2019999"`` into an inclusive range."""
+    m = SID_SPEC_RE.match(spec)
+    if not m:
+        return None
+    lo = int(m.group(1))
+    hi = int(m.group(2)) if m.group(2) else lo
+    if hi < lo:
+        lo, hi = hi, lo
+    return lo, hi
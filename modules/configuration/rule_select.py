@@ -0,0 +1,67 @@
+"""Bulk rule selectors: classtype, msg regex, SID range and file glob.
+
+All selectors given are ANDed. SID-range-only selections are answered from
+the SID index; anything involving classtype or msg parses each candidate
+file once.
+"""
+
+import re
+from fnmatch import fnmatch
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from modules.configuration.rule_index import Location, RuleIndex
+from modules.configuration.rule_parser import iter_rules
+
+
+class Selector(NamedTuple):
+    sids: Optional[Tuple[int, int]] = None
+    classtype: Optional[str] = None
+    msg: Optional[str] = None
+    file: Optional[str] = None
+
+    def empty(self) -> bool:
+        return not any(self)
+
+
+def select_sids(index: RuleIndex, selector: Selector, enable: bool) -> Set[int]:
+    """SIDs matching ``selector``; disabling only looks at enabled/ files."""
+    states = ("sources", "enabled", "disabled") if enable else ("enabled",)
+    msg_re = re.compile(selector.msg, re.IGNORECASE) if selector.msg else None
+    lo, hi = selector.sids or (None, None)
+
+    def path_ok(rel: str) -> bool:
+        state, _, name = rel.partition("/")
+        return state in states and (not selector.file or fnmatch(name, selector.file))
+
+    if not selector.classtype and not msg_re:
+        if selector.sids:
+            candidates = index.lookup_range(lo, hi).items()
+        else:
+            candidates = index.by_sid.items()
+        return {
+            sid for sid, locs in candidates if any(path_ok(loc.path) for loc in locs)
+        }
+
+    matched: Set[int] = set()
+    for path in index.rule_files():
+        rel = path.relative_to(index.rules_dir).as_posix()
+        if not path_ok(rel):
+            continue
+        for rule in iter_rules(path):
+            if selector.sids and not lo <= rule.sid <= hi:
+                continue
+            if selector.classtype and rule.classtype != selector.classtype:
+                continue
+            if msg_re and not msg_re.search(rule.msg):
+                continue
+            matched.add(rule.sid)
+    return matched
+
+
+def summarize(plan: List[Tuple[str, Location]]) -> Dict[str, Dict[str, int]]:
+    """Count planned actions per file, for the dry-run diff summary."""
+    summary: Dict[str, Dict[str, int]] = {}
+    for action, loc in plan:
+        counts = summary.setdefault(loc.path, {})
+        counts[action] = counts.get(action, 0) + 1
+    return summary
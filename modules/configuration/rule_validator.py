@@ -0,0 +1,404 @@
+"""Native Snort 2/3 rule syntax validator.
+
+Checks the rule header (action, protocol/service, addresses, ports and
+direction) and the option list (known keywords, quoting, content/pcre
+syntax, flow, threshold/detection_filter and sid/rev/gid) without needing a
+Snort binary. Large files are split into line shards and checked across a
+process pool; every error is reported with its line number.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from modules.configuration.rule_parser import ACTIONS, OPTION_RE, strip_comment
+
+# Below this many lines the pool start-up costs more than it saves.
+SHARD_LINES = 5000
+
+PROTOCOLS = {"tcp", "udp", "icmp", "ip"}
+# Snort 3 service rules: ``alert http (...)``
+SERVICES = {
+    "file", "http", "http2", "ftp", "ftp-data", "smtp", "pop3", "imap", "dns",
+    "ssl", "tls", "ssh", "sip", "smb", "dcerpc", "netbios-ssn", "telnet",
+    "modbus", "dnp3", "s7commplus", "iec104", "mms", "gtp", "rpc",
+}
+DIRECTIONS = {"->", "<>"}
+
+# Keywords accepted by Snort 2.9 and Snort 3 (payload, non-payload, post-detection
+# and general options). Sticky buffers are listed alongside their Snort 2
+# modifier forms.
+KEYWORDS = {
+    # general
+    "msg", "reference", "gid", "sid", "rev", "classtype", "priority", "metadata",
+    "service", "rem", "target",
+    # payload
+    "content", "nocase", "rawbytes", "depth", "offset", "distance", "within",
+    "fast_pattern", "pcre", "regex", "uricontent", "urilen", "isdataat", "dsize",
+    "byte_test", "byte_jump", "byte_extract", "byte_math", "ftpbounce", "asn1",
+    "cvs", "dce_iface", "dce_opnum", "dce_stub_data", "sip_method",
+    "sip_stat_code", "sip_header", "sip_body", "gtp_type", "gtp_info",
+    "gtp_version", "ssl_version", "ssl_state", "base64_decode", "base64_data",
+    "pkt_data", "file_data", "js_data", "vba_data", "bufferlen", "pkt_num",
+    "ber_data", "ber_skip", "cip_attribute", "cip_class", "cip_conn_path_class",
+    "cip_instance", "cip_req", "cip_rsp", "cip_service", "cip_status",
+    "enip_command", "enip_req", "enip_rsp", "modbus_data", "modbus_func",
+    "modbus_unit", "dnp3_data", "dnp3_func", "dnp3_ind", "dnp3_obj",
+    "protected_content", "hash", "length", "md5", "sha256", "sha512",
+    "sd_pattern", "raw_data",
+    # HTTP modifiers / sticky buffers
+    "http_client_body", "http_cookie", "http_raw_cookie", "http_header",
+    "http_raw_header", "http_method", "http_uri", "http_raw_uri", "http_stat_code",
+    "http_stat_msg", "http_encode", "http_raw_body", "http_raw_request",
+    "http_raw_status", "http_raw_trailer", "http_trailer", "http_true_ip",
+    "http_version", "http_version_match", "http_num_headers", "http_num_trailers",
+    "http_num_cookies", "http_max_header_line", "http_max_trailer_line",
+    "http_param", "http_header_test", "http_trailer_test", "http_request_line",
+    # non-payload
+    "fragoffset", "ttl", "tos", "id", "ipopts", "fragbits", "ip_proto", "flags",
+    "flow", "flowbits", "seq", "ack", "window", "itype", "icode", "icmp_id",
+    "icmp_seq", "rpc", "sameip", "stream_reassemble", "stream_size",
+    "detection_filter", "tag", "threshold", "replace", "activates",
+    "activated_by", "count", "logto", "session", "resp", "react", "file_type",
+    "appids", "so", "soid", "xbits",
+}
+NO_VALUE_OK = {
+    "nocase", "rawbytes", "fast_pattern", "sameip", "ftpbounce", "dce_stub_data",
+    "pkt_data", "file_data", "js_data", "vba_data", "base64_data", "sip_body",
+    "http_client_body", "http_cookie", "http_raw_cookie", "http_header",
+    "http_raw_header", "http_method", "http_uri", "http_raw_uri",
+    "http_stat_code", "http_stat_msg", "http_raw_body", "http_raw_request",
+    "http_raw_status", "http_raw_trailer", "http_trailer", "http_true_ip",
+    "http_version", "http_request_line", "raw_data", "modbus_data",
+    "dnp3_data", "base64_decode", "ber_data",
+    "http_param", "sip_header", "rem", "target", "length",
+}
+FLOW_WORDS = {
+    "to_client", "to_server", "from_client", "from_server", "established",
+    "not_established", "stateless", "no_stream", "only_stream", "no_frag",
+    "only_frag", "noalert",
+}
+PCRE_FLAGS = set("ismxAEGRUBPHDMCKSYOIL")
+INT_OPTIONS = {"sid", "rev", "gid", "priority"}
+INT_OR_VAR = {"depth", "offset", "distance", "within"}
+
+INT_RE = re.compile(r"^-?\d+$")
+VAR_RE = re.compile(r"^\$?[A-Za-z_]\w*$")
+IP_RE = re.compile(
+    r"^!?(?:any|\$[A-Za-z_]\w*|\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?|[0-9A-Fa-f:]*:[0-9A-Fa-f:.]*(?:/\d{1,3})?)$"
+)
+PORT_RE = re.compile(r"^!?(?:any|\$[A-Za-z_]\w*|\d{1,5}|\d{1,5}:\d{0,5}|:\d{1,5})$")
+HEX_RE = re.compile(r"^[0-9A-Fa-f\s]*$")
+THRESHOLD_KEYS = {"type", "track", "count", "seconds"}
+THRESHOLD_TYPES = {"limit", "threshold", "both"}
+TRACK_VALUES = {"by_src", "by_dst", "by_rule"}
+
+
+class RuleError(NamedTuple):
+    line_no: int
+    sid: Optional[int]
+    message: str
+    file: str = ""  # set for errors in an included file
+
+    def __str__(self):
+        where = f"line {self.line_no}"
+        if self.file:
+            where = f"{self.file} {where}"
+        if self.sid is not None:
+            where += f" (sid {self.sid})"
+        return f"{where}: {self.message}"
+
+
+# ---------------- Header ---------------- #
+def _split_list(value: str) -> List[str]:
+    """Flatten ``[a,[b,c]]`` style address/port lists into their items."""
+    value = value.lstrip("!")
+    if not value.startswith("["):
+        return [value]
+    if not value.endswith("]") or value.count("[") != value.count("]"):
+        raise ValueError(f"unbalanced list {value!r}")
+    return [item for item in re.split(r"[\[\],]", value) if item]
+
+
+def _check_list(value: str, pattern: re.Pattern, what: str, errors: List[str]):
+    try:
+        items = _split_list(value)
+    except ValueError as e:
+        errors.append(f"invalid {what}: {e}")
+        return
+    for item in items:
+        if not pattern.match(item):
+            errors.append(f"invalid {what} {item!r}")
+            continue
+        if what == "port" and item.lstrip("!")[:1].isdigit():
+            for part in item.lstrip("!").split(":"):
+                if part and int(part) > 65535:
+                    errors.append(f"port {part} out of range")
+        if what == "address" and "/" in item and "." in item:
+            addr, bits = item.lstrip("!").split("/")
+            if int(bits) > 32 or any(int(o) > 255 for o in addr.split(".")):
+                errors.append(f"invalid address {item!r}")
+
+
+def check_header(header: str) -> List[str]:
+    errors: List[str] = []
+    tokens = header.split()
+    if not tokens:
+        return ["missing rule header"]
+    if tokens[0] not in ACTIONS:
+        errors.append(f"unknown action {tokens[0]!r}")
+
+    if len(tokens) == 1:
+        # Snort 3 header-less rule, e.g. builtin stubs: ``alert ( gid:116; ... )``
+        return errors
+    if len(tokens) == 2:
+        if tokens[1] not in PROTOCOLS | SERVICES:
+            errors.append(f"unknown protocol/service {tokens[1]!r}")
+        return errors
+    if len(tokens) != 7:
+        errors.append(
+            f"header must be 'action proto src sport dir dst dport', got {len(tokens)} fields"
+        )
+        return errors
+
+    _, proto, src, sport, direction, dst, dport = tokens
+    if proto not in PROTOCOLS | SERVICES:
+        errors.append(f"unknown protocol {proto!r}")
+    if direction not in DIRECTIONS:
+        errors.append(f"invalid direction {direction!r}")
+    _check_list(src, IP_RE, "address", errors)
+    _check_list(dst, IP_RE, "address", errors)
+    _check_list(sport, PORT_RE, "port", errors)
+    _check_list(dport, PORT_RE, "port", errors)
+    return errors
+
+
+# ---------------- Options ---------------- #
+def _check_quoted(key: str, value: str, errors: List[str]) -> Optional[str]:
+    raw = value.lstrip("!").strip()
+    if not (len(raw) >= 2 and raw[0] == '"' and raw.rfind('"') > 0):
+        errors.append(f"{key} value must be quoted")
+        return None
+    return raw[1 : raw.rfind('"')]
+
+
+def _check_content(value: str, errors: List[str]):
+    text = _check_quoted("content", value, errors)
+    if text is None:
+        return
+    if not text:
+        errors.append("empty content")
+        return
+    if text.count("|") % 2:
+        errors.append("unbalanced '|' in content hex block")
+        return
+    for i, chunk in enumerate(text.split("|")):
+        if i % 2 and (not HEX_RE.match(chunk) or len(chunk.replace(" ", "")) % 2):
+            errors.append(f"invalid hex in content |{chunk}|")
+
+
+def _check_pcre(value: str, errors: List[str]):
+    text = _check_quoted("pcre", value, errors)
+    if text is None:
+        return
+    if text.startswith("m") and len(text) > 1 and not text[1].isalnum():
+        delim, body = text[1], text[2:]
+    elif text.startswith("/"):
+        delim, body = "/", text[1:]
+    else:
+        errors.append("pcre must look like \"/regex/flags\"")
+        return
+    end = body.rfind(delim)
+    if end < 0:
+        errors.append("pcre missing closing delimiter")
+        return
+    bad = set(body[end + 1 :]) - PCRE_FLAGS
+    if bad:
+        errors.append(f"unknown pcre flag(s) {''.join(sorted(bad))!r}")
+    if not body[:end]:
+        errors.append("empty pcre")
+
+
+def _check_flow(value: str, errors: List[str]):
+    words = [w.strip() for w in value.split(",") if w.strip()]
+    if not words:
+        errors.append("flow needs at least one argument")
+    for word in words:
+        if word not in FLOW_WORDS:
+            errors.append(f"unknown flow argument {word!r}")
+    if {"to_client", "from_server"} & set(words) and {"to_server", "from_client"} & set(words):
+        errors.append("flow direction is contradictory")
+
+
+def _check_threshold(key: str, value: str, errors: List[str]):
+    seen = {}
+    for part in value.split(","):
+        bits = part.split()
+        if len(bits) != 2:
+            errors.append(f"malformed {key} argument {part.strip()!r}")
+            continue
+        seen[bits[0]] = bits[1]
+    required = THRESHOLD_KEYS if key == "threshold" else THRESHOLD_KEYS - {"type"}
+    missing = required - set(seen)
+    if missing:
+        errors.append(f"{key} missing {', '.join(sorted(missing))}")
+    unknown = set(seen) - THRESHOLD_KEYS
+    if unknown:
+        errors.append(f"{key} has unknown argument(s) {', '.join(sorted(unknown))}")
+    if "type" in seen and seen["type"] not in THRESHOLD_TYPES:
+        errors.append(f"invalid {key} type {seen['type']!r}")
+    if "track" in seen and seen["track"] not in TRACK_VALUES:
+        errors.append(f"invalid {key} track {seen['track']!r}")
+    for num in ("count", "seconds"):
+        if num in seen and not seen[num].isdigit():
+            errors.append(f"{key} {num} must be an integer")
+
+
+def check_options(body: str) -> Tuple[List[str], Optional[int]]:
+    """Validate the option text between the parentheses; returns (errors, sid)."""
+    errors: List[str] = []
+    seen = {}
+    pos = 0
+    sid = None
+    if not body.rstrip().endswith(";"):
+        # Snort tolerates a missing ';' after the last option.
+        body = body.rstrip() + ";"
+    for m in OPTION_RE.finditer(body):
+        if body[pos : m.start()].strip():
+            errors.append(f"cannot parse options near {body[pos:m.start()].strip()[:30]!r}")
+        pos = m.end()
+        key = m.group(1).lower()
+        value = (m.group(2) or "").strip()
+        seen[key] = seen.get(key, 0) + 1
+
+        if key not in KEYWORDS:
+            errors.append(f"unknown option {key!r}")
+            continue
+        if not value and m.group(2) is None and key not in NO_VALUE_OK:
+            errors.append(f"option {key!r} needs a value")
+            continue
+
+        if key in INT_OPTIONS:
+            if not INT_RE.match(value) or int(value) < 0:
+                errors.append(f"{key} must be a non-negative integer, got {value!r}")
+            elif key == "sid":
+                sid = int(value)
+                if sid == 0:
+                    errors.append("sid must be greater than 0")
+        elif key in INT_OR_VAR and value:
+            if not (INT_RE.match(value) or VAR_RE.match(value)):
+                errors.append(f"{key} must be an integer or variable, got {value!r}")
+        elif key == "msg":
+            _check_quoted("msg", value, errors)
+        elif key in ("content", "uricontent", "protected_content"):
+            _check_content(value.split('",', 1)[0] + '"' if '",' in value else value, errors)
+        elif key == "pcre":
+            _check_pcre(value, errors)
+        elif key == "flow":
+            _check_flow(value, errors)
+        elif key in ("threshold", "detection_filter"):
+            _check_threshold(key, value, errors)
+        elif key == "classtype" and not VAR_RE.match(value.replace("-", "_")):
+            errors.append(f"invalid classtype {value!r}")
+
+    rest = body[pos:].strip()
+    if rest:
+        errors.append(f"missing ';' after {rest[:30]!r}")
+    if "sid" not in seen:
+        errors.append("missing sid")
+    for key in ("sid", "rev", "gid", "msg", "classtype", "priority"):
+        if seen.get(key, 0) > 1:
+            errors.append(f"duplicate {key} option")
+    return errors, sid
+
+
+def check_rule(text: str) -> Tuple[List[str], Optional[int]]:
+    start = text.find("(")
+    end = text.rfind(")")
+    if start < 0:
+        return ["missing '(' before rule options"], None
+    if end < start or text[end + 1 :].strip():
+        return ["rule options must end with ')'"], None
+    errors = check_header(text[:start])
+    option_errors, sid = check_options(text[start + 1 : end])
+    return errors + option_errors, sid
+
+
+# ---------------- Files ---------------- #
+def validate_lines(start_line: int, lines: List[str]) -> List[RuleError]:
+    """Validate a shard of lines; ``start_line`` is the 1-based number of the first."""
+    found = []
+    for line_no, line in enumerate(lines, start=start_line):
+        text, active = strip_comment(line)
+        if not text or not active:
+            continue
+        if text.startswith(("include ", "var ", "ipvar ", "portvar ")):
+            continue
+        errors, sid = check_rule(text)
+        found.extend(RuleError(line_no, sid, e) for e in errors)
+    return found
+
+
+def _shards(path: Path, size: int):
+    shard: List[str] = []
+    start = 1
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line_no, line in enumerate(f, start=1):
+            shard.append(line)
+            if len(shard) >= size:
+                yield start, shard
+                start, shard = line_no + 1, []
+    if shard:
+        yield start, shard
+
+
+def _includes(path: Path) -> List[Tuple[int, str]]:
+    """(line number, target) of every active ``include`` line in ``path``."""
+    found = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line_no, line in enumerate(f, start=1):
+            text, active = strip_comment(line)
+            if active and text.startswith("include "):
+                found.append((line_no, text[len("include ") :].strip()))
+    return found
+
+
+def validate_file(
+    path: Path, jobs: Optional[int] = None, shard_lines=SHARD_LINES, _seen: Optional[set] = None
+) -> List[RuleError]:
+    """Validate every active rule in ``path`` and the files it includes.
+
+    Errors in ``path`` are sorted by line and followed by those of each
+    included file in include order. Targets using Snort variables
+    (``$RULE_PATH/...``) cannot be resolved here and are skipped.
+    """
+    path = Path(path)
+    seen = _seen if _seen is not None else set()
+    seen.add(path.resolve())
+    errors = _validate_one(path, jobs, shard_lines)
+    for line_no, target in _includes(path):
+        if "$" in target:
+            continue
+        included = Path(target) if Path(target).is_absolute() else path.parent / target
+        if not included.is_file():
+            errors.append(RuleError(line_no, None, f"included file not found: {target}"))
+            continue
+        if included.resolve() in seen:
+            continue
+        for e in validate_file(included, jobs, shard_lines, seen):
+            errors.append(e if e.file else e._replace(file=included.name))
+    return errors
+
+
+def _validate_one(path: Path, jobs: Optional[int], shard_lines: int) -> List[RuleError]:
+    shards = list(_shards(path, shard_lines))
+    jobs = jobs or os.cpu_count() or 1
+    if len(shards) <= 1 or jobs <= 1:
+        errors = [e for start, lines in shards for e in validate_lines(start, lines)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(shards))) as pool:
+            results = pool.map(validate_lines, *zip(*shards))
+            errors = [e for result in results for e in result]
+    return sorted(errors)
@@ -0,0 +1,212 @@
+"""Rebuild, validate and hot-reload the ruleset when enabled rules change.
+
+One reload cycle builds the ruleset, validates it and, if it is good,
+keeps a copy as the last good ruleset and asks the running Snort to
+reload. A ruleset that fails validation is replaced by the last good copy
+and Snort is left alone, so a typo never reaches the sensor.
+
+Snort 2 reloads on SIGHUP. Snort 3 reloads through its control channel
+(``reload_config()`` on the ``-j`` port or control socket); without one it
+is sent SIGHUP as well, which Snort 3 also treats as a reload request.
+
+A grouped ruleset includes files from a ``groups-*`` directory that the
+next build deletes, so the last good copy keeps its own copy of them.
+"""
+
+import os
+import shutil
+import signal
+import socket
+import tempfile
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional
+
+from modules.configuration.ruleset_builder import GROUPS_PREFIX
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+LAST_GOOD_SUFFIX = ".last-good"
+PROCESS_NAMES = ("snort", "snort3")
+CONTROL_TIMEOUT = 5.0
+
+
+class CycleResult(NamedTuple):
+    status: str  # "unchanged", "reloaded", "built", "rolled-back" or "failed"
+    errors: List[str]
+
+
+def last_good_path(target: Path) -> Path:
+    return target.with_name(target.name + LAST_GOOD_SUFFIX)
+
+
+def _copy_atomic(src: Path, dest: Path):
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.")
+    os.close(fd)
+    try:
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def last_good_groups(target: Path) -> Path:
+    return target.with_name(target.name + LAST_GOOD_SUFFIX + ".d")
+
+
+def remember_good(target: Path):
+    """Keep ``target`` as the last good ruleset, with copies of the group files it includes."""
+    good, kept = last_good_path(target), last_good_groups(target)
+    text = target.read_bytes()
+    groups = set()
+    for line in text.splitlines():
+        if line.startswith(b"include "):
+            parent = Path(line[8:].strip().decode()).parent
+            if parent.parent == target.parent and parent.name.startswith(GROUPS_PREFIX):
+                groups.add(parent)
+    if not groups:
+        _copy_atomic(target, good)
+        # A rolled-back ruleset still includes the kept copies.
+        if kept.is_dir() and f"include {kept}/".encode() not in text:
+            shutil.rmtree(kept, ignore_errors=True)
+        return
+
+    staging = Path(tempfile.mkdtemp(dir=target.parent, prefix=f".{kept.name}."))
+    try:
+        os.chmod(staging, 0o755)
+        for group in groups:
+            text = text.replace(f"include {group}/".encode(), f"include {kept}/".encode())
+            for path in group.iterdir():
+                shutil.copy2(path, staging / path.name)
+        old = kept.with_name(f".{kept.name}.old")
+        shutil.rmtree(old, ignore_errors=True)
+        if kept.exists():
+            os.replace(kept, old)
+        os.replace(staging, kept)
+        shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    fd, tmp = tempfile.mkstemp(dir=good.parent, prefix=f".{good.name}.")
+    with os.fdopen(fd, "wb") as f:
+        f.write(text)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, good)
+
+
+def roll_back(target: Path) -> bool:
+    """Put the last good ruleset back in place; False if there is none."""
+    good = last_good_path(target)
+    if not good.exists():
+        return False
+    _copy_atomic(good, target)
+    return True
+
+
+# ---------------- Finding and signalling Snort ---------------- #
+def find_snort_pid(pidfile: Optional[Path] = None) -> Optional[int]:
+    """PID of the running Snort, from ``pidfile`` or by scanning /proc."""
+    if pidfile:
+        try:
+            pid = int(Path(pidfile).read_text().split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+        return pid if _alive(pid) else None
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            comm = (entry / "comm").read_text().strip()
+        except OSError:
+            continue
+        if comm in PROCESS_NAMES:
+            return int(entry.name)
+    return None
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def send_control(address: str, command: str = "reload_config()") -> str:
+    """Send one command to a Snort 3 control channel (``host:port`` or socket path)."""
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        sock = socket.create_connection((host or "127.0.0.1", int(port)), CONTROL_TIMEOUT)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONTROL_TIMEOUT)
+        sock.connect(address)
+    with sock:
+        sock.sendall(command.encode() + b"\n")
+        try:
+            reply = sock.recv(4096).decode(errors="replace")
+        except socket.timeout:
+            reply = ""
+    return reply.strip()
+
+
+def reload_snort(pid: Optional[int], control: Optional[str] = None) -> bool:
+    """Ask Snort to reload its rules; True if the request was delivered."""
+    if control:
+        try:
+            reply = send_control(control)
+        except OSError as e:
+            logger.error(f"Snort control channel {control} unavailable: {e}")
+            return False
+        logger.info(f"Sent reload_config() to {control}: {reply or 'no reply'}")
+        return True
+    if pid is None:
+        logger.warning("No running Snort found, nothing to reload")
+        return False
+    try:
+        os.kill(pid, signal.SIGHUP)
+    except OSError as e:
+        logger.error(f"Could not signal Snort (pid {pid}): {e}")
+        return False
+    logger.info(f"Sent SIGHUP to Snort (pid {pid})")
+    return True
+
+
+# ---------------- Reload cycle ---------------- #
+def reload_cycle(
+    build: Callable[[], object],
+    validate: Callable[[], List[str]],
+    target: Path,
+    pid: Optional[int] = None,
+    control: Optional[str] = None,
+) -> CycleResult:
+    """Build, validate, then reload or roll back.
+
+    ``build`` returns a build result with a ``changed`` attribute (None on
+    failure); ``validate`` returns a list of error strings for the new
+    ruleset.
+    """
+    result = build()
+    if result is None:
+        return CycleResult("failed", ["build failed"])
+    if not result.changed:
+        return CycleResult("unchanged", [])
+
+    errors = validate()
+    if errors:
+        if roll_back(target):
+            logger.error(f"New ruleset failed validation ({len(errors)} error(s)), rolled back")
+            return CycleResult("rolled-back", errors)
+        logger.error("New ruleset failed validation and there is no good ruleset to roll back to")
+        return CycleResult("failed", errors)
+
+    remember_good(target)
+    if reload_snort(pid, control):
+        return CycleResult("reloaded", [])
+    return CycleResult("built", [])
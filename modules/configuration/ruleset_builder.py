@@ -0,0 +1,305 @@
+"""Incremental, streaming generation of rules/generated/snort.rules.
+
+A manifest next to the output records the size, mtime and SHA-256 of every
+enabled file that went into the last build. When nothing changed the build
+is a no-op; otherwise the enabled files are streamed block by block into a
+temporary file which is then renamed over the target, so a running Snort
+never sees a half-written ruleset.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from modules.configuration.rule_parser import Rule, parse_line
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_VERSION = 1
+COPY_BUFSIZE = 1024 * 1024
+# Grouped output keeps one open handle per group; past this many groups new
+# ports fall into a per-protocol "other" group.
+MAX_GROUPS = 256
+GROUPS_PREFIX = "groups-"
+
+
+class BuildResult(NamedTuple):
+    changed: bool
+    files: int
+    bytes_written: int
+    elapsed: float
+    target: Path
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("version") == MANIFEST_VERSION else {}
+
+
+def _save_manifest(path: Path, data: dict):
+    data["version"] = MANIFEST_VERSION
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".manifest.")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BUFSIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def snapshot_inputs(files: List[Path], previous: Dict[str, dict]) -> Dict[str, dict]:
+    """Describe ``files`` by size/mtime/hash, hashing only what changed on disk."""
+    entries = {}
+    for path in files:
+        st = path.stat()
+        old = previous.get(path.name)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            entries[path.name] = old
+            continue
+        entries[path.name] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(path),
+        }
+    return entries
+
+
+def publish(tmp: str, target: Path):
+    """Rename a finished temp file over ``target`` with normal read permissions.
+
+    mkstemp creates files 0600; Snort may run as an unprivileged user.
+    """
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, target)
+
+
+def _same_content(a: Dict[str, dict], b: Dict[str, dict]) -> bool:
+    return list(a) == list(b) and all(a[k]["sha256"] == b[k]["sha256"] for k in a)
+
+
+def stream_concat(
+    files: List[Path], target: Path, skip: Optional[Dict[str, Set[int]]] = None
+) -> int:
+    """Concatenate ``files`` into ``target`` atomically; returns bytes written.
+
+    Lines whose byte offsets are listed in ``skip[file name]`` are written
+    commented out; every other file is block-copied.
+    """
+    skip = skip or {}
+    written = 0
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            for path in files:
+                last = b"\n"
+                with open(path, "rb") as src:
+                    if path.name in skip:
+                        offsets = skip[path.name]
+                        pos = 0
+                        for line in src:
+                            out = b"# " + line if pos in offsets else line
+                            dst.write(out)
+                            written += len(out)
+                            pos += len(line)
+                            last = line[-1:]
+                    else:
+                        for block in iter(lambda: src.read(COPY_BUFSIZE), b""):
+                            dst.write(block)
+                            written += len(block)
+                            last = block[-1:]
+                if last != b"\n":
+                    dst.write(b"\n")
+                    written += 1
+            dst.flush()
+            os.fsync(dst.fileno())
+        publish(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return written
+
+
+# ---------------- Grouped output ---------------- #
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", text).strip("_").lower() or "x"
+
+
+def _service(rule: Rule) -> Optional[str]:
+    for key, value in rule.options:
+        if key == "service":
+            return value.split(",")[0].strip()
+        if key == "metadata":
+            m = re.search(r"(?:^|,)\s*service\s+([\w-]+)", value)
+            if m:
+                return m.group(1)
+    return None
+
+
+def group_key(rule: Rule) -> str:
+    """Protocol, then service or destination port, e.g. ``tcp_80`` or ``tcp_svc_http``."""
+    tokens = rule.header.split()
+    if len(tokens) < 2:
+        return "builtin"
+    proto = tokens[1]
+    if len(tokens) == 2:
+        return _slug(f"svc_{proto}")
+    service = _service(rule)
+    if service:
+        return _slug(f"{proto}_svc_{service}")
+    if len(tokens) != 7:
+        return _slug(f"{proto}_other")
+    dport = tokens[6]
+    if tokens[4] == "<>" or dport == "any":
+        port = "any"
+    elif dport.isdigit():
+        port = dport
+    elif re.match(r"^\$\w+$", dport):
+        port = f"var_{dport[1:]}"
+    else:
+        port = "mixed"
+    return _slug(f"{proto}_{port}")
+
+
+def stream_grouped(
+    files: List[Path], target: Path, skip: Optional[Dict[str, Set[int]]] = None
+) -> Tuple[int, Dict[str, int]]:
+    """Split active rules into per-group files and point ``target`` at them.
+
+    Groups are written into a fresh ``groups-<ts>`` directory next to
+    ``target``; ``target`` is then atomically replaced by a file of
+    ``include`` lines and older group directories are removed, so Snort
+    always sees a complete set. Returns (bytes written, rules per group).
+    """
+    skip = skip or {}
+    out_dir = Path(tempfile.mkdtemp(dir=target.parent, prefix=f"{GROUPS_PREFIX}{time.time_ns()}-"))
+    os.chmod(out_dir, 0o755)
+    handles = {}
+    counts: Dict[str, int] = {}
+    written = 0
+    preamble: List[bytes] = []
+    try:
+        for path in files:
+            offsets = skip.get(path.name, ())
+            pos = 0
+            with open(path, "rb") as src:
+                for raw in src:
+                    line_pos, pos = pos, pos + len(raw)
+                    if line_pos in offsets:
+                        continue
+                    text = raw.decode("utf-8", "replace")
+                    rule = parse_line(text)
+                    if rule is None:
+                        stripped = raw.strip()
+                        if stripped and not stripped.startswith(b"#"):
+                            preamble.append(stripped + b"\n")
+                        continue
+                    if not rule.enabled:
+                        continue
+                    key = group_key(rule)
+                    if key not in handles and len(handles) >= MAX_GROUPS:
+                        key = _slug(f"{rule.header.split()[1]}_other")
+                    handle = handles.get(key)
+                    if handle is None:
+                        handle = handles[key] = open(out_dir / f"{key}.rules", "wb")
+                    line = raw if raw.endswith(b"\n") else raw + b"\n"
+                    handle.write(line)
+                    written += len(line)
+                    counts[key] = counts.get(key, 0) + 1
+        for handle in handles.values():
+            handle.flush()
+            os.fsync(handle.fileno())
+            handle.close()
+        handles.clear()
+
+        index = b"".join(preamble) + b"".join(
+            f"include {out_dir / key}.rules\n".encode() for key in sorted(counts)
+        )
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        with os.fdopen(fd, "wb") as dst:
+            dst.write(index)
+            dst.flush()
+            os.fsync(dst.fileno())
+        publish(tmp, target)
+        written += len(index)
+    except BaseException:
+        for handle in handles.values():
+            handle.close()
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise
+
+    for old in target.parent.glob(f"{GROUPS_PREFIX}*"):
+        if old != out_dir and old.is_dir():
+            shutil.rmtree(old, ignore_errors=True)
+    return written, counts
+
+
+def build(
+    enabled_dir: Path,
+    target: Path,
+    manifest_path: Optional[Path] = None,
+    force=False,
+    dry_run=False,
+    skip: Optional[Dict[str, Set[int]]] = None,
+    grouped: Optional[bool] = None,
+) -> BuildResult:
+    """Rebuild ``target`` from ``enabled_dir/*.rules`` if any input changed.
+
+    ``skip`` lists rule lines (by file name and byte offset) to comment out
+    in the output, e.g. duplicate SIDs found by :mod:`rule_dedup`. With
+    ``grouped`` the rules are split by protocol and service/port into
+    separate files that ``target`` includes (see :func:`stream_grouped`);
+    left as None it keeps the mode of the last build, so rebuilds after a
+    rule change do not switch the output back to flat.
+    """
+    start = time.perf_counter()
+    manifest_path = manifest_path or target.parent / ".manifest.json"
+    manifest = _load_manifest(manifest_path)
+    output = manifest.get("output", {})
+    if grouped is None:
+        grouped = output.get("mode") == "grouped"
+    mode = "grouped" if grouped else "flat"
+    files = sorted(enabled_dir.glob("*.rules"))
+    inputs = snapshot_inputs(files, manifest.get("inputs", {}))
+
+    up_to_date = (
+        not force
+        and target.exists()
+        and target.stat().st_size == output.get("size")
+        and output.get("mode", "flat") == mode
+        and _same_content(inputs, manifest.get("inputs", {}))
+    )
+    if up_to_date or dry_run:
+        if up_to_date:
+            logger.info(f"Ruleset up to date ({len(files)} files), nothing to build")
+        return BuildResult(not up_to_date, len(files), 0, time.perf_counter() - start, target)
+
+    if grouped:
+        written, groups = stream_grouped(files, target, skip)
+        logger.info(f"Split ruleset into {len(groups)} protocol/port groups")
+    else:
+        written = stream_concat(files, target, skip)
+        for old in target.parent.glob(f"{GROUPS_PREFIX}*"):
+            shutil.rmtree(old, ignore_errors=True)
+    _save_manifest(
+        manifest_path,
+        {"inputs": inputs, "output": {"size": target.stat().st_size, "mode": mode}},
+    )
+    elapsed = time.perf_counter() - start
+    logger.info(f"Built {target} ({mode}) from {len(files)} files: {written} bytes in {elapsed:.3f}s")
+    return BuildResult(True, len(files), written, elapsed, target)
@@ -4,6 +4,7 @@ from pathlib import Path
 from rich.console import Console
 from modules.utilities.logger import get_logger
 from modules.utilities.error_handler import get_error_logger
+from modules.configuration.rule_index import RuleIndex
 
 errorlog = get_error_logger(__name__)
 
@@ -68,6 +69,15 @@ def interactive_add_rule(root: Path):
         print("SID and Rev must be integers.")
         return
 
+    index = RuleIndex(rules_dir)
+    index.refresh()
+    taken = index.lookup(sid)
+    if taken:
+        where = ", ".join(f"{loc.path}:{loc.line_no}" for loc in taken)
+        print(f"SID {sid} is already used ({where}). Pick another SID.")
+        logger.info(f"Refused duplicate SID {sid} ({where})")
+        return
+
     # --- Build rule -----------------------------------------------------------
     rule = (
         f"alert {proto} {src} {src_port} -> {dst} {dst_port} "
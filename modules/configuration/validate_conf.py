@@ -1,15 +1,37 @@
 from pathlib import Path
+from modules.configuration.rule_validator import validate_file
+from modules.utilities import metrics
+from modules.utilities.logger import get_logger
 
+logger = get_logger(__name__)
 
-def validate_configuration(root: Path):
-    # Simple validation: check that rules file exists and is not empty
+VALIDATION_SECONDS = metrics.histogram("snortamv_rule_validation_seconds", "Time to validate snort.rules")
+
+
+def validate_configuration(root: Path, jobs=None):
+    # Check that the generated ruleset exists, is not empty and parses as
+    # valid Snort 2/3 rules (no Snort binary needed).
     rules = root / "rules" / "generated"/"snort.rules"
     if not rules.exists():
         print("Validation failed: snort.rules missing")
         return False
-    content = rules.read_text().strip()
-    if not content:
+    with open(rules, "rb") as f:
+        empty = not any(line.strip() for line in f)
+    if empty:
         print("Validation failed: snort.rules is empty")
         return False
-    print("Configuration validation: ok (demo)")
+
+    with VALIDATION_SECONDS.time():
+        errors = validate_file(rules, jobs=jobs)
+    metrics.counter(
+        "snortamv_rule_validations_total", "Ruleset validations by outcome", result="fail" if errors else "pass"
+    ).inc()
+    if errors:
+        for error in errors:
+            print(f"{rules.name}: {error}")
+        print(f"Validation failed: {len(errors)} error(s) in {rules}")
+        logger.error(f"Rule validation failed with {len(errors)} error(s) in {rules}")
+        return False
+    print("Configuration validation: ok")
+    logger.info(f"Rule validation passed for {rules}")
     return True
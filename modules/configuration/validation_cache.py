@@ -0,0 +1,224 @@
+"""Cache of ``snort -T`` results keyed by config, rules and Snort version.
+
+A config test of a large ruleset takes tens of seconds, and launching Snort
+used to run two of them every time. The result of each test is stored
+under a key made of the Snort version and the SHA-256 of the config, every
+file it includes and the generated rules, so a launch with nothing changed
+skips the test entirely. Files are only re-hashed when their size or mtime
+changed, and failures are cached too (with their output) so a broken
+config fails fast until it is edited.
+
+Run as ``python3 -m modules.configuration.validation_cache`` from
+snort_auto.bash; the exit status is 0 when the config (and rules) pass.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from modules.utilities import metrics, snort_probe
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+ROOT = Path(__file__).resolve().parents[2]
+CACHE_PATH = ROOT / "rules" / ".validation-cache.json"
+CACHE_VERSION = 1
+MAX_RESULTS = 32
+OUTPUT_TAIL = 4000
+HASH_BUFSIZE = 1024 * 1024
+
+TEST_SECONDS = metrics.histogram("snortamv_snort_config_test_seconds", "Wall time of uncached snort -T runs")
+
+VAR_RE = re.compile(r"^\s*(?:ip|port)?var\s+(\w+)\s+(\S+)")
+INCLUDE_RE = re.compile(r"""^\s*include\s*\(?\s*['"]?([^'"\s)]+)""")
+
+
+class CheckResult(NamedTuple):
+    ok: bool
+    cached: bool
+    seconds: float
+    output: str
+
+
+def config_files(conf: Path) -> List[Path]:
+    """``conf`` plus every file it includes that can be resolved, recursively.
+
+    ``$VAR`` references are expanded from ``var``/``ipvar``/``portvar``
+    lines seen so far; relative paths are tried against the including
+    file's directory and then the working directory.
+    """
+    seen: Dict[Path, None] = {}
+    variables: Dict[str, str] = {}
+
+    def expand(value: str) -> str:
+        return re.sub(r"\$(\w+)", lambda m: variables.get(m.group(1), m.group(0)), value)
+
+    def visit(path: Path):
+        path = path.resolve()
+        if path in seen or not path.is_file():
+            return
+        seen[path] = None
+        try:
+            lines = path.read_text(errors="replace").splitlines()
+        except OSError:
+            return
+        for line in lines:
+            m = VAR_RE.match(line)
+            if m:
+                variables[m.group(1)] = expand(m.group(2))
+                continue
+            m = INCLUDE_RE.match(line)
+            if not m:
+                continue
+            target = Path(expand(m.group(1)))
+            for candidate in (target,) if target.is_absolute() else (path.parent / target, target):
+                if candidate.is_file():
+                    visit(candidate)
+                    break
+
+    visit(Path(conf))
+    return list(seen)
+
+
+class ValidationCache:
+    def __init__(self, path: Path = CACHE_PATH):
+        self.path = Path(path)
+        self.data = {"version": CACHE_VERSION, "digests": {}, "binaries": {}, "results": {}}
+        try:
+            data = json.loads(self.path.read_text())
+            if data.get("version") == CACHE_VERSION:
+                self.data = data
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        results = self.data["results"]
+        for key in sorted(results, key=lambda k: results[k]["checked"])[:-MAX_RESULTS]:
+            del results[key]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".validation-cache.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    # ---------------- Inputs ---------------- #
+    def file_digest(self, path: Path) -> str:
+        """SHA-256 of ``path``, re-read only when its size or mtime changed."""
+        path = Path(path).resolve()
+        st = path.stat()
+        entry = self.data["digests"].get(str(path))
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_BUFSIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.data["digests"][str(path)] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def snort_banner(self, snort: str) -> str:
+        """Snort's version banner, re-queried only when the binary changed."""
+        binary = Path(snort_probe.find_snort(snort) or snort).resolve()
+        st = binary.stat()
+        entry = self.data["binaries"].get(str(binary))
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        kind, banner = snort_probe.snort_version(str(binary))
+        banner = f"{kind} {banner}"
+        self.data["binaries"][str(binary)] = [st.st_mtime_ns, st.st_size, banner]
+        return banner
+
+    def snort_kind(self, snort: str) -> str:
+        """``"snort2"`` or ``"snort3"``, from the cached banner."""
+        return self.snort_banner(snort).split(" ", 1)[0]
+
+    def key(self, snort: str, conf: Path, rules: Optional[Path] = None) -> str:
+        h = hashlib.sha256(self.snort_banner(snort).encode())
+        for path in config_files(conf):
+            h.update(f"\0{path}\0{self.file_digest(path)}".encode())
+        if rules is not None:
+            h.update(f"\0rules\0{self.file_digest(rules)}".encode())
+        return h.hexdigest()
+
+
+def cached_config_test(
+    snort: str,
+    conf: Path,
+    rules: Optional[Path] = None,
+    cache: Optional[ValidationCache] = None,
+    force: bool = False,
+) -> CheckResult:
+    """``snort -T`` on ``conf`` (plus ``rules``), answered from the cache when possible."""
+    cache = cache or ValidationCache()
+    key = cache.key(snort, conf, rules)
+    hit = cache.data["results"].get(key)
+    if hit and not force:
+        logger.info(f"snort -T cache hit for {conf} ({'pass' if hit['ok'] else 'fail'})")
+        _count_test(hit["ok"], cached=True)
+        cache.save()
+        return CheckResult(hit["ok"], True, hit["seconds"], hit["output"])
+
+    run = snort_probe.config_test(snort, Path(conf), rules, kind=cache.snort_kind(snort))
+    output = run.output[-OUTPUT_TAIL:]
+    TEST_SECONDS.observe(run.seconds)
+    _count_test(run.ok, cached=False)
+    cache.data["results"][key] = {
+        "ok": run.ok,
+        "seconds": run.seconds,
+        "output": output,
+        "checked": time.time(),
+    }
+    cache.save()
+    return CheckResult(run.ok, False, run.seconds, output)
+
+
+def _count_test(ok: bool, cached: bool):
+    metrics.counter(
+        "snortamv_snort_config_tests_total",
+        "snort -T checks by outcome and cache use",
+        result="pass" if ok else "fail",
+        cached=str(cached).lower(),
+    ).inc()
+
+
+def main(argv=None) -> int:
+    from rich.console import Console
+
+    console = Console()
+    parser = argparse.ArgumentParser(description="Cached snort -T for the config and ruleset")
+    parser.add_argument("--snort", default="/usr/sbin/snort", help="Path to the Snort binary")
+    parser.add_argument("--conf", required=True, help="Snort config (snort.conf / snort.lua)")
+    parser.add_argument("--rules", help="Generated rules file to test with the config")
+    parser.add_argument("--force", action="store_true", help="Ignore cached results")
+    args = parser.parse_args(argv)
+
+    metrics.enable_persistence()
+    cache = ValidationCache()
+    rules = Path(args.rules) if args.rules and Path(args.rules).is_file() else None
+    if args.rules and rules is None:
+        console.print(f"[yellow]No rules found at {args.rules}, testing the config only[/yellow]")
+    checks = [("config", None)]
+    # A config that already includes the rules tests them; a second pass would load them twice.
+    if rules and rules.resolve() not in config_files(Path(args.conf)):
+        checks.append(("rules", rules))
+    for label, extra in checks:
+        result = cached_config_test(args.snort, Path(args.conf), extra, cache, args.force)
+        source = "cached" if result.cached else f"{result.seconds:.1f}s"
+        if not result.ok:
+            console.print(f"[red]Snort {label} test failed ({source}):[/red]\n{result.output}")
+            return 1
+        console.print(f"[green]Snort {label} test passed ({source})[/green]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+from rich.console import Console
+
+from modules.decrypt.flows import decrypt_flows
+from modules.decrypt.hexdump import LINKTYPE_RAW, convert, is_capture
+from modules.decrypt.keylog import KEYLOG, KEYSTORE, minimal_keylog
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+console = Console()
+
+OUT_DIR = Path("/tmp/snort_decrypt")
+SHOW_LINES = 200
+SHOW_FLOWS = 20
+
+
+def to_pcap(log, output=None, raw=False):
+    """Path of a capture for ``log``: the file itself if it is one, else a conversion."""
+    log = Path(log)
+    if not log.is_file():
+        console.print(f"[red]File not found: {log}[/red]")
+        return None
+    if is_capture(log):
+        console.print(f"[blue]{log} is already a capture[/blue]")
+        return log
+    stem = log.name[:-3] if log.name.endswith(".gz") else log.name
+    output = Path(output) if output else OUT_DIR / f"{stem}.pcap"
+    try:
+        result = convert(log, output, linktype=LINKTYPE_RAW if raw else None)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Could not convert {log}: {e}[/red]")
+        logger.error(f"Hexdump conversion of {log} failed: {e}")
+        return None
+    if not result.packets:
+        console.print(f"[yellow]No packet hexdumps found in {log}[/yellow]")
+        return None
+    console.print(
+        f"[green]Converted {result.packets} packets ({result.bytes} bytes) → {output} "
+        f"in {result.seconds:.2f}s[/green]"
+    )
+    logger.info(f"Converted {log} to {output}: {result.packets} packets")
+    return output
+
+
+def capture_keys(pcap, keylog=KEYLOG, store=KEYSTORE):
+    """A key log with only the secrets of ``pcap``'s handshakes, from the synced key store."""
+    keylog = Path(keylog)
+    if not keylog.is_file() or not keylog.stat().st_size:
+        console.print(f"[yellow]No TLS keys in {keylog}; packets stay encrypted[/yellow]")
+        return keylog
+    stem = pcap.name[:-3] if pcap.name.endswith(".gz") else pcap.name
+    output = OUT_DIR / f"{stem}.keys"
+    try:
+        result = minimal_keylog(pcap, output, keylog, store)
+    except (OSError, ValueError) as e:
+        console.print(f"[yellow]Key store unavailable ({e}); using the full key log[/yellow]")
+        logger.error(f"Minimal key log for {pcap} failed: {e}")
+        return keylog
+    console.print(
+        f"[blue]{result.keyed} of {result.handshakes} TLS handshakes have keys: {result.secrets} secrets "
+        f"of {result.stored} stored → {output} ({result.seconds * 1000:.0f}ms)[/blue]"
+    )
+    return output
+
+
+def decrypt_log(log, output=None, keylog=KEYLOG, raw=False, lines=SHOW_LINES):
+    """Convert ``log`` if needed and show the first decrypted packets with tshark."""
+    pcap = to_pcap(log, output, raw=raw)
+    if pcap is None:
+        return None
+    tshark = shutil.which("tshark")
+    if not tshark:
+        console.print("[yellow]tshark not found; install Wireshark to decrypt (the pcap is kept)[/yellow]")
+        return pcap
+    keys = capture_keys(pcap, keylog)
+    proc = subprocess.Popen(
+        [tshark, "-o", f"tls.keylog_file:{keys}", "-r", str(pcap), "-V"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        for _, line in zip(range(lines), proc.stdout):
+            print(line, end="")
+    finally:
+        proc.kill()
+        proc.wait()
+    console.print(f"[bold green]PCAP: {pcap}\nKEYS: {keys}[/bold green]")
+    return pcap
+
+
+def decrypt_by_flow(log, out_dir=None, keylog=KEYLOG, keyed=False, workers=None, display_filter=None, raw=False):
+    """Decrypt each TCP flow of ``log`` into its own file, with tshark workers in parallel."""
+    pcap = to_pcap(log, raw=raw)
+    if pcap is None:
+        return None
+    tshark = shutil.which("tshark")
+    if not tshark:
+        console.print("[yellow]tshark not found; install Wireshark to decrypt (the pcap is kept)[/yellow]")
+        return None
+    keys = capture_keys(pcap, keylog)
+    stem = pcap.name[:-3] if pcap.name.endswith(".gz") else pcap.name
+    out_dir = Path(out_dir) if out_dir else OUT_DIR / f"flows-{stem}"
+    try:
+        result = decrypt_flows(
+            pcap,
+            out_dir,
+            keylog=keys,
+            keyed_only=keyed,
+            workers=workers,
+            display_filter=display_filter,
+            tshark=tshark,
+        )
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        console.print(f"[red]Decryption of {pcap} failed: {e}[/red]")
+        logger.error(f"Flow decryption of {pcap} failed: {e}")
+        return None
+    for item in sorted(result.flows, key=lambda item: item.bytes, reverse=True)[:SHOW_FLOWS]:
+        keyed_mark = "[green]keys[/green]" if item.client_random else "[dim]no hello[/dim]"
+        console.print(f"  {item.path.name}  {item.packets} packets, {item.bytes} bytes  {keyed_mark}")
+    skipped = f", {result.skipped} without keys skipped" if keyed else ""
+    console.print(
+        f"[bold green]{len(result.flows)} flow(s){skipped} in {result.shards} shard(s) → {out_dir} "
+        f"in {result.seconds:.2f}s[/bold green]"
+    )
+    logger.info(f"Decrypted {len(result.flows)} flows of {pcap} into {out_dir}")
+    return result
@@ -0,0 +1,230 @@
+"""Decrypt a capture flow by flow with a pool of tshark workers.
+
+The capture's packet index (``modules.logs.pcap_index``) groups packets
+into TCP flows without decoding them again. Each flow's TLS ClientRandom
+is read from its ClientHello, so flows the key log has no secrets for can
+be skipped. Whole flows are packed into a few shard pcaps of about equal
+size, one tshark per shard runs in parallel and its ``-V`` output is split
+at the ``Frame N:`` lines back into one text file per flow.
+
+``tshark`` can be any command that takes tshark's ``-o``, ``-r``, ``-V``
+and ``-Y`` arguments and prints ``Frame N:`` headers, so tests use a local
+stand-in.
+"""
+
+import argparse
+import heapq
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from modules.decrypt.hexdump import PcapWriter
+from modules.decrypt.keylog import client_random, keylog_randoms
+from modules.logs.pcap_index import HEADER_SIZE, RECORD, Capture, Flow
+
+TCP = 6
+# Packets per flow searched for the ClientHello.
+HELLO_PACKETS = 8
+SHARDS_PER_WORKER = 2
+FRAME_RE = re.compile(rb"^Frame (\d+):")
+
+
+class FlowOutput(NamedTuple):
+    flow: Flow
+    packets: int
+    bytes: int
+    client_random: Optional[bytes]
+    path: Path
+
+
+class DecryptResult(NamedTuple):
+    flows: List[FlowOutput]
+    skipped: int  # TCP flows left out by the key log filter
+    shards: int
+    seconds: float
+
+
+def tcp_flows(cap: Capture) -> Dict[bytes, List[int]]:
+    """Packet indexes of each TCP flow (both directions), keyed by link type + endpoints."""
+    flows: Dict[bytes, List[int]] = defaultdict(list)
+    index, size = cap.index, RECORD.size
+    for i in range(cap.count):
+        offset = HEADER_SIZE + i * size
+        if index[offset + 60] != TCP:
+            continue
+        key = index[offset + 24 : offset + 60]
+        rev = key[16:32] + key[:16] + key[34:36] + key[32:34]
+        flows[index[offset + 62 : offset + 64] + min(key, rev)].append(i)
+    return flows
+
+
+def _name(flow: Flow) -> str:
+    return f"tcp-{flow.src}_{flow.sport}-{flow.dst}_{flow.dport}".replace(":", ".")
+
+
+def _balance(sizes: List[int], shards: int) -> List[List[int]]:
+    """Flow numbers split into ``shards`` bins of similar byte size, largest flows first."""
+    heap = [(0, n) for n in range(shards)]
+    bins: List[List[int]] = [[] for _ in range(shards)]
+    for j in sorted(range(len(sizes)), key=sizes.__getitem__, reverse=True):
+        total, n = heapq.heappop(heap)
+        bins[n].append(j)
+        heapq.heappush(heap, (total + sizes[j], n))
+    return [b for b in bins if b]
+
+
+def _write_shard(cap: Capture, flows: List[List[int]], path: Path):
+    """The flows one after another, each in capture order."""
+    with open(path, "wb") as out:
+        writer = None
+        for members in flows:
+            batch = []
+            for i in members:
+                packet = cap.packet(i + 1)
+                batch.append((packet.ts, packet.data))
+                if writer is None:
+                    writer = PcapWriter(out, packet.linktype)
+            writer.write(batch)
+
+
+def _run_shard(command: List[str], shard: Path, outputs: List[Path], counts: List[int]):
+    """Run tshark on ``shard`` and split its output into the flows' files."""
+    proc = subprocess.Popen(command + ["-r", str(shard)], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    bounds, total = [], 0
+    for count in counts:
+        total += count
+        bounds.append(total)
+    current, out = -1, None
+    try:
+        for line in proc.stdout:
+            m = FRAME_RE.match(line)
+            if m:
+                frame = int(m.group(1))
+                flow = current
+                while flow + 1 < len(bounds) and (flow < 0 or frame > bounds[flow]):
+                    flow += 1
+                if flow != current:
+                    if out is not None:
+                        out.close()
+                    current, out = flow, open(outputs[flow], "ab")
+            if out is not None:
+                out.write(line)
+    finally:
+        if out is not None:
+            out.close()
+        proc.stdout.close()
+        code = proc.wait()
+    if code:
+        raise subprocess.CalledProcessError(code, command)
+
+
+def decrypt_flows(
+    capture: Path,
+    out_dir: Path,
+    keylog: Optional[Path] = None,
+    keyed_only: bool = False,
+    workers: Optional[int] = None,
+    display_filter: Optional[str] = None,
+    tshark: str = "tshark",
+) -> DecryptResult:
+    """Decrypt every TCP flow of ``capture`` into ``out_dir/<flow>.txt``.
+
+    ``keyed_only`` keeps only flows whose ClientRandom is in ``keylog``.
+    """
+    start = time.perf_counter()
+    capture, out_dir = Path(capture), Path(out_dir)
+    workers = workers or os.cpu_count() or 1
+    randoms = keylog_randoms(keylog) if keyed_only and keylog else set()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index = None if os.access(capture.parent, os.W_OK) else out_dir / f".{capture.name}.idx"
+    command = [tshark]
+    if keylog:
+        command += ["-o", f"tls.keylog_file:{keylog}"]
+    command.append("-V")
+    if display_filter:
+        command += ["-Y", display_filter]
+
+    with Capture(capture, index) as cap, tempfile.TemporaryDirectory(prefix="shards-", dir=out_dir) as work:
+        flows, skipped = [], 0
+        for members in tcp_flows(cap).values():
+            hello = None
+            for i in members[:HELLO_PACKETS]:
+                hello = client_random(cap.packet(i + 1).data)
+                if hello:
+                    break
+            if keyed_only and hello not in randoms:
+                skipped += 1
+                continue
+            size = sum(cap.record(i)[2] for i in members)
+            flows.append((members, hello, size))
+        outputs = []
+        for members, hello, size in flows:
+            flow = cap.packet(members[0] + 1).flow
+            path = out_dir / f"{_name(flow)}.txt"
+            path.write_bytes(b"")
+            outputs.append(FlowOutput(flow, len(members), size, hello, path))
+
+        shards = _balance([size for _, _, size in flows], workers * SHARDS_PER_WORKER) if flows else []
+        # Shards are handed to tshark as soon as they are written.
+        with ThreadPoolExecutor(workers) as pool:
+            jobs = []
+            for n, members in enumerate(shards):
+                shard = Path(work) / f"shard-{n}.pcap"
+                _write_shard(cap, [flows[j][0] for j in members], shard)
+                paths, counts = [outputs[j].path for j in members], [outputs[j].packets for j in members]
+                jobs.append(pool.submit(_run_shard, command, shard, paths, counts))
+            for job in jobs:
+                job.result()
+    return DecryptResult(outputs, skipped, len(shards), time.perf_counter() - start)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Decrypt each TCP flow of a capture with parallel tshark")
+    parser.add_argument("capture", help="pcap or pcapng (.gz is fine)")
+    parser.add_argument("output", help="Directory for the per-flow output")
+    parser.add_argument("--keylog", help="NSS key log (SSLKEYLOGFILE)")
+    parser.add_argument("--keyed", action="store_true", help="Only flows whose ClientRandom is in the key log")
+    parser.add_argument("--workers", type=int, help="tshark processes (default: one per core)")
+    parser.add_argument("--filter", help="tshark display filter (-Y)")
+    args = parser.parse_args(argv)
+    tshark = shutil.which("tshark")
+    if not tshark:
+        print("[!] tshark not found", file=sys.stderr)
+        return 1
+    try:
+        result = decrypt_flows(
+            Path(args.capture),
+            Path(args.output),
+            keylog=Path(args.keylog) if args.keylog else None,
+            keyed_only=args.keyed,
+            workers=args.workers,
+            display_filter=args.filter,
+            tshark=tshark,
+        )
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        print(f"[!] Decryption failed: {e}", file=sys.stderr)
+        return 1
+    # A capture without TLS keys or TCP flows is not an error; failures raise above.
+    if not result.flows:
+        what = "no TCP flows with keys in the key log" if args.keyed else "no TCP flows"
+        print(f"[*] Nothing to decrypt: {what} ({result.skipped} skipped)")
+        return 0
+    for item in result.flows:
+        print(f"    {item.path.name}  {item.packets} packets")
+    print(
+        f"[*] {len(result.flows)} flows ({result.skipped} without keys skipped) in {result.shards} shards "
+        f"→ {args.output} in {result.seconds:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Minimal per-capture key logs from the deduplicated key store.
+
+The key log a browser exports (``lock/ssl.log.txt``) is synced into the
+key store (``database.keys``) and, for each capture, only the secrets of
+the handshakes it contains are written out for tshark. The handshakes are
+found by one regex pass for TLS ClientHello records over the raw capture
+bytes (memory-mapped, or streamed for .gz), with no per-packet decoding.
+"""
+
+import argparse
+import gzip
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from database.keys import KEYLOG_RE, KeyStore
+
+ROOT = Path(__file__).resolve().parents[2]
+KEYLOG = ROOT / "lock" / "ssl.log.txt"
+KEYSTORE = ROOT / "lock" / "keys.db"
+CHUNK = 4 * 1024 * 1024
+# TLS handshake record -> ClientHello -> legacy version -> 32 byte random.
+HELLO_RE = re.compile(rb"\x16\x03[\x00-\x04]..\x01...\x03[\x00-\x04](.{32})", re.S)
+HELLO_SPAN = 43  # bytes from the record header to the end of the random
+
+
+class KeylogResult(NamedTuple):
+    handshakes: int  # distinct ClientHellos in the capture
+    keyed: int  # of which the store has secrets for
+    secrets: int  # lines written
+    stored: int  # secrets in the store
+    seconds: float
+
+
+def client_random(frame: bytes) -> Optional[bytes]:
+    m = HELLO_RE.search(frame)
+    return m.group(1) if m else None
+
+
+def keylog_randoms(keylog: Path) -> Set[bytes]:
+    """ClientRandoms with at least one secret in an NSS key log."""
+    with open(keylog, "rb") as f:
+        return {bytes.fromhex(m.group(2).decode()) for m in KEYLOG_RE.finditer(f.read())}
+
+
+def capture_randoms(capture: Path) -> Set[bytes]:
+    """ClientRandoms of the ClientHellos anywhere in ``capture``."""
+    capture = Path(capture)
+    if capture.name.endswith(".gz"):
+        randoms, carry = set(), b""
+        with gzip.open(capture, "rb") as f:
+            for data in iter(lambda: f.read(CHUNK), b""):
+                data = carry + data
+                randoms.update(m.group(1) for m in HELLO_RE.finditer(data))
+                carry = data[-HELLO_SPAN:]
+        return randoms
+    with open(capture, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return set()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return {m.group(1) for m in HELLO_RE.finditer(data)}
+
+
+def write_keylog(secrets: Dict[bytes, List[Tuple[str, bytes]]], path: Path) -> int:
+    """Write ``secrets`` as an NSS key log readable by the owner only; returns lines written."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = [
+        f"{label} {random.hex()} {secret.hex()}\n"
+        for random in sorted(secrets)
+        for label, secret in secrets[random]
+    ]
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(lines)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(lines)
+
+
+def minimal_keylog(capture: Path, output: Path, keylog: Path = KEYLOG, store: Path = KEYSTORE) -> KeylogResult:
+    """Sync ``keylog`` into the store and write the secrets for ``capture``'s handshakes to ``output``."""
+    start = time.perf_counter()
+    with KeyStore(store) as keys:
+        keys.sync(keylog)
+        randoms = capture_randoms(capture)
+        secrets = keys.lookup(randoms)
+        stored = len(keys)
+    written = write_keylog(secrets, output)
+    return KeylogResult(len(randoms), len(secrets), written, stored, time.perf_counter() - start)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write a key log with only the secrets a capture needs")
+    parser.add_argument("capture", help="pcap or pcapng (.gz is fine)")
+    parser.add_argument("output", help="Key log to write")
+    parser.add_argument("--keylog", default=str(KEYLOG), help="Browser key log (SSLKEYLOGFILE) to sync first")
+    parser.add_argument("--store", default=str(KEYSTORE), help="Key store database")
+    args = parser.parse_args(argv)
+    try:
+        result = minimal_keylog(Path(args.capture), Path(args.output), Path(args.keylog), Path(args.store))
+    except (OSError, ValueError) as e:
+        print(f"[!] Could not write the key log: {e}", file=sys.stderr)
+        return 1
+    print(
+        f"[*] {result.keyed} of {result.handshakes} handshakes have keys: {result.secrets} secrets "
+        f"(of {result.stored} stored) → {args.output} in {result.seconds:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
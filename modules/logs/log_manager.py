@@ -0,0 +1,209 @@
+import argparse
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+from rich.markup import escape
+
+from modules.alerts.alert_fast import parse_time
+from modules.logs.retention import (
+    DAY,
+    DEFAULT_DAYS,
+    DEFAULT_RATE,
+    DEFAULT_WORKERS,
+    LOG_DIR,
+    SETTLE_SECONDS,
+    enforce,
+)
+from modules.decrypt.hexdump import PcapWriter
+from modules.logs.pcap_index import Capture
+from modules.logs.search import DEFAULT_LIMIT, search
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+console = Console()
+
+PROTO_NAMES = {1: "ICMP", 6: "TCP", 17: "UDP", 58: "ICMPv6", 132: "SCTP"}
+SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(value):
+    """``500M``, ``20G`` or a plain byte count."""
+    if value is None:
+        return None
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def human(size):
+    for unit in ("B", "K", "M", "G"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+# ---------------- Log Ops ---------------- #
+def clean_logs(
+    log_dir=LOG_DIR,
+    days=DEFAULT_DAYS,
+    max_size=None,
+    workers=DEFAULT_WORKERS,
+    rate=DEFAULT_RATE,
+    settle=SETTLE_SECONDS,
+    alerts=False,
+    dry_run=False,
+):
+    """One retention pass: compress rotated logs/pcaps, then apply the age and size budgets."""
+    try:
+        max_bytes = parse_size(max_size)
+    except ValueError:
+        console.print(f"[red]Invalid size: {max_size}[/red]")
+        return None
+    log_dir = Path(log_dir)
+    if not log_dir.is_dir():
+        console.print(f"[yellow]{log_dir} does not exist[/yellow]")
+        return None
+    result = enforce(
+        log_dir,
+        days=days,
+        max_bytes=max_bytes,
+        workers=workers,
+        rate=rate,
+        settle=settle,
+        dry_run=dry_run,
+    )
+    compress_verb, delete_verb = ("would compress", "would delete") if dry_run else ("compressed", "deleted")
+    for name in result.compressed:
+        console.print(f"  [cyan]{compress_verb}[/cyan] {name}", highlight=False)
+    for name in result.deleted:
+        console.print(f"  [red]{delete_verb}[/red] {name}", highlight=False)
+    if alerts and days is not None and not dry_run:
+        from modules.alerts.alert_manager import open_store
+
+        store = open_store()
+        try:
+            dropped = store.drop_before(time.time() - days * DAY)
+        finally:
+            store.close()
+        if dropped:
+            console.print(f"  [red]dropped[/red] {len(dropped)} alert partition(s) older than {days} days")
+    if dry_run:
+        console.print(
+            f"[yellow]Dry run: {len(result.compressed)} to compress, {len(result.deleted)} to delete "
+            f"({human(result.bytes_before)} in {log_dir})[/yellow]"
+        )
+    else:
+        console.print(
+            f"[green]{len(result.compressed)} compressed, {len(result.deleted)} deleted: "
+            f"{human(result.bytes_before)} → {human(result.bytes_after)} in {result.seconds:.1f}s[/green]"
+        )
+    return result
+
+
+def search_logs(
+    pattern,
+    log_dir=LOG_DIR,
+    since=None,
+    until=None,
+    regex=False,
+    ignore_case=False,
+    workers=None,
+    limit=DEFAULT_LIMIT,
+):
+    """Search current and archived logs in parallel; prints hits oldest first."""
+    log_dir = Path(log_dir)
+    if not log_dir.is_dir():
+        console.print(f"[yellow]{log_dir} does not exist[/yellow]")
+        return []
+    start = time.perf_counter()
+    try:
+        hits, searched, skipped = search(
+            log_dir,
+            pattern,
+            since=parse_time(since),
+            until=parse_time(until),
+            is_regex=regex,
+            ignore_case=ignore_case,
+            workers=workers,
+            limit=limit,
+        )
+    except re.error as e:
+        console.print(f"[red]Invalid pattern: {e}[/red]")
+        return []
+    elapsed = time.perf_counter() - start
+    for hit in hits:
+        console.print(f"[dim]{escape(hit.file)}:{hit.line}[/dim] {escape(hit.text)}", highlight=False)
+    summary = f"{len(hits)} hit(s) in {searched} file(s), {skipped} skipped by time range, {elapsed:.2f}s"
+    if len(hits) >= limit:
+        summary += f" (stopped at --limit {limit})"
+    console.print(f"[dim]{summary}[/dim]")
+    logger.info(f"Log search for {pattern!r}: {summary}")
+    return hits
+
+
+def _describe(packet):
+    when = datetime.fromtimestamp(packet.ts).strftime("%Y-%m-%d %H:%M:%S.%f")
+    flow = packet.flow
+    if flow is None:
+        return f"#{packet.number} {when} linktype {packet.linktype}, {packet.wirelen} bytes"
+    proto = PROTO_NAMES.get(flow.proto, str(flow.proto))
+    src = f"[{flow.src}]" if ":" in flow.src else flow.src
+    dst = f"[{flow.dst}]" if ":" in flow.dst else flow.dst
+    if flow.sport or flow.dport:
+        src, dst = f"{src}:{flow.sport}", f"{dst}:{flow.dport}"
+    return f"#{packet.number} {when} {proto} {src} → {dst} {packet.wirelen} bytes"
+
+
+def show_packets(capture, since=None, until=None, number=None, limit=DEFAULT_LIMIT, write=None):
+    """List (or extract to ``write``) packets of a capture by number or time range."""
+    path = Path(capture)
+    if not path.is_file():
+        console.print(f"[red]File not found: {path}[/red]")
+        return None
+    start = time.perf_counter()
+    try:
+        cap = Capture(path)
+    except OSError as e:
+        console.print(f"[red]Cannot index {path}: {e}[/red]")
+        return None
+    with cap:
+        if cap.indexed:
+            console.print(f"[dim]Indexed {cap.indexed} packets in {time.perf_counter() - start:.2f}s[/dim]")
+        if number is not None:
+            try:
+                selected = [cap.packet(number)]
+            except IndexError as e:
+                console.print(f"[red]{e}[/red]")
+                return None
+        else:
+            packets = cap.between(parse_time(since), parse_time(until))
+            selected = [p for _, p in zip(range(limit), packets)]
+        if write:
+            with open(write, "wb") as out:
+                linktype = selected[0].linktype if selected else 1
+                PcapWriter(out, linktype).write([(p.ts, p.data) for p in selected])
+            console.print(f"[green]Wrote {len(selected)} packet(s) → {write}[/green]")
+        else:
+            for packet in selected:
+                console.print(_describe(packet), highlight=False)
+        console.print(f"[dim]{len(selected)} of {len(cap)} packets, {time.perf_counter() - start:.3f}s[/dim]")
+    return selected
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compress and expire Snort logs")
+    parser.add_argument("--dir", default=str(LOG_DIR), help="Log directory")
+    parser.add_argument("--days", type=float, default=DEFAULT_DAYS, help="Delete files older than N days")
+    parser.add_argument("--max-size", help="Size budget for the directory, e.g. 20G")
+    args = parser.parse_args(argv)
+    return 0 if clean_logs(Path(args.dir), days=args.days, max_size=args.max_size) is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+"""Random access to Snort's pcap/pcapng captures through a sidecar index.
+
+The first time a capture is opened every packet is walked once and a
+fixed-size record (timestamp, offset and length of the packet data, link
+type and 5-tuple) is written to ``.<capture>.idx`` next to it. Later
+opens map the index and answer "packet #N" by arithmetic and "packets
+between T1 and T2" by binary search over the timestamps, reading only the
+packets asked for. A capture Snort is still appending to is indexed
+incrementally from where the last pass stopped.
+
+Plain captures are read through ``mmap``, so captures larger than RAM are
+paged in on demand; gzipped archives (see ``retention``) are streamed and
+keep the index built before they were compressed, since offsets refer to
+the uncompressed data.
+"""
+
+import gzip
+import ipaddress
+import itertools
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+from modules.logs.retention import PCAP_MAGIC, PCAPNG_MAGIC, index_path
+
+INDEX_MAGIC = b"SAMVIDX1"
+INDEX_VERSION = 1
+# magic, version, kind, sorted, mtime of the capture, bytes indexed, packets
+HEADER = struct.Struct("<8sHBBxxxxdQQ")
+HEADER_SIZE = 64
+# ts, data offset, caplen, wirelen, src, dst, sport, dport, proto, IP version, linktype
+RECORD = struct.Struct("<dQII16s16sHHBBH")
+KIND_PCAP, KIND_PCAPNG = 0, 1
+WRITE_BATCH = 4096
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+RAW_LINKTYPES = {12, 14, 101, 228, 229}
+VLAN_TYPES = {0x8100, 0x88A8, 0x9100}
+PORT_PROTOS = {6, 17, 132}  # TCP, UDP, SCTP
+IPV6_EXTENSIONS = {0, 43, 60}  # hop-by-hop, routing, destination options
+NO_ADDRESS = bytes(16)
+
+
+class Flow(NamedTuple):
+    proto: int
+    src: str
+    sport: int
+    dst: str
+    dport: int
+
+
+class Packet(NamedTuple):
+    number: int
+    ts: float
+    linktype: int
+    wirelen: int
+    flow: Optional[Flow]
+    data: bytes
+
+
+# ---------------- Decoding ---------------- #
+def _network_offset(linktype: int, data: bytes) -> Optional[int]:
+    """Offset of the IP header in a frame, or None when it is not IP."""
+    if linktype == LINKTYPE_ETHERNET:
+        offset, ethertype = 14, int.from_bytes(data[12:14], "big")
+        while ethertype in VLAN_TYPES and len(data) >= offset + 4:
+            ethertype = int.from_bytes(data[offset + 2 : offset + 4], "big")
+            offset += 4
+        return offset if ethertype in (0x0800, 0x86DD) else None
+    if linktype in RAW_LINKTYPES:
+        return 0
+    if linktype == LINKTYPE_LINUX_SLL:
+        return 16 if int.from_bytes(data[14:16], "big") in (0x0800, 0x86DD) else None
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return 20 if int.from_bytes(data[0:2], "big") in (0x0800, 0x86DD) else None
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        return 4
+    return None
+
+
+def flow_key(linktype: int, data: bytes) -> Tuple[int, bytes, bytes, int, int, int]:
+    """(IP version, src, dst, sport, dport, proto); version 0 for non-IP frames."""
+    offset = _network_offset(linktype, data)
+    if offset is None or len(data) < offset + 20:
+        return 0, NO_ADDRESS, NO_ADDRESS, 0, 0, 0
+    version = data[offset] >> 4
+    if version == 4:
+        proto = data[offset + 9]
+        src = data[offset + 12 : offset + 16] + bytes(12)
+        dst = data[offset + 16 : offset + 20] + bytes(12)
+        fragment = int.from_bytes(data[offset + 6 : offset + 8], "big") & 0x1FFF
+        l4 = offset + (data[offset] & 0x0F) * 4
+        if fragment:
+            return 4, src, dst, 0, 0, proto
+    elif version == 6 and len(data) >= offset + 40:
+        proto = data[offset + 6]
+        src, dst = data[offset + 8 : offset + 24], data[offset + 24 : offset + 40]
+        l4 = offset + 40
+        while proto in IPV6_EXTENSIONS and len(data) >= l4 + 2:
+            proto, l4 = data[l4], l4 + (data[l4 + 1] + 1) * 8
+        if proto == 44 and len(data) >= l4 + 8:  # fragment header
+            if int.from_bytes(data[l4 + 2 : l4 + 4], "big") >> 3:
+                return 6, src, dst, 0, 0, data[l4]
+            proto, l4 = data[l4], l4 + 8
+    else:
+        return 0, NO_ADDRESS, NO_ADDRESS, 0, 0, 0
+    if proto in PORT_PROTOS and len(data) >= l4 + 4:
+        sport, dport = struct.unpack_from("!HH", data, l4)
+        return version, src, dst, sport, dport, proto
+    return version, src, dst, 0, 0, proto
+
+
+def _flow(record) -> Optional[Flow]:
+    version = record[9]
+    if version == 4:
+        src, dst = ipaddress.IPv4Address(record[4][:4]), ipaddress.IPv4Address(record[5][:4])
+    elif version == 6:
+        src, dst = ipaddress.IPv6Address(record[4]), ipaddress.IPv6Address(record[5])
+    else:
+        return None
+    return Flow(record[8], str(src), record[6], str(dst), record[7])
+
+
+# ---------------- Walking captures ---------------- #
+def walk_pcap(f, start: int = 0) -> Iterator[Tuple[float, int, int, int, int, bytes]]:
+    """(ts, data offset, caplen, wirelen, linktype, data) for each complete record."""
+    header = f.read(24)
+    if len(header) < 24 or header[:4] not in PCAP_MAGIC:
+        return
+    order, unit = PCAP_MAGIC[header[:4]]
+    linktype = struct.unpack_from(order + "I", header, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(order + "IIII")
+    offset = max(start, 24)
+    if offset > 24:
+        f.seek(offset)
+    while True:
+        head = f.read(16)
+        if len(head) < 16:
+            return
+        sec, frac, caplen, wirelen = record.unpack(head)
+        data = f.read(caplen)
+        if len(data) < caplen:
+            return  # Snort is still writing this one
+        yield sec + frac * unit, offset + 16, caplen, wirelen, linktype, data
+        offset += 16 + caplen
+
+
+def _tsresol(options: bytes, order: str) -> float:
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack_from(order + "HH", options, pos)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = options[pos + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0**-value
+        pos += 4 + length + (-length % 4)
+    return 1e-6
+
+
+def walk_pcapng(f) -> Iterator[Tuple[float, int, int, int, int, bytes]]:
+    """Same records as ``walk_pcap`` from Enhanced (and obsolete) Packet Blocks."""
+    order, interfaces, offset = "<", [], 0
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        section = head[:4] == PCAPNG_MAGIC
+        if section:
+            magic = f.read(4)
+            order = "<" if magic == b"\x4d\x3c\x2b\x1a" else ">"
+            interfaces = []
+        length = struct.unpack_from(order + "I", head, 4)[0]
+        if length < 12:
+            return
+        body = magic + f.read(length - 12) if section else f.read(length - 8)
+        if len(body) < length - 8:
+            return
+        block = struct.unpack_from(order + "I", head)[0]
+        if block == 1:
+            linktype = struct.unpack_from(order + "H", body)[0]
+            interfaces.append((linktype, _tsresol(body[8:-4], order)))
+        elif block in (2, 6) and len(body) >= 20:
+            if block == 6:
+                iface, high, low, caplen, wirelen = struct.unpack_from(order + "IIIII", body)
+            else:
+                iface, _drops, high, low, caplen, wirelen = struct.unpack_from(order + "HHIIII", body)
+            if iface < len(interfaces):
+                linktype, unit = interfaces[iface]
+                data = body[20 : 20 + caplen]
+                yield ((high << 32) | low) * unit, offset + 28, caplen, wirelen, linktype, data
+        offset += length
+
+
+# ---------------- Indexed capture ---------------- #
+class _Times:
+    """Sequence view of the index timestamps for ``bisect``."""
+
+    def __init__(self, index, count: int):
+        self.index = index
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> float:
+        return struct.unpack_from("<d", self.index, HEADER_SIZE + i * RECORD.size)[0]
+
+
+class Capture:
+    """An indexed pcap/pcapng capture; ``with Capture(path) as cap: ...``."""
+
+    def __init__(self, path: Path, index: Optional[Path] = None):
+        self.path = Path(path)
+        self.index_file = Path(index) if index else index_path(self.path)
+        self.compressed = self.path.name.endswith(".gz")
+        self.file = None
+        self.data = None
+        self.index = None
+        self.count = 0
+        self.sorted = True
+        self.indexed = 0  # packets walked by the last refresh
+        self._open_data()
+        self.refresh()
+
+    def _open_data(self):
+        if self.compressed:
+            self.file = self.data = gzip.open(self.path, "rb")
+            return
+        self.file = open(self.path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else self.file
+
+    def close(self):
+        for handle in (self.index, self.data, self.file):
+            if handle is not None:
+                handle.close()
+        self.index = self.data = self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    # Index maintenance
+    def _header(self):
+        try:
+            with open(self.index_file, "rb") as f:
+                fields = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+        magic, version, kind, ordered, mtime, end, count = fields
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            return None
+        if self.index_file.stat().st_size != HEADER_SIZE + count * RECORD.size:
+            return None
+        return kind, bool(ordered), mtime, end, count
+
+    def refresh(self) -> int:
+        """Bring the index up to date with the capture; returns packets newly indexed."""
+        st = self.path.stat()
+        self._remap(st)
+        header = self._header()
+        if header and header[2] == st.st_mtime and (self.compressed or header[3] == st.st_size):
+            self.indexed = 0
+        elif header and header[0] == KIND_PCAP and not self.compressed and st.st_size > header[3]:
+            self._build(st, header)
+        else:
+            self._build(st, None)
+        if self.index is not None:
+            self.index.close()
+        with open(self.index_file, "rb") as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, _, ordered, _, _, self.count = HEADER.unpack_from(self.index)
+        self.sorted = bool(ordered)
+        return self.indexed
+
+    def _remap(self, st):
+        """Reopen the capture if it was replaced, or grew past the current mapping."""
+        opened = os.fstat(self.file.fileno())
+        if opened.st_ino == st.st_ino and opened.st_dev == st.st_dev:
+            mapped = len(self.data) if isinstance(self.data, mmap.mmap) else 0
+            if self.compressed or mapped >= st.st_size:
+                return
+        if self.data is not self.file:
+            self.data.close()
+        self.file.close()
+        self._open_data()
+
+    def _last_record(self, count: int) -> tuple:
+        with open(self.index_file, "rb") as f:
+            f.seek(HEADER_SIZE + (count - 1) * RECORD.size)
+            return RECORD.unpack(f.read(RECORD.size))
+
+    def _resumable(self, header) -> bool:
+        """The capture still starts with what was indexed (appended to, not replaced)."""
+        count, end = header[4], header[3]
+        if not count:
+            return True
+        ts, offset, caplen = self._last_record(count)[:3]
+        magic = self.data[:4]
+        if magic not in PCAP_MAGIC or offset + caplen != end:
+            return False
+        order, unit = PCAP_MAGIC[magic]
+        sec, frac, stored = struct.unpack_from(order + "III", self.data, offset - 16)
+        return stored == caplen and abs(sec + frac * unit - ts) < 1e-6
+
+    def _build(self, st, resume):
+        if resume is not None and not self._resumable(resume):
+            resume = None
+        self.data.seek(0)
+        kind = KIND_PCAPNG if self.data.read(4) == PCAPNG_MAGIC else KIND_PCAP
+        self.data.seek(0)
+        if kind == KIND_PCAPNG:
+            records = walk_pcapng(self.data)
+        else:
+            records = walk_pcap(self.data, resume[3] if resume else 0)
+        first = next(records, None)
+        self.indexed = 0
+        if resume and first is None:
+            return  # only a partial record was added; the index is still right
+        count, ordered, end = (resume[4], resume[1], resume[3]) if resume else (0, True, 24)
+        last_ts = self._last_record(count)[0] if resume and count else -math.inf
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.index_file.parent, prefix=f"{self.index_file.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w+b") as out:
+                out.write(bytes(HEADER_SIZE))
+                if resume:
+                    with open(self.index_file, "rb") as old:
+                        old.seek(HEADER_SIZE)
+                        shutil.copyfileobj(old, out)
+                batch, walked = [], 0
+                for ts, offset, caplen, wirelen, linktype, data in itertools.chain((first,) if first else (), records):
+                    version, src, dst, sport, dport, proto = flow_key(linktype, data)
+                    batch.append(
+                        RECORD.pack(ts, offset, caplen, wirelen, src, dst, sport, dport, proto, version, linktype)
+                    )
+                    if ts < last_ts:
+                        ordered = False
+                    last_ts, end = ts, offset + caplen
+                    walked += 1
+                    if len(batch) >= WRITE_BATCH:
+                        out.write(b"".join(batch))
+                        batch.clear()
+                out.write(b"".join(batch))
+                count += walked
+                if kind == KIND_PCAPNG or self.compressed:
+                    end = st.st_size
+                out.seek(0)
+                out.write(
+                    HEADER.pack(
+                        INDEX_MAGIC, INDEX_VERSION, kind, ordered, st.st_mtime, min(end, st.st_size), count
+                    )
+                )
+            os.replace(tmp, self.index_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.indexed = walked
+
+    # Lookups
+    def record(self, i: int) -> tuple:
+        return RECORD.unpack_from(self.index, HEADER_SIZE + i * RECORD.size)
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if self.compressed:
+            self.data.seek(offset)
+            return self.data.read(length)
+        return self.data[offset : offset + length]
+
+    def _packet(self, i: int) -> Packet:
+        record = self.record(i)
+        ts, offset, caplen, wirelen = record[:4]
+        return Packet(i + 1, ts, record[10], wirelen, _flow(record), self._read(offset, caplen))
+
+    def packet(self, number: int) -> Packet:
+        """Packet ``number``, counting from 1 like Wireshark."""
+        if not 1 <= number <= self.count:
+            raise IndexError(f"{self.path.name} has {self.count} packets, not #{number}")
+        return self._packet(number - 1)
+
+    def span(self, since: Optional[float] = None, until: Optional[float] = None) -> Tuple[int, int]:
+        """Index range [lo, hi) of packets with since <= ts < until (time-ordered captures)."""
+        times = _Times(self.index, self.count)
+        lo = 0 if since is None else bisect_left(times, since)
+        hi = self.count if until is None else bisect_left(times, until, lo)
+        return lo, hi
+
+    def between(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[Packet]:
+        """Packets with since <= ts < until, in file order."""
+        if self.sorted:
+            lo, hi = self.span(since, until)
+            for i in range(lo, hi):
+                yield self._packet(i)
+            return
+        times = _Times(self.index, self.count)
+        for i in range(self.count):
+            ts = times[i]
+            if (since is None or ts >= since) and (until is None or ts < until):
+                yield self._packet(i)
+
+    def time_range(self) -> Tuple[Optional[float], Optional[float]]:
+        if not self.count:
+            return None, None
+        times = _Times(self.index, self.count)
+        if self.sorted:
+            return times[0], times[self.count - 1]
+        values = [times[i] for i in range(self.count)]
+        return min(values), max(values)
@@ -0,0 +1,377 @@
+"""Log retention: compress rotated logs and pcaps, expire by age and size.
+
+One pass over the log directory:
+
+1. files older than the age budget are deleted (archives included);
+2. rotated logs and pcaps that have not been written for ``settle``
+   seconds are gzipped by a small thread pool running at idle CPU and I/O
+   priority, throttled by a shared token bucket so retention never
+   competes with capture for the disk;
+3. while the directory is over its size budget the oldest archives, then
+   the oldest rotated files, are deleted.
+
+Files Snort or snortamv are writing (the alert files, the application
+logs, the newest file of each ``snort.log.<epoch>``-style series,
+databases and sockets) are never touched. Every archive is recorded in
+``.retention-manifest.json`` with its original name, sizes, and the time
+range it covers, so searches can skip archives outside a time window
+without decompressing them.
+"""
+
+import ctypes
+import gzip
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from modules.alerts.alert_fast import parse_stamp
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+LOG_DIR = Path("/var/log/snortamv")
+MANIFEST_NAME = ".retention-manifest.json"
+DAY = 86400
+DEFAULT_DAYS = 7
+SETTLE_SECONDS = 300
+DEFAULT_RATE = 20 * 1024 * 1024
+DEFAULT_WORKERS = 2
+CHUNK = 1024 * 1024
+GZIP_LEVEL = 6
+
+ACTIVE_NAMES = {
+    "alert",
+    "alert_fast",
+    "alert_fast.txt",
+    "alert_json.txt",
+    "snortamv.log",
+    "snortamv_error.log",
+    "log_file.log",
+    "snort_alert",
+    "metrics.json",
+}
+ARCHIVE_SUFFIXES = (".gz", ".xz", ".bz2", ".zst", ".zip")
+# Packet indexes (see pcap_index) live next to their capture and go with it.
+INDEX_SUFFIX = ".idx"
+SKIP_SUFFIXES = (".db", ".db-wal", ".db-shm", ".sqlite", ".pid", ".lck", ".lock", ".tmp", INDEX_SUFFIX)
+# Snort names its logs and pcaps <name>.<epoch> and writes the newest one;
+# small suffixes (snortamv.log.1) are rotated backups that nobody writes.
+SERIES_RE = re.compile(r"^(.*?)\.(\d{9,})$")
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+
+# ioprio_set(2): IOPRIO_WHO_PROCESS with pid 0 is the calling thread.
+IOPRIO_SYSCALLS = {"x86_64": 251, "aarch64": 30, "i686": 289, "armv7l": 314}
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+
+class FileInfo(NamedTuple):
+    path: Path
+    size: int
+    mtime: float
+
+
+class RetentionResult(NamedTuple):
+    compressed: List[str]
+    deleted: List[str]
+    bytes_before: int
+    bytes_after: int
+    seconds: float
+
+
+class TokenBucket:
+    """Caps throughput (bytes/s) across every thread that shares it."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, CHUNK)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n: int):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+def background_priority():
+    """Lowest CPU and idle I/O priority for the calling thread (best effort)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+    number = IOPRIO_SYSCALLS.get(os.uname().machine)
+    if number is None:
+        return
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.syscall(number, 1, 0, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT)
+    except (OSError, AttributeError):
+        pass
+
+
+# ---------------- Manifest ---------------- #
+def load_manifest(log_dir: Path) -> Dict[str, dict]:
+    try:
+        return json.loads((log_dir / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(log_dir: Path, manifest: Dict[str, dict]):
+    fd, tmp = tempfile.mkstemp(dir=log_dir, prefix=".retention-manifest.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, log_dir / MANIFEST_NAME)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+# ---------------- Content time range ---------------- #
+def first_timestamp(head: bytes) -> Tuple[str, Optional[float]]:
+    """(kind, time of the first record) from the first bytes of a log."""
+    magic = head[:4]
+    if magic in PCAP_MAGIC:
+        order, unit = PCAP_MAGIC[magic]
+        if len(head) >= 32:
+            sec, frac = struct.unpack_from(order + "II", head, 24)
+            return "pcap", sec + frac * unit
+        return "pcap", None
+    if magic == PCAPNG_MAGIC:
+        return "pcapng", _pcapng_first(head)
+    line = head.split(b"\n", 1)[0].decode("utf-8", "replace")
+    stamp = line.split(" ", 1)[0].partition(".")[0]
+    try:
+        return "text", parse_stamp(stamp) if "-" in stamp and "/" in stamp else None
+    except ValueError:
+        return "text", None
+
+
+def _pcapng_first(head: bytes) -> Optional[float]:
+    # Walk blocks to the first Enhanced Packet Block; assumes the default
+    # microsecond resolution (if_tsresol is rarely set by capture tools).
+    if len(head) < 12:
+        return None
+    order = "<" if head[8:12] == b"\x4d\x3c\x2b\x1a" else ">"
+    offset = 0
+    while offset + 12 <= len(head):
+        block_type, length = struct.unpack_from(order + "II", head, offset)
+        if length < 12:
+            return None
+        if block_type == 6 and offset + 20 <= len(head):
+            high, low = struct.unpack_from(order + "II", head, offset + 12)
+            return ((high << 32) | low) * 1e-6
+        offset += length
+    return None
+
+
+# ---------------- Inventory ---------------- #
+def scan(log_dir: Path) -> List[FileInfo]:
+    files = []
+    stack = [log_dir]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append(FileInfo(Path(entry.path), st.st_size, st.st_mtime))
+    return files
+
+
+def active_files(files: List[FileInfo]) -> set:
+    """Paths that may still be written to and must be left alone."""
+    active = set()
+    newest: Dict[Tuple[Path, str], FileInfo] = {}
+    for f in files:
+        name = f.path.name
+        if name in ACTIVE_NAMES or name == MANIFEST_NAME or name.startswith(".retention-manifest."):
+            active.add(f.path)
+            continue
+        if name.endswith(SKIP_SUFFIXES):
+            active.add(f.path)
+            continue
+        m = SERIES_RE.match(name)
+        if m and not name.endswith(ARCHIVE_SUFFIXES):
+            key = (f.path.parent, m.group(1))
+            if key not in newest or f.mtime > newest[key].mtime:
+                newest[key] = f
+    active.update(f.path for f in newest.values())
+    return active
+
+
+def is_archive(path: Path) -> bool:
+    return path.name.endswith(ARCHIVE_SUFFIXES)
+
+
+def index_path(capture: Path) -> Path:
+    """Sidecar index of a capture; shared by the capture and its .gz archive."""
+    name = capture.name[:-3] if capture.name.endswith(".gz") else capture.name
+    return capture.with_name(f".{name}{INDEX_SUFFIX}")
+
+
+# ---------------- Compression ---------------- #
+def compress(path: Path, bucket: TokenBucket, level: int = GZIP_LEVEL) -> Tuple[Path, dict]:
+    """Gzip ``path`` next to itself (atomically), keeping its mtime; returns (archive, manifest entry)."""
+    st = path.stat()
+    target = path.with_name(path.name + ".gz")
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as raw:
+            gz = gzip.GzipFile(
+                filename=path.name, mode="wb", compresslevel=level, fileobj=raw, mtime=int(st.st_mtime)
+            )
+            with gz:
+                head = b""
+                while True:
+                    bucket.acquire(CHUNK)
+                    chunk = src.read(CHUNK)
+                    if not chunk:
+                        break
+                    if not head:
+                        head = chunk[:65536]
+                    gz.write(chunk)
+        # The source may have grown since we started: leave it for the next pass.
+        now = path.stat()
+        if (now.st_size, now.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            raise RuntimeError(f"{path} changed while compressing")
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    path.unlink()
+    kind, first = first_timestamp(head)
+    entry = {
+        "source": path.name,
+        "kind": kind,
+        "size": st.st_size,
+        "stored": target.stat().st_size,
+        "first_ts": first,
+        "last_ts": st.st_mtime,
+        "compressed_at": time.time(),
+    }
+    return target, entry
+
+
+# ---------------- Retention pass ---------------- #
+def enforce(
+    log_dir: Path = LOG_DIR,
+    days: Optional[float] = DEFAULT_DAYS,
+    max_bytes: Optional[int] = None,
+    workers: int = DEFAULT_WORKERS,
+    rate: float = DEFAULT_RATE,
+    settle: float = SETTLE_SECONDS,
+    level: int = GZIP_LEVEL,
+    dry_run: bool = False,
+    now: Optional[float] = None,
+) -> RetentionResult:
+    """Run one retention pass over ``log_dir``; see the module docstring."""
+    start = time.perf_counter()
+    now = time.time() if now is None else now
+    log_dir = Path(log_dir)
+    files = scan(log_dir)
+    before = sum(f.size for f in files)
+    active = active_files(files)
+    manifest = load_manifest(log_dir)
+    deleted: List[str] = []
+    compressed: List[str] = []
+
+    def remove(f: FileInfo):
+        rel = str(f.path.relative_to(log_dir))
+        deleted.append(rel)
+        if not dry_run:
+            f.path.unlink(missing_ok=True)
+            index_path(f.path).unlink(missing_ok=True)
+            manifest.pop(rel, None)
+
+    # 1. Age budget.
+    keep: List[FileInfo] = []
+    for f in files:
+        if f.path in active:
+            keep.append(f)
+        elif days is not None and f.mtime < now - days * DAY:
+            remove(f)
+        else:
+            keep.append(f)
+
+    # 2. Compress whatever has settled.
+    todo = [
+        f
+        for f in keep
+        if f.path not in active and not is_archive(f.path) and f.size and f.mtime <= now - settle
+    ]
+    if dry_run:
+        compressed = [str(f.path.relative_to(log_dir)) for f in todo]
+    elif todo:
+        bucket = TokenBucket(rate)
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="retention", initializer=background_priority
+        )
+        try:
+            futures = {pool.submit(compress, f.path, bucket, level): f for f in todo}
+            for future in as_completed(futures):
+                f = futures[future]
+                try:
+                    archive, entry = future.result()
+                except (OSError, RuntimeError) as e:
+                    logger.warning(f"Could not compress {f.path}: {e}")
+                    continue
+                rel = str(archive.relative_to(log_dir))
+                manifest[rel] = entry
+                compressed.append(str(f.path.relative_to(log_dir)))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        keep = scan(log_dir)
+
+    # 3. Size budget: oldest archives first, then oldest rotated files.
+    if max_bytes is not None:
+        total = sum(f.size for f in keep)
+        victims = sorted(
+            (f for f in keep if f.path not in active and f.path.name != MANIFEST_NAME),
+            key=lambda f: (not is_archive(f.path), f.mtime),
+        )
+        for f in victims:
+            if total <= max_bytes:
+                break
+            remove(f)
+            total -= f.size
+        if total > max_bytes:
+            logger.warning(f"{log_dir} is still {total} bytes (budget {max_bytes}); the rest is in use")
+
+    if not dry_run:
+        for rel in [rel for rel in manifest if not (log_dir / rel).exists()]:
+            del manifest[rel]
+        save_manifest(log_dir, manifest)
+    after = before if dry_run else sum(f.size for f in scan(log_dir))
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Retention on {log_dir}: {len(compressed)} compressed, {len(deleted)} deleted, "
+        f"{before} -> {after} bytes in {elapsed:.2f}s"
+    )
+    return RetentionResult(compressed, deleted, before, after, elapsed)
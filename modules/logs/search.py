@@ -0,0 +1,304 @@
+"""Search plain and gzipped Snort logs in parallel, merged in time order.
+
+Each file is searched by one worker process, streaming (gzip is
+decompressed a chunk at a time, never to disk). Within a chunk the
+pattern's literal part is located with ``bytes.find`` first, and only the
+lines around those hits are decoded, checked against the full pattern and
+have their timestamp parsed, so the common case of a rare match costs
+little more than reading the file. pcaps are searched packet by packet.
+
+Files whose time range (from the retention manifest, else the first
+record and the mtime) lies outside ``since``/``until`` are not opened.
+"""
+
+import gzip
+import heapq
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from modules.alerts.alert_fast import parse_stamp
+from modules.logs.retention import (
+    PCAP_MAGIC,
+    PCAPNG_MAGIC,
+    SKIP_SUFFIXES,
+    first_timestamp,
+    load_manifest,
+    scan,
+)
+
+try:  # Python 3.11+
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+CHUNK = 4 * 1024 * 1024
+DEFAULT_LIMIT = 1000
+MAX_LINE = 4096
+UNSUPPORTED_SUFFIXES = (".xz", ".bz2", ".zst", ".zip")
+# 2026-10-18 10:23:05,717 | INFO | ... (logging) and 10/18-10:06:23.057123 (Snort)
+ISO_RE = re.compile(rb"^(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2})(?:[,.](\d+))?")
+SNORT_RE = re.compile(rb"^(\d{2}/\d{2}(?:/\d{2})?-\d{2}:\d{2}:\d{2})(?:\.(\d+))?")
+
+
+class Hit(NamedTuple):
+    ts: float
+    file: str
+    line: int
+    text: str
+
+
+class Target(NamedTuple):
+    path: Path
+    size: int
+    first_ts: Optional[float]
+    last_ts: float
+
+
+def _sequence(items):
+    """The nodes of a parsed pattern with plain (flag-free) groups inlined."""
+    for op, av in items:
+        if op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            yield from _sequence(av[3])
+        else:
+            yield op, av
+
+
+def required_literal(pattern: str) -> str:
+    """Longest run of literal characters every match of ``pattern`` must contain.
+
+    Taken from the parsed pattern, so escapes (``\\x41``, ``\\d``) are never
+    mistaken for text. Anything but a literal (a class, a repeat, an
+    alternation) breaks a run. ``a|b`` and case-insensitive patterns give "",
+    so every line is checked.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return ""
+    if parsed.state.flags & re.IGNORECASE:
+        return ""
+    best, run = "", ""
+    for op, av in _sequence(parsed):
+        if op is sre_parse.LITERAL:
+            run += chr(av)
+            continue
+        best, run = max(best, run, key=len), ""
+    return max(best, run, key=len)
+
+
+def line_time(line: bytes) -> Optional[float]:
+    m = ISO_RE.match(line)
+    if m:
+        ts = datetime.strptime(m.group(1).decode().replace("T", " "), "%Y-%m-%d %H:%M:%S").timestamp()
+        frac = m.group(2)
+        return ts + int(frac) / 10 ** len(frac) if frac else ts
+    m = SNORT_RE.match(line)
+    if m:
+        try:
+            ts = parse_stamp(m.group(1).decode())
+        except ValueError:
+            return None
+        frac = m.group(2)
+        return ts + int(frac) / 10 ** len(frac) if frac else ts
+    return None
+
+
+def _previous_time(chunk: bytes, start: int, lines: int = 64) -> Optional[float]:
+    end = start - 1
+    for _ in range(lines):
+        if end <= 0:
+            return None
+        begin = chunk.rfind(b"\n", 0, end) + 1
+        ts = line_time(chunk[begin:end])
+        if ts is not None:
+            return ts
+        end = begin - 1
+    return None
+
+
+def _open(path: Path):
+    return gzip.open(path, "rb") if path.name.endswith(".gz") else open(path, "rb")
+
+
+def _chunks(f) -> Iterator[Tuple[bytes, int]]:
+    """(complete lines, number of the first line) a chunk at a time."""
+    partial, line_no = b"", 1
+    while True:
+        data = f.read(CHUNK)
+        if not data:
+            break
+        data = partial + data
+        cut = data.rfind(b"\n") + 1
+        if not cut:
+            partial = data
+            continue
+        partial = data[cut:]
+        yield data[:cut], line_no
+        line_no += data.count(b"\n", 0, cut)
+    if partial:
+        yield partial + b"\n", line_no
+
+
+def search_text(
+    path: Path,
+    regex: Optional["re.Pattern"],
+    literal: bytes,
+    fold: bool,
+    since: Optional[float],
+    until: Optional[float],
+    limit: int,
+    name: str,
+) -> List[Hit]:
+    hits: List[Hit] = []
+    last_ts = 0.0
+    with _open(path) as f:
+        for chunk, first_line in _chunks(f):
+            haystack = chunk.lower() if fold else chunk
+            pos, counted, line_no = 0, 0, first_line
+            while len(hits) < limit:
+                if literal:
+                    found = haystack.find(literal, pos)
+                    if found < 0:
+                        break
+                else:
+                    found = pos
+                    if found >= len(chunk):
+                        break
+                start = chunk.rfind(b"\n", 0, found) + 1
+                end = chunk.find(b"\n", found)
+                line_no += chunk.count(b"\n", counted, start)
+                counted = start
+                pos = end + 1
+                line = chunk[start:end]
+                text = line[:MAX_LINE].decode("utf-8", "replace").rstrip("\r")
+                if regex is not None and not regex.search(text):
+                    continue
+                ts = line_time(line)
+                if ts is None:
+                    # Continuation lines (tracebacks) sort with the entry they belong to.
+                    ts = _previous_time(chunk, start)
+                    ts = last_ts if ts is None else ts
+                last_ts = ts
+                if (since is not None and ts < since) or (until is not None and ts >= until):
+                    continue
+                hits.append(Hit(ts, name, line_no, text))
+            if len(hits) >= limit:
+                break
+    return hits
+
+
+def search_pcap(
+    path: Path,
+    needle: bytes,
+    since: Optional[float],
+    until: Optional[float],
+    limit: int,
+    name: str,
+) -> List[Hit]:
+    """Packets whose captured bytes contain ``needle``."""
+    hits: List[Hit] = []
+    with _open(path) as f:
+        header = f.read(24)
+        order, unit = PCAP_MAGIC[header[:4]]
+        record = struct.Struct(order + "IIII")
+        number = 0
+        while len(hits) < limit:
+            head = f.read(16)
+            if len(head) < 16:
+                break
+            sec, frac, caplen, wirelen = record.unpack(head)
+            data = f.read(caplen)
+            number += 1
+            ts = sec + frac * unit
+            if until is not None and ts >= until:
+                break
+            if (since is None or ts >= since) and (not needle or needle in data):
+                hits.append(Hit(ts, name, number, f"packet #{number}, {wirelen} bytes"))
+    return hits
+
+
+def search_file(args) -> List[Hit]:
+    path, pattern, is_regex, fold, since, until, limit, name = args
+    with _open(path) as f:
+        head = f.read(4)
+    if head in PCAP_MAGIC:
+        needle = pattern.encode() if not is_regex else required_literal(pattern).encode()
+        return search_pcap(path, needle, since, until, limit, name)
+    if head == PCAPNG_MAGIC:
+        return []
+    if is_regex:
+        regex = re.compile(pattern, re.IGNORECASE if fold else 0)
+        literal = required_literal(pattern)
+    else:
+        regex = re.compile(re.escape(pattern), re.IGNORECASE) if fold else None
+        literal = pattern
+    literal_bytes = literal.encode().lower() if fold else literal.encode()
+    if regex is None and not literal_bytes:
+        regex = re.compile("")
+    return sorted(search_text(path, regex, literal_bytes, fold, since, until, limit, name))
+
+
+def targets(
+    log_dir: Path, since: Optional[float] = None, until: Optional[float] = None
+) -> Tuple[List[Target], int]:
+    """Files worth searching for the window, and how many were skipped by time."""
+    manifest = load_manifest(log_dir)
+    found, skipped = [], 0
+    for f in scan(log_dir):
+        name = f.path.name
+        if name.startswith(".") or name.endswith(SKIP_SUFFIXES + UNSUPPORTED_SUFFIXES):
+            continue
+        rel = str(f.path.relative_to(log_dir))
+        entry = manifest.get(rel)
+        if entry:
+            first, last = entry.get("first_ts"), entry.get("last_ts", f.mtime)
+        else:
+            first, last = None, f.mtime
+            if since is not None or until is not None:
+                # Text logs: first line's time; pcaps: first packet's.
+                try:
+                    with _open(f.path) as fh:
+                        first = first_timestamp(fh.read(65536))[1]
+                except (OSError, EOFError):
+                    continue
+        before = since is not None and last < since
+        after = until is not None and first is not None and first >= until
+        if before or after:
+            skipped += 1
+            continue
+        found.append(Target(f.path, f.size, first, last))
+    return found, skipped
+
+
+def search(
+    log_dir: Path,
+    pattern: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    is_regex: bool = False,
+    ignore_case: bool = False,
+    workers: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+) -> Tuple[List[Hit], int, int]:
+    """(hits in time order, files searched, files skipped by time range)."""
+    log_dir = Path(log_dir)
+    files, skipped = targets(log_dir, since, until)
+    # Largest first so one big archive does not finish last on its own.
+    files.sort(key=lambda t: -t.size)
+    jobs = [
+        (t.path, pattern, is_regex, ignore_case, since, until, limit, str(t.path.relative_to(log_dir)))
+        for t in files
+    ]
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1 or len(jobs) <= 1:
+        results = [search_file(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(search_file, jobs))
+    merged = heapq.merge(*results, key=lambda h: (h.ts, h.file, h.line))
+    return [hit for _, hit in zip(range(limit), merged)], len(jobs), skipped
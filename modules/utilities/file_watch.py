@@ -0,0 +1,145 @@
+"""Watch a directory for changed files, with inotify or by polling.
+
+On Linux the watcher talks to inotify directly through ctypes; elsewhere,
+or when inotify is unavailable (e.g. exhausted watch limits), it falls back
+to comparing (mtime, size) snapshots. Either way bursts of events are
+debounced: a batch is only reported once the directory has been quiet for
+``debounce`` seconds, or ``max_wait`` has passed since the first event.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def _inotify_fd(directory: Path) -> Optional[int]:
+    """Open an inotify watch on ``directory``; None when not available."""
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, str(directory).encode(), WATCH_MASK) < 0:
+        logger.warning(f"inotify watch on {directory} failed (errno {ctypes.get_errno()})")
+        os.close(fd)
+        return None
+    return fd
+
+
+def _parse_events(data: bytes) -> Iterator[str]:
+    pos = 0
+    while pos + EVENT_HEADER.size <= len(data):
+        _, _, _, length = EVENT_HEADER.unpack_from(data, pos)
+        pos += EVENT_HEADER.size
+        name = data[pos : pos + length].split(b"\0", 1)[0]
+        pos += length
+        if name:
+            yield os.fsdecode(name)
+
+
+class Watcher:
+    def __init__(
+        self,
+        directory: Path,
+        pattern: str = "*",
+        debounce: float = 0.5,
+        poll_interval: float = 1.0,
+        max_wait: float = 10.0,
+        poll: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.fd = None if poll else _inotify_fd(self.directory)
+        self.mode = "inotify" if self.fd is not None else "poll"
+        self._snapshot = self._scan()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    # ---------------- Sources ---------------- #
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return snapshot
+        for entry in entries:
+            if fnmatch(entry.name, self.pattern):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _poll_changes(self) -> Set[str]:
+        current = self._scan()
+        old = self._snapshot
+        self._snapshot = current
+        return {name for name in current.keys() | old.keys() if current.get(name) != old.get(name)}
+
+    def _wait(self, timeout: float) -> Set[str]:
+        """Block up to ``timeout`` seconds; returns names that changed."""
+        if self.fd is None:
+            time.sleep(timeout)
+            return self._poll_changes()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return set()
+        return {name for name in _parse_events(data) if fnmatch(name, self.pattern)}
+
+    # ---------------- Batches ---------------- #
+    def batches(self, stop: Optional[threading.Event] = None) -> Iterator[Set[str]]:
+        """Yield debounced sets of changed file names until ``stop`` is set."""
+        tick = min(self.poll_interval, 0.5) if self.fd is None else 0.5
+        while not (stop and stop.is_set()):
+            changed = self._wait(tick)
+            if not changed:
+                continue
+            first = last = time.monotonic()
+            while True:
+                now = time.monotonic()
+                quiet_left = self.debounce - (now - last)
+                if quiet_left <= 0 or now - first >= self.max_wait:
+                    break
+                more = self._wait(min(quiet_left, tick))
+                if more:
+                    changed |= more
+                    last = time.monotonic()
+            yield changed
@@ -0,0 +1,333 @@
+"""Process-local metrics: counters, gauges and histograms.
+
+Recording is a plain attribute update (a histogram adds a ``bisect`` over
+its bucket bounds), roughly 0.1-0.3 µs, so metrics can sit on hot paths.
+Create series once (at import time or outside the loop) and keep the
+object; ``REGISTRY.counter(...)`` returns the same series for the same
+name and labels.
+
+Most snortamv commands are short-lived processes, so metrics are shared
+through a state file: ``enable_persistence()`` makes the process merge what
+it recorded since its last flush into ``metrics.json`` (under a file lock)
+on exit and, for long-running commands, every ``FLUSH_INTERVAL`` seconds
+through ``maybe_flush()``. ``serve()`` exposes the merged view in the
+Prometheus text format on a local HTTP port, and ``snapshot()`` as JSON.
+Nothing is written unless persistence is enabled, so library code and
+tests can record freely.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from modules.utilities.logger import LOG_DIR
+
+STATE_PATH = LOG_DIR / "metrics.json"
+FLUSH_INTERVAL = 10.0
+DEFAULT_PORT = 9477
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Counter:
+    __slots__ = ("name", "help", "labels", "value")
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Dict[str, str]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, n: float = 1):
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("name", "help", "labels", "value")
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Dict[str, str]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, n: float = 1):
+        self.value += n
+
+
+class Histogram:
+    __slots__ = ("name", "help", "labels", "bounds", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Dict[str, str], bounds=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "Timer":
+        return Timer(self)
+
+
+class Timer:
+    """``with histogram.time():`` observes the elapsed seconds."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+def _key(name: str, labels: Dict[str, str]) -> SeriesKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# ---------------- Snapshots ---------------- #
+def _series(metric) -> dict:
+    entry = {"name": metric.name, "type": metric.kind, "help": metric.help, "labels": metric.labels}
+    if metric.kind == "histogram":
+        entry.update(
+            bounds=list(metric.bounds), counts=list(metric.counts), sum=metric.sum, count=metric.count
+        )
+    else:
+        entry["value"] = metric.value
+    return entry
+
+
+def _delta(current: dict, previous: Optional[dict]) -> dict:
+    if previous is None or current["type"] == "gauge":
+        return current
+    delta = dict(current)
+    if current["type"] == "counter":
+        delta["value"] = current["value"] - previous["value"]
+    else:
+        delta["counts"] = [a - b for a, b in zip(current["counts"], previous["counts"])]
+        delta["sum"] = current["sum"] - previous["sum"]
+        delta["count"] = current["count"] - previous["count"]
+    return delta
+
+
+def merge(base: Dict[str, dict], deltas: List[dict]) -> Dict[str, dict]:
+    """Add counter and histogram deltas into ``base``; gauges take the new value."""
+    for d in deltas:
+        key = json.dumps(_key(d["name"], d["labels"]))
+        old = base.get(key)
+        if old is None or old["type"] != d["type"] or d["type"] == "gauge":
+            base[key] = dict(d)
+        elif d["type"] == "counter":
+            old["value"] += d["value"]
+        elif old.get("bounds") == d["bounds"]:
+            old["counts"] = [a + b for a, b in zip(old["counts"], d["counts"])]
+            old["sum"] += d["sum"]
+            old["count"] += d["count"]
+        else:
+            base[key] = dict(d)
+    return base
+
+
+def _labels(labels: Dict[str, str], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(str(v))}"' for k, v in sorted(labels.items())]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(series: Dict[str, dict]) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    seen = set()
+    for entry in sorted(series.values(), key=lambda e: (e["name"], sorted(e["labels"].items()))):
+        name, labels = entry["name"], entry["labels"]
+        if name not in seen:
+            seen.add(name)
+            if entry.get("help"):
+                lines.append(f"# HELP {name} {_escape(entry['help'])}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+        if entry["type"] != "histogram":
+            lines.append(f"{name}{_labels(labels)} {_number(entry['value'])}")
+            continue
+        cumulative = 0
+        for bound, count in zip(list(entry["bounds"]) + [float("inf")], entry["counts"]):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{name}_bucket{_labels(labels, le)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(entry['sum'])}")
+        lines.append(f"{name}_count{_labels(labels)} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Registry ---------------- #
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[SeriesKey, object] = {}
+        self.lock = threading.Lock()
+        self.path: Optional[Path] = None
+        self.flushed: Dict[SeriesKey, dict] = {}
+        self.last_flush = time.monotonic()
+
+    def _get(self, cls, name: str, help: str, labels: Dict[str, str], **kwargs):
+        key = _key(name, labels)
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = self.metrics[key] = cls(name, help, dict(labels), **kwargs)
+        return metric
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = "", **labels) -> Gauge:
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels, bounds=buckets)
+
+    def pending(self) -> List[dict]:
+        """What was recorded since the last flush, as mergeable series."""
+        return [_delta(_series(m), self.flushed.get(key)) for key, m in list(self.metrics.items())]
+
+    def snapshot(self) -> Dict[str, dict]:
+        """The persisted state plus this process's unflushed changes."""
+        return merge(load_state(self.path or STATE_PATH), self.pending())
+
+    def flush(self):
+        """Merge unflushed changes into the state file (no-op without persistence)."""
+        if self.path is None:
+            return
+        with self.lock:
+            current = {key: _series(m) for key, m in list(self.metrics.items())}
+            deltas = [_delta(s, self.flushed.get(key)) for key, s in current.items()]
+            _update_state(self.path, deltas)
+            self.flushed = current
+            self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if self.path is not None and time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def enable_persistence(path: Path = STATE_PATH, registry: Registry = REGISTRY):
+    """Merge this process's metrics into ``path`` periodically and at exit."""
+    if registry.path is None:
+        atexit.register(_flush_quietly, registry)
+    registry.path = Path(path)
+
+
+def _flush_quietly(registry: Registry):
+    try:
+        registry.flush()
+    except OSError:
+        pass
+
+
+# ---------------- State file ---------------- #
+def load_state(path: Path) -> Dict[str, dict]:
+    try:
+        return json.loads(Path(path).read_text()).get("series", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _update_state(path: Path, deltas: List[dict]):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        state = merge(load_state(path), deltas)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"updated": time.time(), "series": state}, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+# ---------------- HTTP endpoint ---------------- #
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = render(self.registry.snapshot()).encode()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(list(self.registry.snapshot().values())).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(
+    port: int = DEFAULT_PORT, host: str = "127.0.0.1", registry: Registry = REGISTRY
+) -> ThreadingHTTPServer:
+    """Start the endpoint on a daemon thread; ``/metrics`` and ``/metrics.json``."""
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,97 @@
+"""Locate the Snort binary and run it in config-test (``-T``) mode."""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+from modules.utilities.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PATHS = ("/usr/sbin/snort", "/usr/local/bin/snort", "/usr/bin/snort")
+
+
+class TestRun(NamedTuple):
+    ok: bool
+    seconds: float
+    output: str
+
+
+def find_snort(path: Optional[str] = None) -> Optional[str]:
+    if path:
+        return path if Path(path).exists() or shutil.which(path) else None
+    found = shutil.which("snort") or shutil.which("snort3")
+    if found:
+        return found
+    for candidate in DEFAULT_PATHS:
+        if Path(candidate).exists():
+            return candidate
+    return None
+
+
+def snort_version(snort: str) -> Tuple[str, str]:
+    """Return (``"snort2"`` or ``"snort3"``, version banner line)."""
+    result = subprocess.run([snort, "-V"], capture_output=True, text=True)
+    text = (result.stdout + result.stderr).strip()
+    banner = next((line.strip() for line in text.splitlines() if "Version" in line), text[:80])
+    kind = "snort3" if "Snort++" in text or re.search(r"Version 3\.", text) else "snort2"
+    return kind, banner
+
+
+def _wrapper_conf(work: Path, conf: Path, rules: Path) -> Path:
+    """A Snort 2 config in ``work`` that includes ``conf`` and then ``rules``.
+
+    Snort 2 resolves relative includes against the directory of the ``-c``
+    file, so that directory and its parent's entries are mirrored with
+    symlinks and paths like ``classification.config`` or ``../rules`` still
+    resolve.
+    """
+    conf_dir = conf.parent
+    mirror = work / conf_dir.name
+    mirror.mkdir()
+    for entry in conf_dir.iterdir():
+        os.symlink(entry, mirror / entry.name)
+    if conf_dir.parent != conf_dir:
+        for entry in conf_dir.parent.iterdir():
+            if entry.name != conf_dir.name:
+                os.symlink(entry, work / entry.name)
+    wrapper = mirror / ".snortamv-test.conf"
+    wrapper.write_text(f"include {conf}\ninclude {rules.resolve()}\n")
+    return wrapper
+
+
+def config_test(
+    snort: str, conf: Path, rules: Optional[Path] = None, kind: Optional[str] = None
+) -> TestRun:
+    """Run ``snort -T`` on ``conf`` (plus an extra rules file) and time it.
+
+    Snort 3 takes the rules with ``-R``; Snort 2 has no such flag, so a
+    throw-away config in a temporary directory includes both. ``kind``
+    (from :func:`snort_version`) saves a ``snort -V`` run when known.
+    """
+    if rules is not None and kind is None:
+        kind, _ = snort_version(snort)
+    conf = Path(conf).resolve()
+    cmd = [snort, "-T", "-q", "-c", str(conf)]
+    work = None
+    if rules is not None:
+        if kind == "snort3":
+            cmd += ["-R", str(rules)]
+        else:
+            work = Path(tempfile.mkdtemp(prefix="snortamv-test-"))
+            cmd[-1] = str(_wrapper_conf(work, conf, Path(rules)))
+
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    finally:
+        if work:
+            shutil.rmtree(work, ignore_errors=True)
+    seconds = time.perf_counter() - start
+    logger.info(f"{' '.join(cmd)} -> rc={result.returncode} in {seconds:.2f}s")
+    return TestRun(result.returncode == 0, seconds, result.stdout + result.stderr)
@@ -75,19 +75,13 @@ else
 fi
 
 # ==============================
-# VALIDATE CONFIG
+# VALIDATE CONFIG AND RULES
 # ==============================
-echo -e "${GREEN}[2.1] Validating Snort config...${RESET}"
-if ! $SNORT_PATH -T -c "$SNORT_CONF"; then
-    echo -e "${RED}Configuration test failed!${RESET}"
-    exit 1
-fi
-
-# ==============================
-# VALIDATE RULES   
-# ==============================
-echo -e "${GREEN}[2.1] Validating Snort rules...${RESET}"
-if ! $SNORT_PATH -T -c "$SNORT_CONF" -R "$RULE_PATH"; then
+# Results are cached by config, rules and Snort version hash, so an
+# unchanged setup skips the slow snort -T passes.
+echo -e "${GREEN}[2.1] Validating Snort config and rules...${RESET}"
+if ! python3 -m modules.configuration.validation_cache \
+    --snort "$SNORT_PATH" --conf "$SNORT_CONF" --rules "$RULE_PATH/snort.rules"; then
     echo -e "${RED}Configuration test failed!${RESET}"
     exit 1
 fi
@@ -111,7 +105,7 @@ $SNORT_PATH -i "$INTERFACE" -c "$SNORT_CONF" -A console -l "$LOG_DIR"
 ALERT_FILE="$LOG_DIR/alert_fast"
 echo -e "${GREEN}[4] Reading alert logs...${RESET}"
 if [ -f "$ALERT_FILE" ]; then
-    cat "$ALERT_FILE"
+    python3 -m modules.alerts.alert_manager "$ALERT_FILE" || echo -e "${YELLOW}Alert summary unavailable.${RESET}"
 else
     echo -e "${YELLOW}No alerts yet.${RESET}"
 fi
@@ -134,9 +128,11 @@ echo -e "${YELLOW}Log documentation updated.${RESET}"
 # ==============================
 # CLEANUP OLD LOGS
 # ==============================
-echo -e "${GREEN}[6] Deleting logs older than $DAYS_OF_VALID days...${RESET}"
-find "$LOG_DIR" -type f -mtime +"$DAYS_OF_VALID" -exec cp $LOG_DIR $LOG_DIR.((date +%Y%m%d%H%M%S))
-find "$LOG_DIR" -type f -mtime +"$DAYS_OF_VALID" -delete
-echo -e "${YELLOW}Old logs cleaned.${RESET}"
+echo -e "${GREEN}[6] Compressing logs and deleting those older than $DAYS_OF_VALID days...${RESET}"
+if python3 -m modules.logs.log_manager --dir "$LOG_DIR" --days "$DAYS_OF_VALID"; then
+    echo -e "${YELLOW}Old logs cleaned.${RESET}"
+else
+    echo -e "${YELLOW}Log cleanup skipped.${RESET}"
+fi
 
 echo -e "${GREEN}=== SNORT COMPLETED SUCCESSFULLY ===${RESET}"
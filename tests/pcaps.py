@@ -0,0 +1,36 @@
+"""Small pcaps for the tests: classic pcap files of IPv4 Ethernet frames."""
+
+import struct
+
+# Microsecond pcap, little endian, Ethernet.
+HEADER = struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)
+TCP, UDP = 6, 17
+
+
+def hello(random):
+    """A TLS 1.2 ClientHello record carrying ``random``, cut short after the session id."""
+    body = b"\x03\x03" + random + b"\x00"
+    handshake = b"\x01" + len(body).to_bytes(3, "big") + body
+    return b"\x16\x03\x01" + len(handshake).to_bytes(2, "big") + handshake
+
+
+def ipv4(src, dst, sport, dport, payload=b"", proto=TCP):
+    """An IPv4 packet with a zeroed TCP (or UDP) header past the ports."""
+    l4 = struct.pack("!HH", sport, dport) + bytes(16 if proto == TCP else 4) + payload
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(l4), 1, 0, 64, proto, 0, bytes(src), bytes(dst))
+    return header + l4
+
+
+def frame(src, dst, sport, dport, payload=b"", proto=TCP, vlan=None):
+    """``ipv4(...)`` in an Ethernet frame, 802.1Q tagged when ``vlan`` is given."""
+    tag = b"" if vlan is None else b"\x81\x00" + struct.pack("!H", vlan)
+    return bytes(12) + tag + b"\x08\x00" + ipv4(src, dst, sport, dport, payload, proto)
+
+
+def pcap(packets):
+    """A pcap file of ``(ts, data)`` pairs; ``ts`` in seconds, kept to the microsecond."""
+    out = [HEADER]
+    for ts, data in packets:
+        sec, usec = divmod(round(ts * 1_000_000), 1_000_000)
+        out.append(struct.pack("<IIII", sec, usec, len(data), len(data)) + data)
+    return b"".join(out)
@@ -0,0 +1,59 @@
+from database.alerts import DAY, AlertStore
+from modules.alerts.alert_fast import Alert
+
+T0 = 1_790_000_000.0  # 14:13 UTC, so 300 alerts 10 min apart span three days
+
+
+def _alert(ts, sid, src="10.0.0.1", dst="10.0.0.2"):
+    return Alert(ts, 1, sid, 1, f"msg {sid}", "misc-activity", 3, "TCP", src, 1234, dst, 80)
+
+
+def test_store_partitions_queries_and_drops(tmp_path):
+    store = AlertStore(tmp_path / "alerts.db")
+    alerts = [_alert(T0 + i * 600, 100 + i % 3, src=f"10.0.0.{i % 5}") for i in range(300)]
+    assert store.ingest(alerts, batch_size=64, source=(tmp_path / "alert_fast", 7, 4096)) == 300
+    assert store.count() == 300
+    assert len(store.list_partitions()) == 3
+    assert store.source_offset(tmp_path / "alert_fast") == (7, 4096)
+    store.close()
+
+    store = AlertStore(tmp_path / "alerts.db")
+    newest = store.query(limit=5)
+    assert [a.ts for a in newest] == [T0 + i * 600 for i in range(299, 294, -1)]
+    assert newest[0].msg == "msg 102" and newest[0].classification == "misc-activity"
+
+    hits = store.query(sid=102, src="10.0.0.0", limit=1000)
+    assert hits and all(a.sid == 102 and a.src == "10.0.0.0" for a in hits)
+    assert len(hits) == sum(1 for i in range(300) if i % 3 == 2 and i % 5 == 0)
+
+    window = store.query(since=T0 + 6000, until=T0 + 9000, limit=1000)
+    assert sorted(a.ts for a in window) == [T0 + i * 600 for i in range(10, 15)]
+
+    first = store.list_partitions()[0]
+    assert store.drop_before(first.end) == [first.name]
+    assert store.count() == 300 - first.rows
+    assert store.query(until=first.end, limit=1000) == []
+    assert first.end - first.start == DAY
+    store.close()
+
+
+def test_store_migrates_partitions_without_hits(tmp_path):
+    # A store written before duplicate suppression: partitions have no hits column.
+    store = AlertStore(tmp_path / "alerts.db")
+    store.ingest([_alert(T0, 100), _alert(T0 + 60, 101)])
+    name = store.list_partitions()[0].name
+    store.conn.executescript(
+        f"""
+        CREATE TABLE old AS SELECT ts, gid, sid, rev, priority, proto, src, sport, dst, dport FROM {name};
+        DROP TABLE {name};
+        ALTER TABLE old RENAME TO {name};
+        PRAGMA user_version = 0;
+        """
+    )
+    store.close()
+
+    store = AlertStore(tmp_path / "alerts.db")
+    assert store.ingest([_alert(T0 + 120, 102)._replace(hits=5)]) == 1
+    assert [(a.sid, a.hits) for a in store.query(limit=10)] == [(102, 5), (101, 1), (100, 1)]
+    assert store.conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    store.close()
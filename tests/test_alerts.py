@@ -0,0 +1,61 @@
+import os
+
+from modules.alerts.alert_fast import AlertParser, parse_file, synthetic_lines
+from modules.alerts.tailer import FileTailer
+
+SNORT2 = (
+    "10/18/26-10:06:23.057123  [**] [1:2010935:3] ET POLICY MSSQL [probe] [**] "
+    "[Classification: Potentially Bad Traffic] [Priority: 2] {TCP} 192.168.1.5:51234 -> 10.0.0.1:1433\n"
+)
+SNORT3 = '10/18/26-10:06:24.500000 [**] [1:408:5] "PROTOCOL-ICMP Echo Reply" [**] [Priority: 3] {ICMP} 10.0.0.1 -> 192.168.1.5\n'
+
+
+def test_parse_snort2_and_snort3_lines():
+    parser = AlertParser()
+    a, b = parser.parse_lines([SNORT2, SNORT3, "garbage\n", "\n"])
+    assert (a.gid, a.sid, a.rev, a.msg, a.priority) == (1, 2010935, 3, "ET POLICY MSSQL [probe]", 2)
+    assert a.classification == "Potentially Bad Traffic"
+    assert (a.proto, a.src, a.sport, a.dst, a.dport) == ("TCP", "192.168.1.5", 51234, "10.0.0.1", 1433)
+    assert (b.msg, b.classification, b.priority) == ("PROTOCOL-ICMP Echo Reply", "", 3)
+    assert (b.src, b.sport, b.dst, b.dport) == ("10.0.0.1", 0, "192.168.1.5", 0)
+    assert round(b.ts - a.ts, 6) == 1.442877
+    assert parser.bad_lines == 1
+
+
+def test_parse_file_batches(tmp_path):
+    path = tmp_path / "alert_fast"
+    path.write_text("".join(synthetic_lines(2500, snort3=True)))
+    batches = list(parse_file(path))
+    assert sum(len(b) for b in batches) == 2500
+    assert batches[0][0].msg == "ET POLICY Synthetic signature 2010000"
+
+
+def test_tailer_survives_partial_lines_rotation_and_truncation(tmp_path):
+    path = tmp_path / "alert_fast"
+    path.write_text("old line\n")
+    tailer = FileTailer(path)
+    assert tailer.read_lines() == []
+
+    with open(path, "a") as f:
+        f.write(SNORT2 + SNORT3[:30])
+    assert tailer.read_lines() == [SNORT2.rstrip("\n")]
+    with open(path, "a") as f:
+        f.write(SNORT3[30:])
+    assert tailer.read_lines() == [SNORT3.rstrip("\n")]
+
+    # Rotation: the rest of the old file is drained before switching.
+    with open(path, "a") as f:
+        f.write("last of old\n")
+    os.rename(path, tmp_path / "alert_fast.1")
+    path.write_text("first of new\n")
+    assert tailer.read_lines() == ["last of old", "first of new"]
+    assert tailer.rotations == 1
+
+    # Truncation in place (copytruncate): start over from the beginning.
+    path.write_text("")
+    assert tailer.read_lines() == []
+    with open(path, "a") as f:
+        f.write("after truncate\n")
+    assert tailer.read_lines() == ["after truncate"]
+    assert tailer.truncations == 1
+    tailer.close()
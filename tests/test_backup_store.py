@@ -0,0 +1,37 @@
+from modules.configuration.backup_store import BackupStore
+
+
+def test_backups_dedupe_restore_and_prune(tmp_path):
+    rules = tmp_path / "rules"
+    (rules / "enabled").mkdir(parents=True)
+    (rules / "enabled" / "a.rules").write_text("alert ip any any -> any any (sid:1;)\n" * 1000)
+    (rules / "sources").mkdir()
+    (rules / "sources" / "b.rules").write_text("alert ip any any -> any any (sid:2;)\n")
+    store = BackupStore(rules / "backups")
+
+    first = store.backup(rules)
+    assert (first.files, first.files_read) == (2, 2) and first.chunks_written == 2
+
+    # Unchanged tree: nothing is read or written besides the manifest.
+    second = store.backup(rules)
+    assert (second.files_read, second.chunks_written, second.bytes_written) == (0, 0, 0)
+
+    (rules / "enabled" / "a.rules").write_text("changed\n")
+    (rules / "sources" / "b.rules").unlink()
+    third = store.backup(rules)
+    assert (third.files, third.files_read, third.chunks_written) == (1, 1, 1)
+
+    # Rules added after the snapshot are rolled back too; dot-files are left alone.
+    (rules / "enabled" / "new.rules").write_text("alert ip any any -> any any (sid:3;)\n")
+    (rules / ".index.json").write_text("{}")
+    assert store.stale(first.id, rules) == ["enabled/new.rules"]
+    result = store.restore(first.id, rules)
+    assert sorted(result.restored) == ["enabled/a.rules", "sources/b.rules"]
+    assert result.removed == ["enabled/new.rules"]
+    assert (rules / "enabled" / "a.rules").read_text().count("sid:1") == 1000
+    assert (rules / "sources" / "b.rules").exists()
+    assert not (rules / "enabled" / "new.rules").exists() and (rules / ".index.json").exists()
+
+    removed, chunks = store.prune(keep_last=1)
+    assert removed == 2 and chunks == 2
+    assert [s.id for s in store.list_snapshots()] == [third.id]
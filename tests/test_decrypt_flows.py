@@ -0,0 +1,93 @@
+import sys
+
+from modules.decrypt import flows
+from modules.decrypt.flows import decrypt_flows
+from pcaps import frame, hello, pcap
+
+T0 = 1_790_000_000
+
+# Prints a tshark -V style header for every packet of -r, tagged with its
+# TCP ports and the key log it was given.
+STAND_IN = """#!{python}
+import struct, sys
+args = sys.argv[1:]
+pcap = args[args.index("-r") + 1]
+keylog = next((a for a in args if a.startswith("tls.keylog_file:")), "none")
+with open(pcap, "rb") as f:
+    f.read(24)
+    n = 0
+    while True:
+        head = f.read(16)
+        if len(head) < 16:
+            break
+        frame = f.read(struct.unpack("<IIII", head)[2])
+        n += 1
+        sport, dport = struct.unpack_from("!HH", frame, 34)
+        print(f"Frame {{n}}: {{len(frame)}} bytes on wire")
+        print(f"    ports {{sport}} {{dport}} {{keylog}}")
+"""
+
+
+def _frame(client, sport, outbound, payload=b""):
+    a, b = [10, 0, 0, client], [192, 168, 1, 5]
+    return frame(a, b, sport, 443, payload) if outbound else frame(b, a, 443, sport, payload)
+
+
+def _capture(path, clients):
+    """Interleaved flows: client c sends a ClientHello with random bytes([c]) * 32, then data both ways."""
+    frames = []
+    for step in range(6):
+        for c in clients:
+            payload = hello(bytes([c]) * 32) if step == 0 else b"data"
+            frames.append(_frame(c, 40000 + c, step % 2 == 0, payload))
+    path.write_bytes(pcap((T0 + i / 1_000_000, data) for i, data in enumerate(frames)))
+
+
+def test_flows_are_sharded_decrypted_and_split(tmp_path):
+    capture = tmp_path / "snort.log.1790000000"
+    _capture(capture, range(1, 21))
+    tshark = tmp_path / "tshark"
+    tshark.write_text(STAND_IN.format(python=sys.executable))
+    tshark.chmod(0o755)
+    keylog = tmp_path / "ssl.log.txt"
+    keylog.write_text(
+        "# SSL/TLS secrets log file\n"
+        + "".join(f"CLIENT_RANDOM {bytes([c]).hex() * 32} {'ab' * 48}\n" for c in (3, 7, 11))
+    )
+
+    result = decrypt_flows(capture, tmp_path / "out", keylog=keylog, workers=3, tshark=str(tshark))
+    assert len(result.flows) == 20 and result.shards == 6 and result.skipped == 0
+    for item in result.flows:
+        client = int(item.flow.src.split(".")[-1])
+        assert item.client_random == bytes([client]) * 32
+        lines = item.path.read_text().splitlines()
+        headers = [line for line in lines if line.startswith("Frame ")]
+        assert len(headers) == item.packets == 6
+        tagged = [line.split()[1:] for line in lines if line.strip().startswith("ports")]
+        port = str(40000 + client)
+        assert {tuple(t[:2]) for t in tagged} == {(port, "443"), ("443", port)}
+        assert {t[2] for t in tagged} == {f"tls.keylog_file:{keylog}"}
+
+    keyed = decrypt_flows(capture, tmp_path / "keyed", keylog=keylog, keyed_only=True, tshark=str(tshark))
+    assert sorted(item.flow.src for item in keyed.flows) == ["10.0.0.11", "10.0.0.3", "10.0.0.7"]
+    assert keyed.skipped == 17
+    assert sorted(p.name for p in (tmp_path / "keyed").iterdir()) == sorted(
+        item.path.name for item in keyed.flows
+    )
+
+
+def test_cli_succeeds_when_no_flow_has_keys(tmp_path, monkeypatch, capsys):
+    capture = tmp_path / "snort.log.1790000000"
+    _capture(capture, range(1, 4))
+    tshark = tmp_path / "tshark"
+    tshark.write_text(STAND_IN.format(python=sys.executable))
+    tshark.chmod(0o755)
+    keylog = tmp_path / "empty.keys"
+    keylog.write_text("")
+    monkeypatch.setattr(flows.shutil, "which", lambda name: str(tshark))
+
+    args = [str(capture), str(tmp_path / "out"), "--keylog", str(keylog), "--keyed"]
+    assert flows.main(args) == 0
+    assert "Nothing to decrypt: no TCP flows with keys in the key log (3 skipped)" in capsys.readouterr().out
+    tshark.write_text("#!/bin/sh\nexit 2\n")
+    assert flows.main(args[:-1]) == 1
@@ -0,0 +1,72 @@
+from database.alerts import AlertStore
+from modules.alerts.alert_fast import Alert
+from modules.alerts.evidence import collect, write_pcap
+from modules.logs.pcap_index import Capture, Flow
+from pcaps import frame, pcap
+
+T0 = 1_790_000_000
+
+
+def _capture(path, start, count):
+    """``count`` packets a millisecond apart: 50 clients in turn, each packet answered by 192.168.1.5:443."""
+    packets = []
+    for i in range(count):
+        client, sport = [10, 0, 0, i // 2 % 50 + 1], 40000 + i // 2 % 50
+        if i % 2:
+            data = frame([192, 168, 1, 5], client, 443, sport, b"payload!")
+        else:
+            data = frame(client, [192, 168, 1, 5], sport, 443, b"payload!")
+        packets.append((start + i / 1000, data))
+    path.write_bytes(pcap(packets))
+
+
+def _alert(ts, client):
+    return Alert(ts, 1, 1000 + client, 1, "test", "", 2, "TCP", f"10.0.0.{client}", 40000 + client - 1, "192.168.1.5", 443)
+
+
+def test_alert_id_to_exact_packet_and_flow(tmp_path):
+    _capture(tmp_path / "snort.log.1790000000", T0, 2000)
+    _capture(tmp_path / "snort.log.1790000002", T0 + 2, 2000)
+    store = AlertStore(tmp_path / "alerts.db")
+    # Packet 1011 of the second capture: 10.0.0.6 -> 192.168.1.5, at T0 + 3.010.
+    store.ingest([_alert(T0 + 3.010, 6), _alert(T0 + 0.500, 1)])
+    stored = store.query(limit=10)
+    alert = store.get(stored[0].id)
+    assert alert == stored[0] and alert.src == "10.0.0.6"
+    assert store.get("20000101-1") is None and store.get("nonsense") is None
+    store.close()
+
+    [found] = collect([alert], tmp_path, window=5)
+    # 40 packets per flow per capture, half each way, from both captures.
+    assert len(found.packets) == 80
+    flows = {p.flow for _, p in found.packets}
+    assert flows == {
+        Flow(6, "10.0.0.6", 40005, "192.168.1.5", 443),
+        Flow(6, "192.168.1.5", 443, "10.0.0.6", 40005),
+    }
+    path, trigger = found.packets[found.trigger]
+    assert found.exact and path.name == "snort.log.1790000002" and trigger.number == 1011
+
+    out = write_pcap(found, tmp_path / "evidence" / "one.pcap")
+    with Capture(out) as cap:
+        assert len(cap) == 80
+        assert [p.data for p in cap.between(None, None)] == [p.data for _, p in found.packets]
+
+
+def test_batch_is_one_pass_per_capture(tmp_path, monkeypatch):
+    _capture(tmp_path / "snort.log.1790000000", T0, 2000)
+    opened = []
+    real = Capture.__init__
+
+    def counting(self, path, *args, **kwargs):
+        opened.append(path)
+        real(self, path, *args, **kwargs)
+
+    monkeypatch.setattr(Capture, "__init__", counting)
+    alerts = [_alert(T0 + i / 1000, i // 2 % 50 + 1) for i in range(0, 2000, 2)]
+    evidence = collect(alerts, tmp_path, window=0.1)
+    assert len(opened) == 1
+    assert all(e.exact for e in evidence)
+    assert [e.packets[e.trigger][1].number for e in evidence] == list(range(1, 2000, 2))
+    # +-100ms of a client that comes round every 100ms: the exchange before and this one.
+    assert all(3 <= len(e.packets) <= 4 for e in evidence[50:])
@@ -0,0 +1,75 @@
+import gzip
+import io
+import struct
+from datetime import datetime
+
+from modules.decrypt.hexdump import LINKTYPE_ETHERNET, LINKTYPE_RAW, convert, packets
+
+T0 = 1_790_000_000.25
+
+
+def _dump(frames, snort=True):
+    out = []
+    for ts, frame in frames:
+        stamp = datetime.fromtimestamp(ts).strftime("%m/%d-%H:%M:%S.%f")
+        out.append(f"{stamp} 00:11:22:33:44:55 -> 66:77:88:99:AA:BB type:0x800 len:0x{len(frame):X}\n")
+        out.append("192.168.1.5:1234 -> 10.0.0.2:443 TCP TTL:64 TOS:0x0 ID:1 IpLen:20 DgmLen:60\n")
+        for off in range(0, len(frame), 16):
+            row = frame[off : off + 16]
+            hexs = " ".join(f"{b:02X}" for b in row)
+            text = "".join(chr(b) if 32 <= b < 127 else "." for b in row)
+            prefix = f"0x{off:04X}: " if snort else f"{off:04x}  "
+            out.append(f"{prefix}{hexs:<47}  {text}\n")
+        out.append("\n=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+=+\n\n")
+    return "".join(out).encode()
+
+
+def _frames(count, ethernet=True):
+    head = bytes.fromhex("00112233445566778899aabb0800") if ethernet else b""
+    # Payloads full of hex digits make the ASCII column look like more hex.
+    return [(T0 + i * 0.001, head + b"E\x00" + b"AB 12 CD " * (i % 40)) for i in range(count)]
+
+
+def _read_pcap(data):
+    linktype = struct.unpack_from("<I", data, 20)[0]
+    records, pos = [], 24
+    while pos < len(data):
+        sec, usec, caplen, _ = struct.unpack_from("<IIII", data, pos)
+        records.append((sec + usec / 1e6, data[pos + 16 : pos + 16 + caplen]))
+        pos += 16 + caplen
+    return linktype, records
+
+
+def test_convert_keeps_boundaries_and_timestamps(tmp_path):
+    frames = _frames(300)
+    src = tmp_path / "snort.log.1790000000.gz"
+    src.write_bytes(gzip.compress(_dump(frames)))
+    result = convert(src, tmp_path / "out.pcap")
+    assert (result.packets, result.linktype) == (300, LINKTYPE_ETHERNET)
+    linktype, records = _read_pcap((tmp_path / "out.pcap").read_bytes())
+    assert linktype == LINKTYPE_ETHERNET
+    assert [frame for _, frame in records] == [frame for _, frame in frames]
+    assert all(abs(a - b) < 2e-6 for (a, _), (b, _) in zip(records, frames))
+
+    # Chunk edges falling inside packets change nothing.
+    batches = packets(io.BytesIO(_dump(frames, snort=False)), chunk_size=700)
+    assert [frame for batch in batches for _, frame in batch] == [frame for _, frame in frames]
+
+
+def test_pcapng_and_raw_ip(tmp_path):
+    frames = _frames(20, ethernet=False)
+    (tmp_path / "ip.log").write_bytes(_dump(frames, snort=False))
+    result = convert(tmp_path / "ip.log", tmp_path / "out.pcapng")
+    assert result.linktype == LINKTYPE_RAW
+    data = (tmp_path / "out.pcapng").read_bytes()
+    assert data[:4] == b"\x0a\x0d\x0d\x0a"
+    assert struct.unpack_from("<IIH", data, 28) == (1, 20, LINKTYPE_RAW)
+    pos, got = 48, []
+    while pos < len(data):
+        kind, length = struct.unpack_from("<II", data, pos)
+        assert kind == 6 and struct.unpack_from("<I", data, pos + length - 4)[0] == length
+        high, low, caplen = struct.unpack_from("<III", data, pos + 12)
+        got.append((((high << 32) | low) / 1e6, data[pos + 28 : pos + 28 + caplen]))
+        pos += length
+    assert [frame for _, frame in got] == [frame for _, frame in frames]
+    assert abs(got[5][0] - frames[5][0]) < 2e-6
@@ -0,0 +1,66 @@
+import gzip
+import os
+
+from database.keys import KeyStore
+from modules.decrypt.keylog import capture_randoms, keylog_randoms, minimal_keylog
+from pcaps import frame, hello, pcap
+
+
+def _capture(path, randoms):
+    packets = []
+    for i, random in enumerate(randoms):
+        for payload in (hello(random), os.urandom(300)):
+            data = frame([10, 0, 0, 1], [192, 168, 1, 5], 40000 + i, 443, payload)
+            packets.append((1_790_000_000 + i / 1_000_000, data))
+    path.write_bytes(pcap(packets))
+
+
+def _lines(random, n=2):
+    labels = ("CLIENT_HANDSHAKE_TRAFFIC_SECRET", "SERVER_HANDSHAKE_TRAFFIC_SECRET", "CLIENT_TRAFFIC_SECRET_0")
+    return "".join(f"{label} {random.hex()} {bytes([i]).hex() * 48}\n" for i, label in enumerate(labels[:n]))
+
+
+def test_store_syncs_incrementally_and_deduplicates(tmp_path):
+    keylog = tmp_path / "ssl.log.txt"
+    first = [bytes([c]) * 32 for c in range(1, 101)]
+    keylog.write_text("# SSL/TLS secrets log file\n" + "".join(_lines(r) for r in first) * 3)
+    with KeyStore(tmp_path / "keys.db") as store:
+        stats = store.sync(keylog)
+        assert (stats.lines, stats.added, len(store)) == (600, 200, 200)
+        assert oct((tmp_path / "keys.db").stat().st_mode & 0o777) == "0o600"
+
+        # The browser appends a new session and half of a line.
+        partial = _lines(b"\xee" * 32, 3)
+        with open(keylog, "a") as f:
+            f.write(_lines(first[0]) + partial[:-40])
+        stats = store.sync(keylog)
+        assert (stats.lines, stats.added) == (4, 2)
+        with open(keylog, "a") as f:
+            f.write(partial[-40:])
+        stats = store.sync(keylog)
+        assert (stats.lines, stats.added, len(store)) == (1, 1, 203)
+
+        found = store.lookup([first[5], b"\xee" * 32, b"\x00" * 32])
+        assert [label for label, _ in found[b"\xee" * 32]] == [
+            "CLIENT_HANDSHAKE_TRAFFIC_SECRET",
+            "CLIENT_TRAFFIC_SECRET_0",
+            "SERVER_HANDSHAKE_TRAFFIC_SECRET",
+        ]
+        assert len(found[first[5]]) == 2 and b"\x00" * 32 not in found
+
+
+def test_minimal_keylog_has_only_the_capture_handshakes(tmp_path):
+    keylog = tmp_path / "ssl.log.txt"
+    keylog.write_text("".join(_lines(bytes([c]) * 32) for c in range(1, 201)))
+    in_capture = [bytes([c]) * 32 for c in (5, 77, 150)] + [b"\xfe" * 32]
+    capture = tmp_path / "snort.log.1790000000"
+    _capture(capture, in_capture)
+    with open(capture, "rb") as f, gzip.open(tmp_path / "archived.gz", "wb", compresslevel=1) as out:
+        out.write(f.read())
+    assert capture_randoms(capture) == capture_randoms(tmp_path / "archived.gz") == set(in_capture)
+
+    output = tmp_path / "out" / "capture.keys"
+    result = minimal_keylog(capture, output, keylog, tmp_path / "keys.db")
+    assert (result.handshakes, result.keyed, result.secrets, result.stored) == (4, 3, 6, 400)
+    assert keylog_randoms(output) == set(in_capture[:3])
+    assert oct(output.stat().st_mode & 0o777) == "0o600"
@@ -0,0 +1,77 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+
+from modules.alerts.alert_fast import synthetic_lines
+from modules.logs.retention import MANIFEST_NAME
+from modules.logs.search import required_literal, search
+from pcaps import pcap
+
+
+def _stamp(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S,%f")[:-3]
+
+
+def test_search_merges_in_time_order_and_skips_by_range(tmp_path):
+    day = time.time() // 86400 * 86400 - 3 * 86400
+    # Two app logs whose entries interleave in time, one gzipped and in the manifest.
+    old = [f"{_stamp(day + i * 60)} | INFO | x | tick {i}\n" for i in range(0, 200, 2)]
+    old.insert(10, "Traceback (most recent call last): tick error\n")
+    new = [f"{_stamp(day + i * 60)} | INFO | x | tick {i}\n" for i in range(1, 200, 2)]
+    (tmp_path / "snortamv.log.1.gz").write_bytes(gzip.compress("".join(old).encode()))
+    (tmp_path / "snortamv.log").write_text("".join(new))
+    os.utime(tmp_path / "snortamv.log", (day + 200 * 60, day + 200 * 60))
+    # An archive from a week earlier that a windowed search must not open.
+    (tmp_path / "ancient.log.gz").write_bytes(b"not even gzip")
+    (tmp_path / MANIFEST_NAME).write_text(
+        json.dumps(
+            {
+                "snortamv.log.1.gz": {"first_ts": day, "last_ts": day + 200 * 60},
+                "ancient.log.gz": {"first_ts": day - 7 * 86400, "last_ts": day - 6 * 86400},
+            }
+        )
+    )
+    hits, searched, skipped = search(tmp_path, "tick", since=day, until=day + 50 * 60, workers=2)
+    assert (searched, skipped) == (2, 1)
+    ticks = [h.text.rsplit(" ", 1)[-1] for h in hits if "|" in h.text]
+    assert ticks == [str(i) for i in range(50)]
+    traceback = next(h for h in hits if h.text.startswith("Traceback"))
+    assert traceback.ts == hits[hits.index(traceback) - 1].ts  # sorts with the entry above it
+    assert [h.file for h in hits[:2]] == ["snortamv.log.1.gz", "snortamv.log"]
+
+    hits, _, _ = search(tmp_path, r"TICK 1\d\d$", is_regex=True, ignore_case=True, since=day, workers=1)
+    assert len(hits) == 100 and hits[0].line == 52
+
+
+def test_search_alert_files_and_pcaps(tmp_path):
+    lines = synthetic_lines(5000)
+    (tmp_path / "alert_fast").write_text("".join(lines))
+    payloads = [b"GET /evil HTTP/1.1" if i % 5 == 0 else b"GET / HTTP/1.1" for i in range(20)]
+    (tmp_path / "snort.log.1790000000").write_bytes(pcap((1_790_000_000 + i, p) for i, p in enumerate(payloads)))
+
+    hits, searched, _ = search(tmp_path, "[1:2010007:", limit=10)
+    assert searched == 2 and len(hits) == 10
+    assert all("[1:2010007:" in h.text for h in hits)
+    assert [h.ts for h in hits] == sorted(h.ts for h in hits)
+
+    hits, _, _ = search(tmp_path, "/evil")
+    assert [h.line for h in hits] == [1, 6, 11, 16] and hits[0].file == "snort.log.1790000000"
+
+
+def test_required_literal():
+    assert required_literal(r"sid:20\d+") == "sid:20"
+    assert required_literal(r"\[1:2010935") == "[1:2010935"
+    assert required_literal("foo(barbazz)?x") == "foo"
+    assert required_literal("a|b") == ""
+    assert required_literal("(?i)alert") == ""
+    assert required_literal(r"\x41BC") == "ABC"
+    assert required_literal(r"GET (/evil)\d") == "GET /evil"
+    assert required_literal(r"x(?i:abc)yz") == "yz"
+
+
+def test_regex_search_is_not_narrowed_wrongly(tmp_path):
+    (tmp_path / "alert_fast").write_text("10/18-10:06:23.057123 [**] ALERT one ABC [**]\n")
+    assert len(search(tmp_path, "(?i)alert", is_regex=True)[0]) == 1
+    assert len(search(tmp_path, r"\x41BC", is_regex=True)[0]) == 1
@@ -0,0 +1,65 @@
+import json
+import time
+import urllib.request
+
+from modules.utilities.metrics import Registry, enable_persistence, load_state, render, serve
+
+
+def test_registry_render_and_cost():
+    registry = Registry()
+    hits = registry.counter("snortamv_test_total", "Test hits", source="file")
+    assert registry.counter("snortamv_test_total", source="file") is hits
+    hits.inc()
+    hits.inc(4)
+    registry.gauge("snortamv_test_rate", "Rate").set(2.5)
+    latency = registry.histogram("snortamv_test_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value)
+
+    text = render({str(i): s for i, s in enumerate(registry.pending())})
+    assert "# TYPE snortamv_test_total counter" in text
+    assert 'snortamv_test_total{source="file"} 5' in text
+    assert "snortamv_test_rate 2.5" in text
+    assert 'snortamv_test_seconds_bucket{le="0.1"} 1' in text
+    assert 'snortamv_test_seconds_bucket{le="1"} 3' in text
+    assert 'snortamv_test_seconds_bucket{le="+Inf"} 4' in text
+    assert "snortamv_test_seconds_count 4" in text
+
+    # Recording must stay cheap enough for the alert hot path.
+    n = 200_000
+    start = time.perf_counter()
+    for _ in range(n):
+        hits.inc()
+    assert (time.perf_counter() - start) / n < 1e-6
+    start = time.perf_counter()
+    for _ in range(n):
+        latency.observe(0.2)
+    assert (time.perf_counter() - start) / n < 1e-6
+
+
+def test_processes_merge_into_the_state_file_and_endpoint(tmp_path):
+    state = tmp_path / "metrics.json"
+    for _ in range(2):  # two short-lived commands
+        registry = Registry()
+        enable_persistence(state, registry)
+        registry.counter("snortamv_runs_total", result="ok").inc()
+        registry.histogram("snortamv_run_seconds", buckets=(1.0,)).observe(0.5)
+        registry.flush()
+        registry.counter("snortamv_runs_total", result="ok").inc(2)
+        registry.flush()  # only the delta since the first flush is added
+    series = {s["name"]: s for s in load_state(state).values()}
+    assert series["snortamv_runs_total"]["value"] == 6
+    assert series["snortamv_run_seconds"]["counts"] == [2, 0]
+
+    live = Registry()
+    live.path = state
+    live.gauge("snortamv_running").set(1)
+    server = serve(0, registry=live)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        text = urllib.request.urlopen(f"{base}/metrics").read().decode()
+        assert 'snortamv_runs_total{result="ok"} 6' in text and "snortamv_running 1" in text
+        entries = json.loads(urllib.request.urlopen(f"{base}/metrics.json").read())
+        assert {e["name"] for e in entries} == {"snortamv_runs_total", "snortamv_run_seconds", "snortamv_running"}
+    finally:
+        server.shutdown()
@@ -0,0 +1,102 @@
+import gzip
+import os
+import struct
+
+import pytest
+
+from modules.logs.pcap_index import Capture, Flow
+from modules.logs.retention import enforce, index_path
+from pcaps import TCP, UDP, frame, pcap
+
+T0 = 1_790_000_000
+
+
+def _frame(i):
+    proto, vlan = TCP if i % 2 else UDP, 10 if i % 3 == 0 else None  # every third frame VLAN tagged
+    return frame([10, 0, 0, i % 250 + 1], [192, 168, 1, 5], 40000 + i, 443, b"x" * 20, proto, vlan)
+
+
+def _pcap(frames, start=T0):
+    return pcap((start + i / 10, data) for i, data in enumerate(frames))
+
+
+def test_index_lookups_incremental_and_archive(tmp_path):
+    path = tmp_path / "snort.log.1790000000"
+    frames = [_frame(i) for i in range(1000)]
+    path.write_bytes(_pcap(frames[:600]))
+    with Capture(path) as cap:
+        assert (cap.indexed, len(cap)) == (600, 600)
+        packet = cap.packet(4)
+        assert packet.data == frames[3] and packet.ts == pytest.approx(T0 + 0.3)
+        assert packet.flow == Flow(6, "10.0.0.4", 40003, "192.168.1.5", 443)
+        assert cap.packet(3).flow.proto == 17
+        window = list(cap.between(T0 + 10, T0 + 12))
+        assert [p.number for p in window] == list(range(101, 121))
+        with pytest.raises(IndexError):
+            cap.packet(601)
+
+    # Snort appends packets and half of the next record: only the new ones are walked.
+    rest = _pcap(frames, start=T0)[len(_pcap(frames[:600])) :]
+    with open(path, "ab") as f:
+        f.write(rest[: len(rest) - 30])
+    with Capture(path) as cap:
+        assert (cap.indexed, len(cap)) == (399, 999)
+        assert cap.packet(999).data == frames[998]
+    with Capture(path) as cap:
+        assert cap.indexed == 0
+    with open(path, "ab") as f:
+        f.write(rest[len(rest) - 30 :])
+    with Capture(path) as cap:
+        assert (cap.indexed, len(cap)) == (1, 1000)
+
+    # After retention gzips it, the archive reuses the index; deleting it drops the index.
+    archive = path.with_name(path.name + ".gz")
+    archive.write_bytes(gzip.compress(path.read_bytes()))
+    st = path.stat()
+    os.utime(archive, ns=(st.st_atime_ns, st.st_mtime_ns))
+    path.unlink()
+    with Capture(archive) as cap:
+        assert cap.indexed == 0 and [p.data for p in cap.between(T0 + 99)] == frames[990:]
+    assert index_path(archive).exists()
+    enforce(tmp_path, days=0, now=st.st_mtime + 10)
+    assert not archive.exists() and not index_path(archive).exists()
+
+
+def test_pcapng_with_nanosecond_resolution(tmp_path):
+    frame = bytes(12) + b"\x86\xdd" + bytes([0x60]) + bytes(5) + bytes([17, 64]) + bytes(15) + b"\x01"
+    frame += bytes(15) + b"\x02" + struct.pack("!HH", 5353, 53) + bytes(4)
+    shb = struct.pack("<IIIHHqI", 0x0A0D0D0A, 28, 0x1A2B3C4D, 1, 0, -1, 28)
+    option = struct.pack("<HHB3x", 9, 1, 9) + struct.pack("<HH", 0, 0)
+    idb = struct.pack("<IIHHI", 1, 20 + len(option), 1, 0, 0) + option + struct.pack("<I", 20 + len(option))
+    blocks = []
+    for i in range(5):
+        ns = (T0 + i) * 1_000_000_000 + 5
+        pad = -len(frame) % 4
+        length = 32 + len(frame) + pad
+        blocks.append(
+            struct.pack("<IIIIIII", 6, length, 0, ns >> 32, ns & 0xFFFFFFFF, len(frame), len(frame))
+            + frame
+            + bytes(pad)
+            + struct.pack("<I", length)
+        )
+    path = tmp_path / "capture.pcapng"
+    path.write_bytes(shb + idb + b"".join(blocks))
+    with Capture(path) as cap:
+        assert len(cap) == 5
+        third = cap.packet(3)
+        assert third.ts == pytest.approx(T0 + 2 + 5e-9) and third.data == frame
+        assert third.flow == Flow(17, "::1", 5353, "::2", 53)
+        assert [p.number for p in cap.between(T0 + 1, T0 + 3)] == [2, 3]
+
+
+def test_refresh_sees_packets_appended_while_open(tmp_path):
+    path = tmp_path / "snort.log.1790000000"
+    frames = [_frame(i) for i in range(20)]
+    full = _pcap(frames)
+    path.write_bytes(full[: len(_pcap(frames[:10]))])
+    with Capture(path) as cap:
+        assert len(cap) == 10
+        with open(path, "ab") as f:
+            f.write(full[len(_pcap(frames[:10])) :])
+        assert cap.refresh() == 10
+        assert len(cap) == 20 and cap.packet(15).data == frames[14]
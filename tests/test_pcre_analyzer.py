@@ -0,0 +1,22 @@
+from modules.configuration.pcre_analyzer import analyze, static_issues
+
+
+def test_static_scan_flags_classic_redos_shapes():
+    assert static_issues(r"(a+)+$") == ["exponential: nested quantifier in (a+)+"]
+    assert static_issues(r"(a|ab)*c") == ["exponential: ambiguous alternation in (a|ab)*"]
+    assert static_issues(r"\d+\d*x") == [r"polynomial: adjacent quantifiers \d+\d* overlap"]
+    # A mandatory separator makes the repetition unambiguous.
+    assert static_issues(r"(\d+\.)+") == []
+    assert static_issues(r"^GET\s+/[^\s]+\s+HTTP") == []
+
+
+def test_analyze_reports_per_sid_with_fuzz_timeout(tmp_path):
+    enabled = tmp_path / "enabled"
+    enabled.mkdir()
+    (enabled / "a.rules").write_text(
+        'alert tcp any any -> any 80 (msg:"ok"; content:"GET"; pcre:"/^GET\\s+\\/x/i"; sid:1;)\n'
+        'alert tcp any any -> any 80 (msg:"bad"; content:"a"; pcre:"/(\\w+\\s?)+$/"; sid:2;)\n'
+    )
+    (finding,) = analyze([enabled / "a.rules"], tmp_path, budget=0.2, jobs=2)
+    assert (finding.sid, finding.line_no, finding.pathological) == (2, 2, True)
+    assert finding.timed_out
@@ -0,0 +1,91 @@
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from database.alerts import AlertStore
+from modules.alerts.pipeline import AlertPipeline
+from modules.alerts.receiver import ReceiverStats, UnixSockReceiver, json_batches
+from modules.alerts.rollups import Rollups
+
+T0 = 1_790_000_000
+
+# Stand-in for Snort 2's alert_unixsock: a separate process sending Alertpkt
+# datagrams, skipping event ids 500..509 as if Snort had lost them.
+EMITTER = """
+import socket, sys
+from modules.alerts.receiver import pack_alertpkt
+path, count = sys.argv[1], int(sys.argv[2])
+sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+event_id = 0
+for i in range(count):
+    event_id += 11 if i == 500 else 1
+    sock.sendto(
+        pack_alertpkt(%d + i / 100, 1, 100 + i %% 3, 2, "Flood %%d" %% (i %% 3),
+                      "10.0.0.%%d" %% (i %% 5), "10.0.1.1", 40000 + i, 443, event_id=event_id),
+        path,
+    )
+""" % T0
+
+
+def test_unixsock_datagrams_reach_store_and_rollups(tmp_path):
+    count = 3000
+    receiver = UnixSockReceiver(tmp_path / "snort_alert", batch_size=256)
+    store = AlertStore(tmp_path / "alerts.db")
+    pipeline = AlertPipeline(store, rollups=Rollups())
+    emitter = subprocess.Popen(
+        [sys.executable, "-c", EMITTER, str(receiver.path), str(count)], cwd=Path(__file__).parents[1]
+    )
+
+    def until_done():
+        received = 0
+        for batch in receiver.batches(wait=0.05):
+            received += len(batch)
+            yield batch
+            if received >= count or emitter.poll() is not None and not batch:
+                break
+
+    try:
+        assert pipeline.run(until_done()) == count
+        pipeline.close()
+    finally:
+        emitter.wait(timeout=30)
+        receiver.close()
+    assert emitter.returncode == 0
+    assert receiver.stats.as_dict() == {"received": count, "bad": 0, "gaps": 10}
+    assert not receiver.path.exists()
+
+    assert store.count() == count
+    (newest,) = store.query(limit=1)
+    assert (newest.gid, newest.sid, newest.rev, newest.msg, newest.priority) == (1, 102, 2, "Flood 2", 2)
+    assert (newest.proto, newest.src, newest.sport, newest.dst, newest.dport) == (
+        "TCP",
+        "10.0.0.4",
+        40000 + count - 1,
+        "10.0.1.1",
+        443,
+    )
+    assert abs(newest.ts - (T0 + (count - 1) / 100)) < 1e-5
+    assert pipeline.rollups.top(by="sid", minutes=5, n=1)[0][:2] == (100, 1000)
+    store.close()
+
+
+def test_alert_json_stream():
+    lines = [
+        {"seconds": T0, "rule": "1:2010935:3", "msg": "ET POLICY probe", "class": "Potentially Bad Traffic",
+         "priority": 2, "proto": "TCP", "src_addr": "192.168.1.5", "src_port": 51234,
+         "dst_addr": "10.0.0.1", "dst_port": 1433},
+        {"timestamp": "10/18/26-10:06:23.057123", "rule": "1:1000001:1", "proto": "UDP",
+         "src_ap": "fe80::1:5353", "dst_ap": "ff02::fb:5353"},
+    ]
+    data = "".join(json.dumps(line) + "\n" for line in lines) + "not json\n" + json.dumps(lines[0])
+    stats = ReceiverStats()
+    batches = list(json_batches(io.BytesIO(data.encode()), stats=stats))
+    alerts = [a for batch in batches for a in batch]
+    assert len(alerts) == 3 and (stats.received, stats.bad) == (3, 1)
+    first, second, last = alerts
+    assert first.ts == T0 and first.sid == 2010935 and first.classification == "Potentially Bad Traffic"
+    assert (first.src, first.sport, first.dst, first.dport) == ("192.168.1.5", 51234, "10.0.0.1", 1433)
+    assert (second.src, second.sport, second.dst, second.dport) == ("fe80::1", 5353, "ff02::fb", 5353)
+    assert second.ts % 1 > 0.057 and last == first
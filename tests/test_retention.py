@@ -0,0 +1,65 @@
+import gzip
+import os
+import time
+
+from modules.logs.retention import DAY, TokenBucket, enforce, load_manifest
+from pcaps import pcap
+
+NOW = 1_790_000_000.0
+
+
+def _write(path, data, age):
+    path.write_bytes(data)
+    os.utime(path, (NOW - age, NOW - age))
+
+
+def _pcap(first_ts, packets=50):
+    return pcap((first_ts + i, bytes(60)) for i in range(packets))
+
+
+def test_retention_compresses_expires_and_keeps_active_files(tmp_path):
+    _write(tmp_path / "alert_fast", b"x" * 1000, age=30 * DAY)  # active: never touched
+    _write(tmp_path / "snort.log.1789990000", _pcap(1_789_990_000), age=3600)
+    _write(tmp_path / "snort.log.1789999000", _pcap(1_789_999_000), age=10)  # newest of the series
+    _write(tmp_path / "snortamv.log.1", b"10/18-10:06:23.057123  started\n" * 500, age=2 * DAY)
+    _write(tmp_path / "snort.log.1780000000", _pcap(1_780_000_000), age=9 * DAY)  # past the age budget
+    _write(tmp_path / "old.log.gz", gzip.compress(b"old"), age=8 * DAY)
+
+    dry = enforce(tmp_path, days=7, settle=300, now=NOW, dry_run=True)
+    assert sorted(dry.deleted) == ["old.log.gz", "snort.log.1780000000"]
+    assert (tmp_path / "old.log.gz").exists()
+
+    result = enforce(tmp_path, days=7, settle=300, now=NOW)
+    assert sorted(result.compressed) == ["snort.log.1789990000", "snortamv.log.1"]
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith(".")) == [
+        "alert_fast",
+        "snort.log.1789990000.gz",
+        "snort.log.1789999000",
+        "snortamv.log.1.gz",
+    ]
+    archive = tmp_path / "snort.log.1789990000.gz"
+    assert gzip.decompress(archive.read_bytes()) == _pcap(1_789_990_000)
+    assert archive.stat().st_mtime == NOW - 3600
+
+    manifest = load_manifest(tmp_path)
+    entry = manifest["snort.log.1789990000.gz"]
+    assert (entry["kind"], entry["first_ts"], entry["last_ts"]) == ("pcap", 1_789_990_000, NOW - 3600)
+    assert entry["size"] == len(_pcap(0)) and entry["stored"] == archive.stat().st_size
+    text = manifest["snortamv.log.1.gz"]
+    assert text["kind"] == "text" and text["first_ts"] is not None
+
+    # Size budget: oldest archives go first, active files stay.
+    budget = sum(p.stat().st_size for p in tmp_path.iterdir()) - 1
+    squeezed = enforce(tmp_path, days=7, max_bytes=budget, settle=300, now=NOW)
+    assert squeezed.deleted == ["snortamv.log.1.gz"]
+    assert (tmp_path / "alert_fast").exists() and (tmp_path / "snort.log.1789999000").exists()
+    assert set(load_manifest(tmp_path)) == {p.name for p in tmp_path.glob("*.gz")}
+
+
+def test_token_bucket_caps_rate():
+    bucket = TokenBucket(rate=4 * 1024 * 1024, burst=1024 * 1024)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire(1024 * 1024)
+    # 1 MiB of burst, then 4 MiB at 4 MiB/s.
+    assert 0.9 <= time.monotonic() - start < 1.5
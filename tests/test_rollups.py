@@ -0,0 +1,56 @@
+import random
+
+from database.alerts import AlertStore
+from modules.alerts.alert_fast import Alert
+from modules.alerts.rollups import TOP_K, CountMinSketch, Rollups, SpaceSaving
+
+T0 = 1_789_999_980.0  # minute-aligned
+
+
+def _alert(ts, sid, src, dst="10.0.0.2"):
+    return Alert(ts, 1, sid, 1, "m", "", 3, "TCP", src, 1234, dst, 80)
+
+
+def test_sketches_find_heavy_hitters_in_noise():
+    rng = random.Random(7)
+    stream = ["scanner"] * 5000 + ["brute"] * 3000 + [f"noise{rng.randrange(100000)}" for _ in range(20000)]
+    rng.shuffle(stream)
+    summary, cms = SpaceSaving(32), CountMinSketch()
+    for item in stream:
+        summary.add(item)
+        cms.add(item)
+    (first, count, error), (second, *_rest) = summary.top(2)
+    assert (first, second) == ("scanner", "brute")
+    assert count - error <= 5000 <= count
+    assert len(summary.counts) == 32
+    assert 5000 <= cms.estimate("scanner") < 5100
+    assert cms.estimate("never-seen") < 100
+
+
+def test_rollup_window_top_talkers_and_persistence(tmp_path):
+    rollups = Rollups(minutes=10)
+    for minute in range(30):
+        batch = [_alert(T0 + minute * 60 + i % 60, 100 + i % 4, f"10.0.{minute}.{i % 200}") for i in range(400)]
+        batch += [_alert(T0 + minute * 60, 100, "6.6.6.6")] * 50
+        rollups.add(batch)
+    assert len(rollups.buckets) == 10
+    assert all(len(b.src.counts) <= TOP_K for b in rollups.buckets.values())
+
+    now = T0 + 29 * 60 + 59
+    (src, count, error), *_ = rollups.top(by="src", sid=100, minutes=5, now=now)
+    assert src == "6.6.6.6" and count - error <= 250 <= count
+    assert rollups.top(by="sid", minutes=5, n=1, now=now)[0][:2] == (100, 5 * 150)
+    assert 250 <= rollups.estimate("6.6.6.6", sid=100, minutes=5, now=now) < 260
+    assert [c for _, c in rollups.rate(minutes=3, now=now)] == [450, 450, 450]
+
+    store = AlertStore(tmp_path / "alerts.db")
+    store.save_rollups(rollups.take_dirty())
+    assert rollups.take_dirty() == []
+    restored = Rollups(minutes=10)
+    restored.load(store.load_rollups(T0))
+    assert restored.top(by="src", sid=100, minutes=5, now=now) == rollups.top(
+        by="src", sid=100, minutes=5, now=now
+    )
+    assert restored.estimate("6.6.6.6", minutes=5, now=now) == rollups.estimate("6.6.6.6", minutes=5, now=now)
+    assert store.sid_minutes(T0 + 28 * 60, sid=101) == [(int(T0 // 60 + 28) * 60, 100), (int(T0 // 60 + 29) * 60, 100)]
+    store.close()
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+
+from database.rule_catalog import search_rules, sync_catalog
+
+
+def _rule(sid, msg, extra=""):
+    return f'alert tcp any any -> any 80 (msg:"{msg}"; {extra}classtype:trojan-activity; sid:{sid}; rev:1;)\n'
+
+
+def test_catalog_sync_is_incremental_and_searchable(tmp_path):
+    for d in ("enabled", "sources"):
+        (tmp_path / d).mkdir()
+    web = tmp_path / "enabled" / "web.rules"
+    web.write_text(
+        _rule(1, "ET TROJAN Zeus beacon", 'content:"/gate.php"; reference:cve,2021-1234; ')
+        + "# " + _rule(2, "ET POLICY curl user agent", 'content:"curl/"; ')
+    )
+    (tmp_path / "sources" / "scan.rules").write_text(_rule(3, "ET SCAN nmap probe"))
+    files = lambda: sorted(tmp_path.glob("*/*.rules"))
+    conn = sqlite3.connect(tmp_path / "catalog.db")
+
+    assert sync_catalog(conn, files(), tmp_path)[:2] == (2, 3)
+    assert sync_catalog(conn, files(), tmp_path)[:2] == (0, 0)
+
+    (hit,) = search_rules(conn, "zeus beacon")
+    assert (hit.sid, hit.path, hit.line_no, hit.active) == (1, "enabled/web.rules", 1, True)
+    assert [h.sid for h in search_rules(conn, "gate.php")] == [1]
+    assert [h.sid for h in search_rules(conn, "cve 2021-1234")] == [1]
+    assert [h.sid for h in search_rules(conn, "curl")] == [2]
+    assert not search_rules(conn, "curl")[0].active
+    assert [h.sid for h in search_rules(conn, "ET", state="sources")] == [3]
+    assert [h.sid for h in search_rules(conn, "3")] == [3]
+
+    # Only the rewritten file is reloaded, and stale rows go away with it.
+    web.write_text(_rule(4, "ET TROJAN Emotet loader"))
+    os.utime(web, ns=(1, 1))
+    assert sync_catalog(conn, files(), tmp_path)[:2] == (1, 1)
+    assert not search_rules(conn, "zeus")
+    assert [h.sid for h in search_rules(conn, "msg:trojan")] == [4]
@@ -0,0 +1,93 @@
+from modules.configuration.rule_index import OVERRIDE_FILE, RuleIndex
+from modules.configuration.rule_parser import parse_line, parse_sid_spec
+
+
+def _rule(sid, rev=1, msg="test"):
+    return f'alert tcp any any -> any 80 (msg:"{msg}; x"; content:"GET"; sid:{sid}; rev:{rev};)\n'
+
+
+def _make_tree(tmp_path):
+    for d in ("sources", "enabled", "disabled"):
+        (tmp_path / d).mkdir()
+    (tmp_path / "enabled" / "web.rules").write_text(
+        "# web rules\n" + _rule(1001) + "# " + _rule(1002) + _rule(1003, rev=4)
+    )
+    (tmp_path / "sources" / "scan.rules").write_text(_rule(2001) + _rule(2002))
+    return tmp_path
+
+
+def test_parse_line_handles_quoted_semicolons_and_comments():
+    rule = parse_line("# " + _rule(42, rev=3))
+    assert rule.sid == 42 and rule.rev == 3 and not rule.enabled
+    assert rule.msg == "test; x"
+    assert parse_line("# just a comment (not a rule)") is None
+    assert parse_sid_spec("2019999-2010000") == (2010000, 2019999)
+    assert parse_sid_spec("web.rules") is None
+
+
+def test_index_lookup_and_incremental_refresh(tmp_path):
+    index = RuleIndex(_make_tree(tmp_path))
+    assert index.refresh() == 2
+    (loc,) = index.lookup(1003)
+    assert (loc.path, loc.line_no, loc.rev, loc.active) == ("enabled/web.rules", 4, 4, True)
+    assert not index.lookup(1002)[0].active
+    assert sorted(index.lookup_range(2000, 2999)) == [2001, 2002]
+
+    # A fresh instance loads from disk and re-parses nothing.
+    assert RuleIndex(tmp_path).refresh() == 0
+
+
+def test_toggle_single_sids(tmp_path):
+    index = RuleIndex(_make_tree(tmp_path))
+    index.refresh()
+
+    index.apply_plan(index.plan_state([1001], enable=False))
+    index.apply_plan(index.plan_state([1002, 2002], enable=True))
+
+    lines = (tmp_path / "enabled" / "web.rules").read_text().splitlines()
+    assert lines[1].startswith("# alert") and "sid:1001;" in lines[1]
+    assert lines[2].startswith("alert") and "sid:1002;" in lines[2]
+    assert "sid:2002;" in (tmp_path / "enabled" / OVERRIDE_FILE).read_text()
+    assert any(loc.active for loc in index.lookup(2002))
+    assert not any(loc.active for loc in index.lookup(1001))
+    assert RuleIndex(tmp_path).refresh() == 0
+
+
+def test_bulk_selectors_and_journal_recovery(tmp_path):
+    import json
+
+    from modules.configuration.rule_index import splice_lines
+    from modules.configuration.rule_select import Selector, select_sids
+
+    _make_tree(tmp_path)
+    (tmp_path / "enabled" / "policy.rules").write_text(
+        'alert tcp any any -> any any (msg:"POLICY tor"; classtype:policy-violation; sid:3001;)\n'
+        'alert tcp any any -> any any (msg:"POLICY dropbox"; classtype:policy-violation; sid:3002;)\n'
+        'alert tcp any any -> any any (msg:"TROJAN x"; classtype:trojan-activity; sid:3003;)\n'
+    )
+    index = RuleIndex(tmp_path)
+    index.refresh()
+
+    assert select_sids(index, Selector(classtype="policy-violation"), False) == {3001, 3002}
+    assert select_sids(index, Selector(msg="dropbox|trojan"), False) == {3002, 3003}
+    assert select_sids(index, Selector(sids=(1000, 2999), file="web*"), False) == {1001, 1002, 1003}
+    assert select_sids(index, Selector(sids=(2000, 2999)), True) == {2001, 2002}
+
+    # A SID copied into another file is only edited where the --file glob matches.
+    (tmp_path / "enabled" / "local.rules").write_text(_rule(1001) + "# " + _rule(1002))
+    index.refresh()
+    sids = select_sids(index, Selector(sids=(1001, 1002), file="web*"), False)
+    assert [loc.path for _, loc in index.plan_state(sids, False, "web*")] == ["enabled/web.rules"]
+    assert [(a, loc.path) for a, loc in index.plan_state([1002], True, "local*")] == [
+        ("uncomment", "enabled/local.rules")
+    ]
+    (tmp_path / "enabled" / "local.rules").unlink()
+    index.refresh()
+
+    # Simulate a crash after the journal was written but before the renames.
+    path = tmp_path / "enabled" / "policy.rules"
+    staged = splice_lines(path, {0: "# edited"}, stage=True)
+    index.journal_path.write_text(json.dumps({"renames": [[staged, str(path)]]}))
+    recovered = RuleIndex(tmp_path)
+    assert not recovered.journal_path.exists()
+    assert path.read_text().startswith("# edited\n")
@@ -0,0 +1,21 @@
+from modules.configuration.rule_lint import content_length, lint_files
+
+
+def test_lint_ranks_expensive_rules_first(tmp_path):
+    enabled = tmp_path / "enabled"
+    enabled.mkdir()
+    (enabled / "mixed.rules").write_text(
+        'alert tcp $HOME_NET any -> $EXTERNAL_NET 80 (msg:"cheap"; flow:to_server; '
+        'content:"User-Agent|3a 20|curl"; sid:1;)\n'
+        'alert ip any any -> any any (msg:"pcre only"; pcre:"/.*evil/"; sid:2;)\n'
+        'alert tcp any any -> any 443 (msg:"short"; flow:to_server; content:"|16 03|"; sid:3;)\n'
+        '# alert ip any any -> any any (msg:"disabled"; sid:4;)\n'
+    )
+
+    results = lint_files([enabled / "mixed.rules"], tmp_path)
+    assert [r.sid for r in results] == [2, 3, 1]
+    assert "pcre-only matching" in results[0].reasons
+    assert "any any -> any any header" in results[0].reasons
+    assert results[1].reasons == ["short fast pattern (2 bytes)"]
+    assert results[2].reasons == []
+    assert content_length('"User-Agent|3a 20|curl"') == 16
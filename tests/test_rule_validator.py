@@ -0,0 +1,73 @@
+from modules.configuration.rule_validator import check_rule, validate_file
+
+GOOD = (
+    'alert tcp $HOME_NET any -> $EXTERNAL_NET $HTTP_PORTS (msg:"ET test"; '
+    'flow:established,to_server; content:"|0d 0a|GET"; nocase; depth:5; '
+    'pcre:"/a;b/i"; threshold: type limit, track by_src, count 1, seconds 60; '
+    "classtype:policy-violation; sid:2000001; rev:3;)"
+)
+
+
+def test_valid_snort2_and_snort3_rules():
+    assert check_rule(GOOD) == ([], 2000001)
+    assert check_rule('alert http (msg:"svc"; content:"x",nocase; sid:5; rev:1;)')[0] == []
+    assert check_rule('alert tcp any any -> any any (msg:"ssn"; sd_pattern:"123-45-6789"; sid:6;)')[0] == []
+    assert check_rule('alert tcp any any -> any any (msg:"raw"; raw_data; content:"x"; sid:7;)')[0] == []
+    assert check_rule('alert http (msg:"suricata"; http.uri; content:"/x"; sid:8;)')[0] == [
+        "unknown option 'http.uri'"
+    ]
+
+
+def test_errors_are_specific():
+    errors, _ = check_rule(
+        'alert tcp any 99999 => any any (msg:x; content:"|0g|"; pcre:"foo"; '
+        "flow:to_client,to_server; rev:a; bogus; sid:1;)"
+    )
+    assert errors == [
+        "invalid direction '=>'",
+        "port 99999 out of range",
+        "msg value must be quoted",
+        "invalid hex in content |0g|",
+        'pcre must look like "/regex/flags"',
+        "flow direction is contradictory",
+        "rev must be a non-negative integer, got 'a'",
+        "unknown option 'bogus'",
+    ]
+    assert "missing sid" in check_rule('alert ip any any -> any any (msg:"x";)')[0]
+
+
+def test_validate_file_shards_report_line_numbers(tmp_path):
+    path = tmp_path / "snort.rules"
+    lines = [GOOD] * 10
+    lines[3] = "# " + GOOD.replace("sid:", "bad:")  # commented out, ignored
+    lines[7] = GOOD[:-1]
+    lines[8] = GOOD.replace("depth:5", "depth:5x")
+    path.write_text("\n".join(lines) + "\n")
+
+    errors = validate_file(path, jobs=2, shard_lines=3)
+    assert [str(e) for e in errors] == [
+        "line 8: rule options must end with ')'",
+        "line 9 (sid 2000001): depth must be an integer or variable, got '5x'",
+    ]
+
+
+def test_validate_file_follows_grouped_includes(tmp_path):
+    from modules.configuration.ruleset_builder import build
+
+    enabled, generated = tmp_path / "enabled", tmp_path / "generated"
+    enabled.mkdir()
+    generated.mkdir()
+    bad = GOOD.replace("tcp", "udp").replace("$HTTP_PORTS", "53").replace("depth:5", "depth:5x")
+    (enabled / "mix.rules").write_text(GOOD + "\n" + bad.replace("sid:2000001", "sid:2000002") + "\n")
+    target = generated / "snort.rules"
+    build(enabled, target, grouped=True)
+    assert all(line.startswith("include ") for line in target.read_text().splitlines())
+
+    errors = validate_file(target)
+    assert [str(e) for e in errors] == [
+        "udp_53.rules line 1 (sid 2000002): depth must be an integer or variable, got '5x'"
+    ]
+
+    target.write_text(f"include {tmp_path / 'missing.rules'}\ninclude $RULE_PATH/local.rules\n")
+    missing = tmp_path / "missing.rules"
+    assert [str(e) for e in validate_file(target)] == [f"line 1: included file not found: {missing}"]
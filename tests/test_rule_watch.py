@@ -0,0 +1,114 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from modules.configuration.rule_validator import validate_file
+from modules.configuration.rule_watch import last_good_path, reload_cycle, remember_good, roll_back
+from modules.configuration.ruleset_builder import build
+from modules.utilities.file_watch import Watcher
+
+GOOD = 'alert tcp any any -> any 80 (msg:"good"; content:"GET"; sid:1; rev:1;)\n'
+BAD = 'alert tcp any any -> any 80 (msg:"bad"; content:"GET"; sid:abc; rev:1;)\n'
+
+# Stand-in for Snort: appends a line to a file for every SIGHUP it gets.
+STAND_IN = """
+import signal, sys, time
+out = sys.argv[1]
+def hup(*_):
+    with open(out, "a") as f:
+        f.write("HUP\\n")
+signal.signal(signal.SIGHUP, hup)
+open(out, "w").close()
+while True:
+    time.sleep(0.05)
+"""
+
+
+@pytest.mark.parametrize("poll", [True, False])
+def test_watcher_debounces_bursts(tmp_path, poll):
+    watcher = Watcher(tmp_path, pattern="*.rules", debounce=0.3, poll_interval=0.05, poll=poll)
+    stop = threading.Event()
+    batches = []
+
+    def consume():
+        for batch in watcher.batches(stop):
+            batches.append(batch)
+            stop.set()
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    time.sleep(0.1)
+    for i in range(5):
+        (tmp_path / "a.rules").write_text(GOOD * (i + 1))
+        (tmp_path / "notes.txt").write_text("ignored")
+        time.sleep(0.05)
+    (tmp_path / "b.rules").write_text(GOOD)
+    thread.join(5)
+    stop.set()
+    watcher.close()
+    assert batches == [{"a.rules", "b.rules"}]
+
+
+def test_reload_cycle_signals_snort_and_rolls_back_bad_rules(tmp_path):
+    enabled, generated = tmp_path / "enabled", tmp_path / "generated"
+    enabled.mkdir()
+    generated.mkdir()
+    target = generated / "snort.rules"
+    signals = tmp_path / "signals"
+    proc = subprocess.Popen([sys.executable, "-c", STAND_IN, str(signals)])
+    try:
+        while not signals.exists():
+            time.sleep(0.01)
+
+        def cycle():
+            return reload_cycle(
+                lambda: build(enabled, target),
+                lambda: [str(e) for e in validate_file(target)],
+                target,
+                pid=proc.pid,
+            )
+
+        (enabled / "web.rules").write_text(GOOD)
+        assert cycle().status == "reloaded"
+        assert last_good_path(target).read_text() == target.read_text()
+        good = target.read_text()
+
+        (enabled / "web.rules").write_text(GOOD + BAD)
+        result = cycle()
+        assert result.status == "rolled-back" and "sid" in result.errors[0]
+        assert target.read_text() == good
+
+        time.sleep(0.2)
+        assert signals.read_text() == "HUP\n"
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_roll_back_of_grouped_ruleset_keeps_its_group_files(tmp_path):
+    enabled, generated = tmp_path / "enabled", tmp_path / "generated"
+    enabled.mkdir()
+    generated.mkdir()
+    target = generated / "snort.rules"
+    (enabled / "web.rules").write_text(GOOD)
+    build(enabled, target, grouped=True)
+    remember_good(target)
+
+    # The next grouped build deletes the group directory the good copy came from.
+    (enabled / "web.rules").write_text(GOOD + BAD)
+    build(enabled, target)
+    assert validate_file(target)
+    assert roll_back(target)
+    assert [str(e) for e in validate_file(target)] == []
+    included = [line.split()[1] for line in target.read_text().splitlines()]
+    assert [open(path).read() for path in included] == [GOOD]
+
+    # Once a flat ruleset is good again the kept group files go.
+    build(enabled, target, grouped=False, force=True)
+    (enabled / "web.rules").write_text(GOOD)
+    build(enabled, target)
+    remember_good(target)
+    assert [p.name for p in generated.iterdir() if p.is_dir()] == []
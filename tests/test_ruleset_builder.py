@@ -0,0 +1,92 @@
+import os
+
+from modules.configuration.ruleset_builder import build
+
+
+def test_build_is_incremental_and_atomic(tmp_path):
+    enabled = tmp_path / "enabled"
+    generated = tmp_path / "generated"
+    enabled.mkdir()
+    generated.mkdir()
+    (enabled / "a.rules").write_text("alert ip any any -> any any (sid:1;)")
+    (enabled / "b.rules").write_text("alert ip any any -> any any (sid:2;)\n")
+    target = generated / "snort.rules"
+
+    first = build(enabled, target)
+    assert first.changed and first.files == 2
+    assert first.bytes_written == target.stat().st_size
+    assert target.read_text().splitlines() == [
+        "alert ip any any -> any any (sid:1;)",
+        "alert ip any any -> any any (sid:2;)",
+    ]
+
+    assert not build(enabled, target).changed
+
+    # Touching a file without changing its content is still a no-op.
+    os.utime(enabled / "a.rules", ns=(1, 1))
+    assert not build(enabled, target).changed
+
+    (enabled / "b.rules").write_text("alert ip any any -> any any (sid:3;)\n")
+    assert build(enabled, target).changed
+    assert "sid:3;" in target.read_text()
+    assert sorted(p.name for p in generated.iterdir()) == [".manifest.json", "snort.rules"]
+
+
+def test_duplicate_sids_keep_highest_rev(tmp_path):
+    from modules.configuration.rule_dedup import find_duplicates, skipped_offsets
+    from modules.configuration.rule_index import RuleIndex
+
+    enabled = tmp_path / "enabled"
+    generated = tmp_path / "generated"
+    enabled.mkdir()
+    generated.mkdir()
+    (enabled / "a.rules").write_text(
+        "alert ip any any -> any any (sid:1; rev:2;)\n"
+        "alert ip any any -> any any (sid:2; rev:1;)\n"
+    )
+    (enabled / "b.rules").write_text("alert ip any any -> any any (sid:1; rev:5;)\n")
+
+    index = RuleIndex(tmp_path)
+    index.refresh()
+    (conflict,) = find_duplicates(index.locations("enabled"))
+    assert (conflict.sid, conflict.kept.path, conflict.kept.rev) == (1, "enabled/b.rules", 5)
+    assert [(d.path, d.line_no) for d in conflict.dropped] == [("enabled/a.rules", 1)]
+
+    build(enabled, generated / "snort.rules", skip=skipped_offsets([conflict]))
+    lines = (generated / "snort.rules").read_text().splitlines()
+    assert lines[0].startswith("# alert") and "rev:2" in lines[0]
+    assert [line for line in lines if not line.startswith("#")] == lines[1:]
+
+
+def test_grouped_output_splits_by_protocol_and_port(tmp_path):
+    enabled = tmp_path / "enabled"
+    generated = tmp_path / "generated"
+    enabled.mkdir()
+    generated.mkdir()
+    (enabled / "mix.rules").write_text(
+        "alert tcp any any -> any 80 (sid:1;)\n"
+        "alert tcp any any -> any $HTTP_PORTS (sid:2;)\n"
+        "alert udp any any -> any 53 (sid:3;)\n"
+        'alert tcp any any -> any any (metadata:service http; sid:4;)\n'
+        "# alert tcp any any -> any 80 (sid:5;)\n"
+        "alert tcp any any -> any 80 (sid:6;)\n"
+    )
+    target = generated / "snort.rules"
+
+    result = build(enabled, target, grouped=True)
+    includes = target.read_text().splitlines()
+    names = [line.rsplit("/", 1)[-1] for line in includes]
+    assert names == ["tcp_80.rules", "tcp_svc_http.rules", "tcp_var_http_ports.rules", "udp_53.rules"]
+    group_dir = includes[0].split()[1].rsplit("/", 1)[0]
+    assert "sid:5" not in open(f"{group_dir}/tcp_80.rules").read()
+    assert len(open(f"{group_dir}/tcp_80.rules").read().splitlines()) == 2
+    assert result.changed and not build(enabled, target, grouped=True).changed
+
+    # A rebuild that does not ask for a mode keeps the grouped output.
+    (enabled / "mix.rules").write_text("alert udp any any -> any 53 (sid:3;)\n")
+    assert build(enabled, target).changed
+    assert [line.rsplit("/", 1)[-1] for line in target.read_text().splitlines()] == ["udp_53.rules"]
+
+    # Switching back to flat output rebuilds and drops the group directory.
+    assert build(enabled, target, grouped=False).changed
+    assert [p.name for p in generated.iterdir() if p.is_dir()] == []
@@ -0,0 +1,44 @@
+from database.alerts import AlertStore
+from modules.alerts.alert_fast import Alert
+from modules.alerts.suppression import Suppressor, parse_overrides
+
+T0 = 1_790_000_000.0
+
+
+def _alert(ts, sid, src="10.0.0.1", dst="10.0.0.2"):
+    return Alert(ts, 1, sid, 1, f"msg {sid}", "", 3, "TCP", src, 1234, dst, 80)
+
+
+def test_duplicates_collapse_per_window_with_overrides():
+    suppressor = Suppressor(window=60, overrides=parse_overrides(["200=0", "300=10"]))
+    flood = [_alert(T0 + i * 0.5, 100) for i in range(200)]  # 100 seconds of one flow
+    passthrough = [_alert(T0 + i, 200) for i in range(5)]
+    short = [_alert(T0 + i, 300) for i in range(25)]
+    out = suppressor.process(sorted(flood + passthrough + short, key=lambda a: a.ts))
+    out += suppressor.flush()
+
+    by_sid = {}
+    for a in out:
+        by_sid.setdefault(a.sid, []).append(a)
+    assert [(a.ts, a.hits) for a in by_sid[100]] == [(T0, 120), (T0 + 60, 80)]
+    assert [a.hits for a in by_sid[200]] == [1] * 5
+    assert [a.hits for a in by_sid[300]] == [10, 10, 5]
+    stats = suppressor.stats
+    assert stats.seen == 230 and stats.emitted == len(out) == 10
+    assert stats.suppressed == 220 and round(stats.reduction, 3) == round(220 / 230, 3)
+    assert sum(a.hits for a in out) == 230
+
+
+def test_key_table_is_bounded_and_records_are_stored(tmp_path):
+    suppressor = Suppressor(window=3600, max_keys=100)
+    scan = [_alert(T0 + i * 0.01, 100, src=f"10.1.{i // 250}.{i % 250}") for i in range(1000)]
+    out = suppressor.process(scan + scan[-10:])
+    assert len(suppressor.open) == 100
+    assert suppressor.stats.evicted == 900 and len(out) == 900
+
+    store = AlertStore(tmp_path / "alerts.db")
+    store.ingest(out + suppressor.flush())
+    assert store.count() == 1000
+    assert store.query(src="10.1.0.0", limit=5)[0].hits == 1
+    assert store.query(src="10.1.3.249", limit=5)[0].hits == 2
+    store.close()
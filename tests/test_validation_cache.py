@@ -0,0 +1,85 @@
+import sys
+
+from modules.configuration.validation_cache import (
+    ValidationCache,
+    cached_config_test,
+    config_files,
+)
+
+# Stand-in Snort 2: records each -T run and fails if the rules contain
+# "BROKEN". Like Snort 2, relative includes are read from the -c file's directory.
+FAKE_SNORT = """#!{python}
+import os, sys
+args = sys.argv[1:]
+if args == ["-V"]:
+    print("   ,,_     -*> Snort! <*-  Version 2.9.20 GRE (Build 82)")
+    sys.exit(0)
+with open({log!r}, "a") as f:
+    f.write(" ".join(args) + "\\n")
+conf = args[args.index("-c") + 1]
+os.chdir(os.path.dirname(conf))
+lines, text = open(conf).read().splitlines(), ""
+while lines:
+    line = lines.pop(0)
+    text += line + "\\n"
+    if line.startswith("include "):
+        lines[:0] = open(line.split(None, 1)[1].replace("$RULE_PATH", {rule_path!r})).read().splitlines()
+sys.exit(1 if "BROKEN" in text else 0)
+"""
+
+
+def test_cache_skips_unchanged_inputs_and_rechecks_edits(tmp_path):
+    log = tmp_path / "runs.log"
+    snort = tmp_path / "snort"
+    snort.write_text(FAKE_SNORT.format(python=sys.executable, log=str(log), rule_path=str(tmp_path)))
+    snort.chmod(0o755)
+    rules = tmp_path / "snort.rules"
+    rules.write_text('alert tcp any any -> any 80 (msg:"x"; sid:1;)\n')
+    conf = tmp_path / "snort.conf"
+    conf.write_text(f"var RULE_PATH {tmp_path}\ninclude $RULE_PATH/snort.rules\n")
+    cache_path = tmp_path / "cache.json"
+    runs = lambda: len(log.read_text().splitlines()) if log.exists() else 0
+
+    assert config_files(conf) == [conf.resolve(), rules.resolve()]
+    first = cached_config_test(str(snort), conf, cache=ValidationCache(cache_path))
+    assert first.ok and not first.cached and runs() == 1
+
+    again = cached_config_test(str(snort), conf, cache=ValidationCache(cache_path))
+    assert again.ok and again.cached and runs() == 1
+
+    # Editing an included file invalidates the result; failures are cached too.
+    rules.write_text("BROKEN\n")
+    for expect_cached in (False, True):
+        result = cached_config_test(str(snort), conf, cache=ValidationCache(cache_path))
+        assert not result.ok and result.cached == expect_cached
+    assert runs() == 2
+
+
+def test_snort2_extra_rules_wrapper_stays_out_of_the_conf_dir(tmp_path, monkeypatch):
+    from modules.utilities import snort_probe
+
+    log = tmp_path / "runs.log"
+    snort = tmp_path / "snort"
+    snort.write_text(FAKE_SNORT.format(python=sys.executable, log=str(log), rule_path=str(tmp_path)))
+    snort.chmod(0o755)
+    etc = tmp_path / "etc"
+    etc.mkdir()
+    (etc / "classification.config").write_text("config classification: misc\n")
+    (tmp_path / "local").mkdir()
+    (tmp_path / "local" / "local.rules").write_text("BROKEN\n")
+    conf = etc / "snort.conf"
+    conf.write_text("include classification.config\n")
+    rules = tmp_path / "snort.rules"
+    rules.write_text('alert tcp any any -> any 80 (msg:"x"; sid:1;)\n')
+    versions = []
+    real = snort_probe.snort_version
+    monkeypatch.setattr(snort_probe, "snort_version", lambda s: versions.append(s) or real(s))
+    cache = ValidationCache(tmp_path / "cache.json")
+
+    assert cached_config_test(str(snort), conf, rules, cache=cache).ok
+    # Relative includes, including ones above the conf dir, resolve as they would from etc/.
+    conf.write_text("include classification.config\ninclude ../local/local.rules\n")
+    assert not cached_config_test(str(snort), conf, rules, cache=cache).ok
+    assert len(versions) == 1
+    assert sorted(p.name for p in etc.iterdir()) == ["classification.config", "snort.conf"]
+    assert all(" -c " + str(etc) not in line for line in log.read_text().splitlines())